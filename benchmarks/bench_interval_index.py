@@ -0,0 +1,106 @@
+# benchmarks/bench_interval_index.py
+"""
+Compara a varredura linear antiga (usada por _find_first_available_slot e pela checagem de
+conflitos do create_event) com o IntervalIndex, para milhares de intervalos ocupados.
+
+Uso (na raiz do repositório):
+    python benchmarks/bench_interval_index.py [--sizes 1000,5000,20000] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from src.interval_index import IntervalIndex  # noqa: E402
+
+BASE = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+
+def make_busy(count: int, seed: int = 42):
+    """Intervalos de 30 a 120 minutos, espalhados com folgas curtas, como uma agenda cheia."""
+    rng = random.Random(seed)
+    busy, cursor = [], BASE
+    for _ in range(count):
+        cursor += timedelta(minutes=rng.choice((0, 15, 30, 45)))
+        end = cursor + timedelta(minutes=rng.choice((30, 60, 90, 120)))
+        busy.append((cursor, end))
+        cursor = end
+    return busy
+
+
+# --- Implementações lineares (como eram antes do índice) ---
+def linear_overlaps(busy, start, end):
+    for busy_start, busy_end in busy:
+        if start < busy_end and end > busy_start:
+            return True
+    return False
+
+
+def linear_first_free(busy, start, duration, limit):
+    busy = sorted(busy)
+    current = start
+    while current < limit:
+        potential_end = current + duration
+        if potential_end > limit:
+            return None
+        overlap_found = False
+        for busy_start, busy_end in busy:
+            if current < busy_end and potential_end > busy_start:
+                current = busy_end
+                overlap_found = True
+                break
+        if not overlap_found:
+            return current
+    return None
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def run(size: int, queries: int):
+    busy = make_busy(size)
+    horizon = busy[-1][1]
+    rng = random.Random(size)
+    probes = []
+    for _ in range(queries):
+        start = BASE + timedelta(minutes=15 * rng.randrange(int((horizon - BASE).total_seconds() // 900)))
+        probes.append((start, start + timedelta(minutes=60)))
+
+    index, build_time = timed(IntervalIndex.from_intervals, busy)
+
+    linear_hits, linear_time = timed(lambda: [linear_overlaps(busy, s, e) for s, e in probes])
+    index_hits, index_time = timed(lambda: [index.overlaps(s, e) for s, e in probes])
+    assert linear_hits == index_hits, 'overlaps divergiu da varredura linear'
+
+    # Busca de horário livre: poucas consultas, pois a versão linear é O(n²) no pior caso.
+    duration = timedelta(minutes=150)
+    free_probes = probes[: max(1, queries // 400)]
+    linear_free, linear_free_time = timed(lambda: [linear_first_free(busy, s, duration, horizon) for s, _ in free_probes])
+    index_free, index_free_time = timed(lambda: [index.next_free(s, duration.total_seconds(), horizon) for s, _ in free_probes])
+    assert linear_free == index_free, 'next_free divergiu da varredura linear'
+
+    print(
+        f"{size:>7} intervalos | carga {build_time * 1000:7.2f} ms"
+        f" | overlaps x{queries}: linear {linear_time * 1000:9.2f} ms, índice {index_time * 1000:7.2f} ms"
+        f" | próximo livre x{len(free_probes)}: linear {linear_free_time * 1000:9.2f} ms, índice {index_free_time * 1000:7.2f} ms"
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--sizes', default='1000,5000,20000')
+    arg_parser.add_argument('--queries', type=int, default=2000)
+    args = arg_parser.parse_args()
+    for size in (int(value) for value in args.sizes.split(',')):
+        run(size, args.queries)
+
+
+if __name__ == '__main__':
+    main()
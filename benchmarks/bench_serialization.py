@@ -0,0 +1,118 @@
+# benchmarks/bench_serialization.py
+"""
+Compara, para páginas sintéticas de events.list, o caminho validado de /actions/find_events
+(EventsResponse(**payload), validação do response_model e json da biblioteca padrão) com o
+modo 'trusted_upstream' (projeção dos dicts e serialização com orjson, se instalado).
+
+Uso (na raiz do repositório):
+    python benchmarks/bench_serialization.py [--sizes 25,250,2500] [--repeat 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+
+from src.models import EventsResponse, FindEventsApiResponse  # noqa: E402
+from src.serialization import FastJSONResponse, orjson, project  # noqa: E402
+
+BASE = datetime(2030, 1, 1, 7, tzinfo=timezone(timedelta(hours=-3)))
+
+
+def make_page(size: int, seed: int = 42) -> dict:
+    """Uma página de events.list como o Google devolve: campos extras, participantes e blocos."""
+    rng = random.Random(seed)
+    items = []
+    for i in range(size):
+        start = BASE + timedelta(days=i // 12, hours=i % 12)
+        created = (BASE - timedelta(days=rng.randrange(90))).astimezone(timezone.utc)
+        items.append({
+            'kind': 'calendar#event',
+            'etag': f'"{3400000000000000 + i}"',
+            'id': f'evt{i:06d}{rng.randrange(10 ** 6):06d}',
+            'status': 'confirmed',
+            'htmlLink': f'https://www.google.com/calendar/event?eid=evt{i}',
+            'created': created.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'updated': created.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z',
+            'summary': f'Reserva {i}',
+            'description': f'Aula\n\n---\nSolicitado por: Usuário {i % 40} (user{i % 40}@example.com)',
+            'creator': {'email': 'sa@project.iam.gserviceaccount.com'},
+            'organizer': {'email': 'quadra-a@group.calendar.google.com', 'displayName': 'Quadra A', 'self': True},
+            'start': {'dateTime': start.isoformat(), 'timeZone': 'America/Sao_Paulo'},
+            'end': {'dateTime': (start + timedelta(hours=1)).isoformat(), 'timeZone': 'America/Sao_Paulo'},
+            'iCalUID': f'evt{i}@google.com',
+            'sequence': 0,
+            'attendees': [
+                {'email': f'user{(i + k) % 40}@example.com', 'responseStatus': 'needsAction'} for k in range(rng.randrange(3))
+            ],
+            'reminders': {'useDefault': True},
+            'extendedProperties': {'private': {'requesterEmail': f'user{i % 40}@example.com', 'requesterName': f'Usuário {i % 40}'}},
+            'eventType': 'default',
+        })
+    return {'kind': 'calendar#events', 'summary': 'Quadra A', 'items': items, 'nextPageToken': 'token'}
+
+
+_response_field = create_model_field(name='Response', type_=FindEventsApiResponse, mode='serialization')
+_loop = asyncio.new_event_loop()
+
+
+def validated_path(page: dict) -> bytes:
+    """O que find_events + FastAPI fazem hoje: modelos, nova validação no response_model e json.dumps."""
+    events = EventsResponse(**page)
+    content = FindEventsApiResponse(user_email='user@example.com', isAdmin=False, events=events)
+    serialized = _loop.run_until_complete(serialize_response(field=_response_field, response_content=content))
+    return JSONResponse(serialized).body
+
+
+def trusted_path(page: dict) -> bytes:
+    """Modo trusted_upstream: projeção do payload e serialização direta."""
+    events = project(EventsResponse, page)
+    return FastJSONResponse({'user_email': 'user@example.com', 'isAdmin': False, 'events': events}).body
+
+
+def timed(func, page: dict, repeat: int):
+    func(page)  # aquecimento (compilação dos validadores/projetores)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        body = func(page)
+    return body, (time.perf_counter() - started) / repeat
+
+
+def run(size: int, repeat: int):
+    page = make_page(size)
+    validated_body, validated_time = timed(validated_path, page, repeat)
+    trusted_body, trusted_time = timed(trusted_path, page, repeat)
+
+    # Mesma estrutura; só o formato das datas muda (o modo confiável repassa as strings do Google).
+    validated_json, trusted_json = json.loads(validated_body), json.loads(trusted_body)
+    assert [event['id'] for event in validated_json['events']['items']] == [event['id'] for event in trusted_json['events']['items']]
+    assert validated_json['events']['items'][0].keys() == trusted_json['events']['items'][0].keys()
+
+    print(
+        f"{size:>5} eventos | validado {validated_time * 1000:8.2f} ms ({len(validated_body) / 1024:7.1f} KiB)"
+        f" | confiável {trusted_time * 1000:7.2f} ms ({len(trusted_body) / 1024:7.1f} KiB)"
+        f" | x{validated_time / trusted_time:5.1f}"
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--sizes', default='25,250,2500')
+    arg_parser.add_argument('--repeat', type=int, default=20)
+    args = arg_parser.parse_args()
+    print(f"encoder rápido: {'orjson ' + orjson.__version__ if orjson is not None else 'json (orjson não instalado)'}")
+    for size in (int(value) for value in args.sizes.split(',')):
+        run(size, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
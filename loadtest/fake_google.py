@@ -0,0 +1,553 @@
+# loadtest/fake_google.py
+"""
+Servidor local que imita os endpoints da Google Calendar API v3 usados pelo sistema, para
+testes de carga sem gastar a cota do Google.
+
+Cobre events list/get/insert/patch/delete (com filtros de extendedProperties e syncToken),
+freeBusy, calendars.get, calendarList, o endpoint de batch, o endpoint de token OAuth e
+um endpoint de certificados para tokens de ID. Latência e erros podem ser injetados, e
+mudados em execução pelos endpoints de controle:
+
+    GET  /_fake/stats    contadores de chamadas por método da API
+    POST /_fake/reset    zera os contadores
+    GET  /_fake/faults   configuração atual de latência/erros
+    POST /_fake/faults   altera a configuração (JSON com os campos de FaultInjector)
+
+Uso (na raiz do repositório):
+    python loadtest/fake_google.py --workdir loadtest_run [--port 8081] [--latency-ms 40]
+        [--jitter-ms 10] [--error-rate 0.01] [--courts 4] [--users 20]
+
+O diretório de trabalho recebe a chave da conta de serviço, a chave que assina os tokens de ID
+do gerador de carga e um config.yaml apontando a aplicação para este servidor. Depois:
+
+    CONFIG_PATH=loadtest_run/config.yaml SERVICE_ACCOUNT_KEY_FILE=loadtest_run/service-account-key.json python run_server.py
+    python loadtest/load_generator.py --workdir loadtest_run
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from dateutil import parser as dt_parser
+
+
+def _now_rfc3339() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def _parse_dt(value: str) -> datetime:
+    dt = dt_parser.isoparse(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def _event_range(event: Dict) -> Optional[tuple]:
+    """Início/fim do evento com horário; eventos de dia inteiro (só 'date') ficam de fora dos filtros e do freebusy."""
+    start, end = event.get('start', {}).get('dateTime'), event.get('end', {}).get('dateTime')
+    if not start or not end:
+        return None
+    return _parse_dt(start), _parse_dt(end)
+
+
+class FakeCalendarStore:
+    """Estado em memória dos calendários, eventos e contadores de chamadas."""
+
+    def __init__(self, calendars: Dict[str, Dict], calendar_lists: Optional[Dict[str, List[str]]] = None):
+        self.lock = threading.RLock()
+        self.calendars = {cid: {'id': cid, 'summary': info.get('summary', cid), 'timeZone': info.get('timeZone', 'America/Sao_Paulo')}
+                          for cid, info in calendars.items()}
+        self.calendar_lists = calendar_lists or {}
+        self.events: Dict[str, Dict[str, Dict]] = {cid: {} for cid in calendars}
+        self.sequence = 0
+        self.calls = Counter()
+
+    def _touch(self, event: Dict):
+        self.sequence += 1
+        event['updated'] = _now_rfc3339()
+        event['_seq'] = self.sequence
+        event['etag'] = f'"{self.sequence}"'
+
+    def insert(self, calendar_id: str, body: Dict) -> Dict:
+        with self.lock:
+            event = json.loads(json.dumps(body))
+            event.update({
+                'kind': 'calendar#event',
+                'id': uuid.uuid4().hex,
+                'status': 'confirmed',
+                'htmlLink': f'https://www.google.com/calendar/event?eid={uuid.uuid4().hex[:12]}',
+                'created': _now_rfc3339(),
+                'creator': {'email': 'service-account@fake.iam.gserviceaccount.com'},
+                'organizer': {'email': calendar_id, 'displayName': self.calendars[calendar_id]['summary'], 'self': True},
+                'iCalUID': f'{uuid.uuid4().hex}@google.com',
+                'sequence': 0,
+                'reminders': {'useDefault': True},
+                'eventType': 'default',
+            })
+            self._touch(event)
+            self.events[calendar_id][event['id']] = event
+            return event
+
+    def get(self, calendar_id: str, event_id: str) -> Optional[Dict]:
+        with self.lock:
+            event = self.events.get(calendar_id, {}).get(event_id)
+            if event is None or event.get('status') == 'cancelled':
+                return None
+            return event
+
+    def patch(self, calendar_id: str, event_id: str, body: Dict) -> Optional[Dict]:
+        with self.lock:
+            event = self.get(calendar_id, event_id)
+            if event is None:
+                return None
+            for key, value in body.items():
+                if key == 'extendedProperties' and isinstance(value, dict):
+                    props = event.setdefault('extendedProperties', {})
+                    for scope, values in value.items():
+                        props.setdefault(scope, {}).update(values)
+                else:
+                    event[key] = value
+            self._touch(event)
+            return event
+
+    def delete(self, calendar_id: str, event_id: str) -> bool:
+        with self.lock:
+            event = self.get(calendar_id, event_id)
+            if event is None:
+                return False
+            event['status'] = 'cancelled'
+            self._touch(event)
+            return True
+
+    def list(self, calendar_id: str, params: Dict[str, List[str]]) -> Dict:
+        def first(name):
+            values = params.get(name)
+            return values[0] if values else None
+
+        with self.lock:
+            items = list(self.events.get(calendar_id, {}).values())
+            sync_token = first('syncToken')
+            if sync_token:
+                since = int(base64.urlsafe_b64decode(sync_token.encode()).decode())
+                if since > self.sequence:
+                    return {'_status': 410}
+                items = [e for e in items if e['_seq'] > since]
+            else:
+                if first('showDeleted') != 'true':
+                    items = [e for e in items if e.get('status') != 'cancelled']
+                time_min, time_max = first('timeMin'), first('timeMax')
+                if time_min or time_max:
+                    items = [e for e in items if _event_range(e) is not None]
+                if time_min:
+                    lower = _parse_dt(time_min)
+                    items = [e for e in items if _event_range(e)[1] > lower]
+                if time_max:
+                    upper = _parse_dt(time_max)
+                    items = [e for e in items if _event_range(e)[0] < upper]
+                for scope, key in (('shared', 'sharedExtendedProperty'), ('private', 'privateExtendedProperty')):
+                    for condition in params.get(key, []):
+                        name, _, value = condition.partition('=')
+                        items = [e for e in items if e.get('extendedProperties', {}).get(scope, {}).get(name) == value]
+            items.sort(key=lambda e: (e.get('start', {}).get('dateTime') or e.get('start', {}).get('date') or '', e['id']))
+            current_seq = self.sequence
+
+        max_results = min(int(first('maxResults') or 250), 2500)
+        offset = int(first('pageToken') or 0)
+        page = items[offset:offset + max_results]
+        result = {
+            'kind': 'calendar#events',
+            'summary': self.calendars[calendar_id]['summary'],
+            'timeZone': self.calendars[calendar_id]['timeZone'],
+            'items': [{k: v for k, v in e.items() if k != '_seq'} for e in page],
+        }
+        if offset + max_results < len(items):
+            result['nextPageToken'] = str(offset + max_results)
+        else:
+            result['nextSyncToken'] = base64.urlsafe_b64encode(str(current_seq).encode()).decode()
+        return result
+
+    def freebusy(self, body: Dict) -> Dict:
+        lower, upper = _parse_dt(body['timeMin']), _parse_dt(body['timeMax'])
+        calendars = {}
+        with self.lock:
+            for item in body.get('items', []):
+                cid = item['id']
+                if cid not in self.events:
+                    calendars[cid] = {'errors': [{'domain': 'global', 'reason': 'notFound'}], 'busy': []}
+                    continue
+                intervals = []
+                for event in self.events[cid].values():
+                    bounds = _event_range(event)
+                    if bounds is None or event.get('status') == 'cancelled' or event.get('transparency') == 'transparent':
+                        continue
+                    start, end = bounds
+                    if end > lower and start < upper:
+                        intervals.append([max(start, lower), min(end, upper)])
+                intervals.sort()
+                merged = []
+                for start, end in intervals:
+                    if merged and start <= merged[-1][1]:
+                        merged[-1][1] = max(merged[-1][1], end)
+                    else:
+                        merged.append([start, end])
+                calendars[cid] = {'busy': [{'start': s.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                                            'end': e.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')} for s, e in merged]}
+        return {'kind': 'calendar#freeBusy', 'timeMin': body['timeMin'], 'timeMax': body['timeMax'], 'calendars': calendars}
+
+
+class FaultInjector:
+    """
+    Latência (ms) e taxa de erros configuráveis aplicadas a cada chamada da API.
+    'error_methods' restringe os erros a alguns métodos (ex.: ['freebusy.query']); vazio = todos.
+    """
+
+    FIELDS = ('latency_ms', 'jitter_ms', 'error_rate', 'error_status', 'error_methods')
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0, error_status: int = 503,
+                 error_methods: Optional[List[str]] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.error_methods = list(error_methods or [])
+
+    def delay(self):
+        latency = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if latency > 0:
+            time.sleep(latency / 1000.0)
+
+    def should_fail(self, method: Optional[str] = None) -> bool:
+        if self.error_methods and method not in self.error_methods:
+            return False
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+    def update(self, values: Dict):
+        for field in self.FIELDS:
+            if field in values:
+                setattr(self, field, values[field])
+
+    def as_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+def _error_body(status: int) -> Dict:
+    reasons = {400: 'badRequest', 403: 'rateLimitExceeded', 404: 'notFound', 410: 'deleted', 429: 'rateLimitExceeded', 500: 'backendError', 503: 'backendError'}
+    reason = reasons.get(status, 'backendError')
+    return {'error': {'code': status, 'message': reason, 'errors': [{'domain': 'global', 'reason': reason, 'message': reason}]}}
+
+
+class FakeGoogleHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakeGoogle/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- despacho -----------------------------------------------------------
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _handle(self, method: str):
+        body = self._read_body()
+        parsed = urllib.parse.urlparse(self.path)
+
+        if parsed.path == '/token':
+            with self.server.store.lock:
+                self.server.store.calls['oauth2.token'] += 1
+            access_token = f'fake-{uuid.uuid4().hex}'
+            self.server.token_subjects[access_token] = _assertion_subject(body)
+            return self._send_json(200, {'access_token': access_token, 'expires_in': self.server.token_ttl, 'token_type': 'Bearer'})
+        if parsed.path == '/oauth2/v1/certs':
+            with self.server.store.lock:
+                self.server.store.calls['oauth2.certs'] += 1
+            return self._send_json(200, self.server.certs, headers={'Cache-Control': 'public, max-age=3600'})
+        if parsed.path == '/batch/calendar/v3':
+            return self._handle_batch(body)
+        if parsed.path.startswith('/_fake/'):
+            return self._handle_control(method, parsed.path, body)
+
+        self.server.faults.delay()
+        status, payload = self.server.dispatch(method, self.path, body, self.headers)
+        self._send_json(status, payload)
+
+    def _handle_batch(self, body: bytes):
+        with self.server.store.lock:
+            self.server.store.calls['batch'] += 1
+        self.server.faults.delay()
+        content_type = self.headers.get('Content-Type')
+        message = BytesParser(policy=HTTP).parsebytes(f'Content-Type: {content_type}\r\n\r\n'.encode() + body)
+        boundary = f'batch_{uuid.uuid4().hex}'
+        parts = []
+        for part in message.iter_parts():
+            raw = part.get_payload(decode=True)
+            request_line, _, rest = raw.partition(b'\n')
+            sub_method, sub_path, _ = request_line.decode().strip().split(' ', 2)
+            headers_blob, _, sub_body = rest.replace(b'\r\n', b'\n').partition(b'\n\n')
+            status, payload = self.server.dispatch(sub_method, sub_path, sub_body, {})
+            payload_bytes = json.dumps(payload).encode() if payload is not None else b''
+            content_id = part['Content-ID'].replace('<', '<response-', 1)
+            parts.append(
+                f'--{boundary}\r\nContent-Type: application/http\r\nContent-ID: {content_id}\r\n\r\n'
+                f'HTTP/1.1 {status} {"OK" if status < 300 else "Error"}\r\nContent-Type: application/json; charset=UTF-8\r\n'
+                f'Content-Length: {len(payload_bytes)}\r\n\r\n'.encode() + payload_bytes + b'\r\n'
+            )
+        response = b''.join(parts) + f'--{boundary}--\r\n'.encode()
+        self._send_raw(200, response, f'multipart/mixed; boundary={boundary}')
+
+    def _handle_control(self, method: str, path: str, body: bytes):
+        store, faults = self.server.store, self.server.faults
+        if path == '/_fake/stats' and method == 'GET':
+            with store.lock:
+                calls = dict(store.calls)
+                events = sum(1 for events in store.events.values() for event in events.values() if event.get('status') != 'cancelled')
+            return self._send_json(200, {'calls': calls, 'events': events})
+        if path == '/_fake/reset' and method == 'POST':
+            with store.lock:
+                store.calls.clear()
+            return self._send_json(200, {'calls': {}})
+        if path == '/_fake/faults':
+            if method == 'POST':
+                faults.update(json.loads(body) if body else {})
+            return self._send_json(200, faults.as_dict())
+        return self._send_json(404, _error_body(404))
+
+    # --- respostas ----------------------------------------------------------
+    def _send_json(self, status: int, payload: Optional[Dict], headers: Optional[Dict] = None):
+        data = json.dumps(payload).encode() if payload is not None else b''
+        self._send_raw(status, data, 'application/json; charset=UTF-8', headers)
+
+    def _send_raw(self, status: int, data: bytes, content_type: str, headers: Optional[Dict] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _assertion_subject(body: bytes) -> Optional[str]:
+    """Lê (sem verificar a assinatura) o 'sub' da asserção JWT enviada ao endpoint de token."""
+    assertion = urllib.parse.parse_qs(body.decode()).get('assertion', [''])[0]
+    try:
+        payload = assertion.split('.')[1]
+        return json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4))).get('sub')
+    except (IndexError, ValueError):
+        return None
+
+
+class FakeGoogleServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, store: FakeCalendarStore, faults: Optional[FaultInjector] = None,
+                 certs: Optional[Dict[str, str]] = None, token_ttl: int = 3600):
+        super().__init__(address, FakeGoogleHandler)
+        self.store = store
+        self.faults = faults or FaultInjector()
+        self.certs = certs or {}
+        self.token_ttl = token_ttl
+        # access token emitido -> usuário personificado ('sub' da asserção JWT da conta de serviço)
+        self.token_subjects: Dict[str, Optional[str]] = {}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def dispatch(self, method: str, path: str, body: bytes, headers):
+        parsed = urllib.parse.urlparse(path)
+        params = urllib.parse.parse_qs(parsed.query)
+        segments = [urllib.parse.unquote(s) for s in parsed.path.split('/') if s]
+        if segments[:2] != ['calendar', 'v3']:
+            return 404, _error_body(404)
+        segments = segments[2:]
+        store = self.store
+        data = json.loads(body) if body else {}
+
+        def call(name):
+            with store.lock:
+                store.calls[name] += 1
+            if self.faults.should_fail(name):
+                return self.faults.error_status
+            return None
+
+        if segments == ['freeBusy'] and method == 'POST':
+            failed = call('freebusy.query')
+            return (failed, _error_body(failed)) if failed else (200, store.freebusy(data))
+
+        if segments == ['users', 'me', 'calendarList'] and method == 'GET':
+            failed = call('calendarList.list')
+            if failed:
+                return failed, _error_body(failed)
+            authorization = (headers.get('Authorization') or '') if headers else ''
+            subject = self.token_subjects.get(authorization.replace('Bearer ', '', 1))
+            ids = store.calendar_lists.get(subject, list(store.calendars)) if subject else list(store.calendars)
+            offset = int((params.get('pageToken') or ['0'])[0])
+            size = int((params.get('maxResults') or ['100'])[0])
+            items = [dict(store.calendars[cid], accessRole='writer') for cid in ids[offset:offset + size] if cid in store.calendars]
+            result = {'kind': 'calendar#calendarList', 'items': items}
+            if offset + size < len(ids):
+                result['nextPageToken'] = str(offset + size)
+            return 200, result
+
+        if len(segments) >= 2 and segments[0] == 'calendars':
+            calendar_id = segments[1]
+            if calendar_id not in store.calendars:
+                return 404, _error_body(404)
+            rest = segments[2:]
+            if not rest and method == 'GET':
+                failed = call('calendars.get')
+                return (failed, _error_body(failed)) if failed else (200, dict(store.calendars[calendar_id], kind='calendar#calendar'))
+            if rest == ['events'] and method == 'GET':
+                failed = call('events.list')
+                if failed:
+                    return failed, _error_body(failed)
+                result = store.list(calendar_id, params)
+                if result.get('_status') == 410:
+                    return 410, _error_body(410)
+                return 200, result
+            if rest == ['events'] and method == 'POST':
+                failed = call('events.insert')
+                return (failed, _error_body(failed)) if failed else (200, store.insert(calendar_id, data))
+            if len(rest) == 2 and rest[0] == 'events':
+                event_id = rest[1]
+                if method == 'GET':
+                    failed = call('events.get')
+                    event = None if failed else store.get(calendar_id, event_id)
+                elif method == 'PATCH':
+                    failed = call('events.patch')
+                    event = None if failed else store.patch(calendar_id, event_id, data)
+                elif method == 'DELETE':
+                    failed = call('events.delete')
+                    if failed:
+                        return failed, _error_body(failed)
+                    return (204, None) if store.delete(calendar_id, event_id) else (410, _error_body(410))
+                else:
+                    return 405, _error_body(400)
+                if failed:
+                    return failed, _error_body(failed)
+                if event is None:
+                    return 404, _error_body(404)
+                return 200, {k: v for k, v in event.items() if k != '_seq'}
+        return 404, _error_body(404)
+
+
+def start_fake_google(store: FakeCalendarStore, host: str = '127.0.0.1', port: int = 0, **kwargs) -> FakeGoogleServer:
+    """Inicia o servidor falso em uma thread daemon e o retorna."""
+    server = FakeGoogleServer((host, port), store, **kwargs)
+    threading.Thread(target=server.serve_forever, name='fake-google', daemon=True).start()
+    return server
+
+
+# --- Execução como processo separado ------------------------------------------
+def _load_or_create_key(path: str):
+    """Reaproveita a chave RSA do diretório de trabalho (gerar chaves de 2048 bits em Python puro leva segundos)."""
+    import rsa
+
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return rsa.PrivateKey.load_pkcs1(f.read())
+    print(f"Gerando chave RSA em '{path}'...")
+    _, private_key = rsa.newkeys(2048)
+    with open(path, 'wb') as f:
+        f.write(private_key.save_pkcs1())
+    return private_key
+
+
+def _write_workdir(workdir: str, url: str, courts: int, users: int) -> Dict:
+    """Gera as chaves e o config.yaml do teste de carga; retorna os calendários e listas por usuário."""
+    import rsa
+    import yaml
+
+    os.makedirs(workdir, exist_ok=True)
+    service_key_private = _load_or_create_key(os.path.join(workdir, 'service-account-key.pem'))
+    token_key_private = _load_or_create_key(os.path.join(workdir, 'id-token-key.pem'))
+    token_key_public = rsa.PublicKey(token_key_private.n, token_key_private.e)
+
+    with open(os.path.join(workdir, 'service-account-key.json'), 'w') as f:
+        json.dump({
+            'type': 'service_account', 'project_id': 'loadtest', 'private_key_id': 'loadtest-key',
+            'private_key': service_key_private.save_pkcs1().decode(),
+            'client_email': 'loadtest@loadtest.iam.gserviceaccount.com', 'client_id': '1',
+            'token_uri': url + 'token',
+        }, f)
+
+    quadras = {f'Quadra {i}': f'quadra-{i}@group.calendar.google.com' for i in range(1, courts + 1)}
+    names = list(quadras)
+    # Quadras em pares: a primeira de cada par bloqueia a segunda (como uma quadra poliesportiva e suas metades).
+    dependency_rules = {names[i]: [names[i + 1]] for i in range(0, len(names) - 1, 2)}
+    user_emails = [f'user{i:02d}@loadtest.local' for i in range(1, users + 1)]
+    # Usuários comuns não veem a última quadra (para exercitar o caminho de permissão negada).
+    visible = list(quadras.values())[:-1] if courts > 1 else list(quadras.values())
+    config = {
+        'impersonation_user_email': 'admin@loadtest.local',
+        'gcp_client_id': 'loadtest-client',
+        'google_api_root_url': url,
+        'id_token_certs_url': url + 'oauth2/v1/certs',
+        'permissions': {'admin_users': ['admin@loadtest.local']},
+        'quadras': quadras,
+        'court_dependency_rules': dependency_rules,
+    }
+    with open(os.path.join(workdir, 'config.yaml'), 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f, allow_unicode=True, sort_keys=False)
+    with open(os.path.join(workdir, 'users.json'), 'w') as f:
+        json.dump({'admin': 'admin@loadtest.local', 'users': user_emails}, f)
+
+    return {
+        'calendars': {cid: {'summary': name} for name, cid in quadras.items()},
+        'calendar_lists': {email: visible for email in user_emails},
+        'certs': {'loadtest-id-token': token_key_public.save_pkcs1().decode()},
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8081)
+    arg_parser.add_argument('--workdir', default='loadtest_run')
+    arg_parser.add_argument('--courts', type=int, default=4)
+    arg_parser.add_argument('--users', type=int, default=20)
+    arg_parser.add_argument('--latency-ms', type=float, default=40.0)
+    arg_parser.add_argument('--jitter-ms', type=float, default=10.0)
+    arg_parser.add_argument('--error-rate', type=float, default=0.0)
+    arg_parser.add_argument('--error-status', type=int, default=503)
+    args = arg_parser.parse_args()
+
+    url = f'http://{args.host}:{args.port}/'
+    setup = _write_workdir(args.workdir, url, args.courts, args.users)
+    store = FakeCalendarStore(setup['calendars'], calendar_lists=setup['calendar_lists'])
+    faults = FaultInjector(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status)
+    server = FakeGoogleServer((args.host, args.port), store, faults=faults, certs=setup['certs'])
+    print(f"Google falso em {server.url} (arquivos do teste em '{args.workdir}'). Ctrl+C para sair.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
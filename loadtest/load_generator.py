@@ -0,0 +1,384 @@
+# loadtest/load_generator.py
+"""
+Gerador de carga para as rotas /actions/* da aplicação, rodando contra o Google falso
+(loadtest/fake_google.py). Simula usuários consultando eventos e disponibilidade, criando
+reservas avulsas e séries semanais (inclusive em quadras com dependentes), remarcando e
+cancelando.
+
+Primeiro faz uma calibração: algumas requisições sequenciais de cada tipo, medindo pelos
+contadores do Google falso quantas chamadas à API cada rota faz. Depois roda a carga mista
+e informa latência p50/p95/p99, vazão, erros e chamadas ao Google por requisição.
+
+Uso (na raiz do repositório, com o Google falso e a aplicação no ar):
+    python loadtest/load_generator.py --workdir loadtest_run [--app http://127.0.0.1:8000]
+        [--fake http://127.0.0.1:8081] [--duration 60] [--concurrency 16] [--json-out resultado.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import httpx
+import yaml
+from google.auth import crypt, jwt
+
+# Peso de cada operação na carga mista (leituras dominam, como no uso real do frontend).
+DEFAULT_MIX = {
+    'find_events': 30,
+    'find_availability': 25,
+    'find_availability_matrix': 8,
+    'list_calendars': 5,
+    'create_event': 12,
+    'create_recurring_event': 5,
+    'update_event': 6,
+    'delete_event': 6,
+    'delete_recurring_event': 3,
+}
+BLOCK_MARKER = 'autoGeneratedBy=courtBookingSystemMCP'
+TZ = timezone(timedelta(hours=-3))
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Percentil pelo método do posto mais próximo."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class LoadContext:
+    """Usuários, quadras e as reservas conhecidas (descobertas pelo find_events) durante a carga."""
+
+    def __init__(self, workdir: str, app_url: str, fake_url: str, seed: int):
+        with open(os.path.join(workdir, 'config.yaml'), encoding='utf-8') as f:
+            config = yaml.safe_load(f)
+        with open(os.path.join(workdir, 'users.json')) as f:
+            users = json.load(f)
+        with open(os.path.join(workdir, 'id-token-key.pem')) as f:
+            self._signer = crypt.RSASigner.from_string(f.read(), key_id='loadtest-id-token')
+        self.client_id = config['gcp_client_id']
+        self.courts = list(config['quadras'])
+        # Usuários comuns não veem a última quadra (ver fake_google._write_workdir).
+        self.user_courts = self.courts[:-1] if len(self.courts) > 1 else self.courts
+        self.admin = users['admin']
+        self.users = users['users']
+        self.app_url = app_url.rstrip('/')
+        self.fake_url = fake_url.rstrip('/')
+        self.rng = random.Random(seed)
+        self._tokens: Dict[str, str] = {}
+        # quadra -> lista de (event_id, requesterEmail, seriesId)
+        self.known_events: Dict[str, List[tuple]] = defaultdict(list)
+
+    def token(self, email: str) -> str:
+        if email not in self._tokens:
+            now = int(time.time())
+            self._tokens[email] = jwt.encode(self._signer, {
+                'iss': 'https://accounts.google.com', 'aud': self.client_id, 'sub': email, 'email': email,
+                'email_verified': True, 'name': email.split('@')[0], 'iat': now, 'exp': now + 6 * 3600,
+            }).decode()
+        return self._tokens[email]
+
+    def pick_user(self) -> str:
+        # Um admin responde por ~10% das requisições.
+        return self.admin if self.rng.random() < 0.1 else self.rng.choice(self.users)
+
+    def courts_for(self, email: str) -> List[str]:
+        return self.courts if email == self.admin else self.user_courts
+
+    def random_day(self) -> date:
+        return date.today() + timedelta(days=self.rng.randrange(1, 60))
+
+    def random_slot(self):
+        day = self.random_day()
+        start = datetime(day.year, day.month, day.day, self.rng.randrange(6, 22), self.rng.choice((0, 30)), tzinfo=TZ)
+        return start, start + timedelta(minutes=self.rng.choice((60, 60, 90)))
+
+    def remember(self, court: str, events: List[Dict]):
+        known = {event_id for event_id, _, _ in self.known_events[court]}
+        for event in events:
+            private = (event.get('extendedProperties') or {}).get('private') or {}
+            if event['id'] in known or BLOCK_MARKER in (event.get('description') or '') or 'sourceEventIds' in private:
+                continue
+            self.known_events[court].append((event['id'], private.get('requesterEmail'), private.get('seriesId')))
+
+    def take_event(self, email: str, court: str, series: bool = False) -> Optional[tuple]:
+        """Retira uma reserva conhecida que o usuário pode alterar (para dois workers não pegarem a mesma)."""
+        candidates = [
+            index for index, (_, owner, series_id) in enumerate(self.known_events[court])
+            if (email == self.admin or owner == email) and (bool(series_id) if series else True)
+        ]
+        if not candidates:
+            return None
+        return self.known_events[court].pop(self.rng.choice(candidates))
+
+
+# --- Operações (cada uma devolve a resposta HTTP, ou None se não houver o que fazer) ---
+async def op_find_events(ctx: LoadContext, client: httpx.AsyncClient, email: str):
+    court = ctx.rng.choice(ctx.courts_for(email))
+    day = ctx.random_day()
+    response = await client.get('/actions/find_events', params={
+        'calendar_id': court, 'time_min_str': day.isoformat(), 'time_max_str': (day + timedelta(days=6)).isoformat(),
+    }, headers={'Authorization': f'Bearer {ctx.token(email)}'})
+    if response.status_code == 200:
+        ctx.remember(court, response.json()['events']['items'])
+    return response
+
+
+async def op_find_availability(ctx: LoadContext, client: httpx.AsyncClient, email: str):
+    return await client.get('/actions/find_availability', params={
+        'calendar_id': ctx.rng.choice(ctx.courts_for(email)), 'date_str': ctx.random_day().isoformat(),
+    }, headers={'Authorization': f'Bearer {ctx.token(email)}'})
+
+
+async def op_find_availability_matrix(ctx: LoadContext, client: httpx.AsyncClient, email: str):
+    start = ctx.random_day()
+    # Todas as quadras: usuários comuns recebem as que não podem ver em 'forbidden'.
+    return await client.get('/actions/find_availability_matrix', params={
+        'start_date': start.isoformat(), 'end_date': (start + timedelta(days=6)).isoformat(), 'calendar_ids': ','.join(ctx.courts),
+    }, headers={'Authorization': f'Bearer {ctx.token(email)}'})
+
+
+async def op_list_calendars(ctx: LoadContext, client: httpx.AsyncClient, email: str):
+    return await client.get('/actions/list_calendars', headers={'Authorization': f'Bearer {ctx.token(email)}'})
+
+
+async def _create(ctx: LoadContext, client: httpx.AsyncClient, email: str, recurring: bool):
+    court = ctx.rng.choice(ctx.courts_for(email))
+    start, end = ctx.random_slot()
+    event_data = {
+        'summary': f"{'Aula' if recurring else 'Reserva'} {email.split('@')[0]}",
+        'start': {'dateTime': start.isoformat()}, 'end': {'dateTime': end.isoformat()},
+    }
+    if recurring:
+        weekday = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU'][start.weekday()]
+        event_data.update(frequency='weekly', recurrence_days=[weekday],
+                          recurrence_end_date=(start.date() + timedelta(weeks=ctx.rng.randrange(3, 9))).isoformat())
+    return await client.post('/actions/create_event', json={'calendar_id': court, 'event_data': event_data},
+                             headers={'Authorization': f'Bearer {ctx.token(email)}'})
+
+
+async def op_create_event(ctx: LoadContext, client: httpx.AsyncClient, email: str):
+    return await _create(ctx, client, email, recurring=False)
+
+
+async def op_create_recurring_event(ctx: LoadContext, client: httpx.AsyncClient, email: str):
+    return await _create(ctx, client, email, recurring=True)
+
+
+async def op_update_event(ctx: LoadContext, client: httpx.AsyncClient, email: str):
+    court = ctx.rng.choice(ctx.courts_for(email))
+    taken = ctx.take_event(email, court)
+    if taken is None:
+        return None
+    start, end = ctx.random_slot()
+    response = await client.patch(f'/actions/update_event/{taken[0]}', params={'calendar_id': court}, json={
+        'start': {'dateTime': start.isoformat()}, 'end': {'dateTime': end.isoformat()},
+    }, headers={'Authorization': f'Bearer {ctx.token(email)}'})
+    if response.status_code == 200:
+        ctx.known_events[court].append(taken)
+    return response
+
+
+async def op_delete_event(ctx: LoadContext, client: httpx.AsyncClient, email: str):
+    court = ctx.rng.choice(ctx.courts_for(email))
+    taken = ctx.take_event(email, court)
+    if taken is None:
+        return None
+    return await client.delete(f'/actions/delete_event/{taken[0]}', params={'calendar_id': court},
+                               headers={'Authorization': f'Bearer {ctx.token(email)}'})
+
+
+async def op_delete_recurring_event(ctx: LoadContext, client: httpx.AsyncClient, email: str):
+    court = ctx.rng.choice(ctx.courts_for(email))
+    taken = ctx.take_event(email, court, series=True)
+    if taken is None:
+        return None
+    scope = ctx.rng.choice(('this_event', 'future_events', 'all_events'))
+    if scope != 'this_event':
+        # As demais ocorrências da série também somem.
+        ctx.known_events[court] = [entry for entry in ctx.known_events[court] if entry[2] != taken[2]]
+    return await client.delete(f'/actions/delete_recurring_event/{taken[0]}', params={'calendar_id': court, 'delete_scope': scope},
+                               headers={'Authorization': f'Bearer {ctx.token(email)}'})
+
+
+OPERATIONS = {name: globals()[f'op_{name}'] for name in DEFAULT_MIX}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.skipped = Counter()
+
+    def record(self, name: str, status, seconds: float):
+        self.latencies[name].append(seconds)
+        self.statuses[name][status] += 1
+
+
+async def run_operation(ctx: LoadContext, client: httpx.AsyncClient, recorder: Recorder, name: str):
+    email = ctx.pick_user()
+    started = time.perf_counter()
+    try:
+        response = await OPERATIONS[name](ctx, client, email)
+    except httpx.HTTPError as e:
+        recorder.record(name, type(e).__name__, time.perf_counter() - started)
+        return
+    if response is None:
+        recorder.skipped[name] += 1
+        return
+    recorder.record(name, response.status_code, time.perf_counter() - started)
+
+
+async def fake_calls(fake: httpx.AsyncClient) -> Counter:
+    return Counter((await fake.get('/_fake/stats')).json()['calls'])
+
+
+async def calibrate(ctx: LoadContext, client: httpx.AsyncClient, fake: httpx.AsyncClient, requests_per_operation: int) -> Dict:
+    """Chamadas ao Google por requisição de cada rota, medidas com requisições sequenciais."""
+    calibration = {}
+    recorder = Recorder()
+    for name in OPERATIONS:
+        before = await fake_calls(fake)
+        executed = 0
+        for _ in range(requests_per_operation * 3):
+            count = sum(recorder.statuses[name].values())
+            await run_operation(ctx, client, recorder, name)
+            if sum(recorder.statuses[name].values()) > count:
+                executed += 1
+            if executed >= requests_per_operation:
+                break
+        delta = await fake_calls(fake) - before
+        calibration[name] = {
+            'requests': executed,
+            'upstream_calls_per_request': round(sum(delta.values()) / executed, 2) if executed else None,
+            'by_method': {method: round(count / executed, 2) for method, count in sorted(delta.items())} if executed else {},
+        }
+    return calibration
+
+
+async def run_load(ctx: LoadContext, client: httpx.AsyncClient, mix: Dict[str, int], duration: float, concurrency: int) -> Recorder:
+    recorder = Recorder()
+    names, weights = list(mix), list(mix.values())
+    deadline = time.monotonic() + duration
+
+    async def worker():
+        while time.monotonic() < deadline:
+            await run_operation(ctx, client, recorder, ctx.rng.choices(names, weights)[0])
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return recorder
+
+
+def summarize(recorder: Recorder, elapsed: float, calibration: Dict, upstream: Counter) -> Dict:
+    endpoints = {}
+    total = 0
+    for name in OPERATIONS:
+        latencies = recorder.latencies.get(name, [])
+        statuses = recorder.statuses.get(name, Counter())
+        total += len(latencies)
+        # Erros: 5xx e falhas de conexão/timeout. Respostas 4xx (conflito de horário, evento já
+        # removido por outra série) são respostas de negócio esperadas e contam à parte.
+        errors = sum(count for status, count in statuses.items() if not isinstance(status, int) or status >= 500)
+        rejected = sum(count for status, count in statuses.items() if isinstance(status, int) and 400 <= status < 500)
+        endpoints[name] = {
+            'requests': len(latencies),
+            'throughput_rps': round(len(latencies) / elapsed, 2),
+            'errors': errors,
+            'rejected_4xx': rejected,
+            'statuses': {str(status): count for status, count in sorted(statuses.items(), key=lambda item: str(item[0]))},
+            'skipped_no_event': recorder.skipped.get(name, 0),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+            'upstream_calls_per_request': calibration.get(name, {}).get('upstream_calls_per_request'),
+        }
+    all_latencies = [value for values in recorder.latencies.values() for value in values]
+    return {
+        'elapsed_seconds': round(elapsed, 2),
+        'requests': total,
+        'throughput_rps': round(total / elapsed, 2),
+        'p50_ms': round(percentile(all_latencies, 0.50) * 1000, 1) if all_latencies else None,
+        'p95_ms': round(percentile(all_latencies, 0.95) * 1000, 1) if all_latencies else None,
+        'p99_ms': round(percentile(all_latencies, 0.99) * 1000, 1) if all_latencies else None,
+        'upstream_calls': dict(sorted(upstream.items())),
+        'upstream_calls_per_request': round(sum(upstream.values()) / total, 2) if total else None,
+        'endpoints': endpoints,
+        'calibration': calibration,
+    }
+
+
+def print_report(summary: Dict):
+    print(f"\n{'rota':<26}{'req':>7}{'req/s':>8}{'erros':>7}{'4xx':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'Google/req':>12}")
+    for name, stats in summary['endpoints'].items():
+        cells = [f"{stats[key]:>9}" if stats[key] is not None else f"{'-':>9}" for key in ('p50_ms', 'p95_ms', 'p99_ms')]
+        per_request = stats['upstream_calls_per_request']
+        print(f"{name:<26}{stats['requests']:>7}{stats['throughput_rps']:>8}{stats['errors']:>7}{stats['rejected_4xx']:>6}{''.join(cells)}{per_request if per_request is not None else '-':>12}")
+    print(
+        f"\ntotal: {summary['requests']} requisições em {summary['elapsed_seconds']}s ({summary['throughput_rps']} req/s),"
+        f" p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, p99 {summary['p99_ms']} ms"
+    )
+    print(f"chamadas ao Google durante a carga: {summary['upstream_calls_per_request']} por requisição {summary['upstream_calls']}")
+
+
+def parse_mix(value: Optional[str]) -> Dict[str, int]:
+    if not value:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in OPERATIONS:
+            raise SystemExit(f"Operação desconhecida em --mix: {name}")
+        mix[name.strip()] = int(weight)
+    return mix
+
+
+async def main_async(args):
+    ctx = LoadContext(args.workdir, args.app, args.fake, args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=ctx.app_url, timeout=args.timeout, limits=limits) as client, \
+            httpx.AsyncClient(base_url=ctx.fake_url, timeout=10) as fake:
+        # Popula a agenda e aquece a aplicação (timezones, credenciais, espelho) antes de medir.
+        warmup = Recorder()
+        for _ in range(args.warmup_bookings):
+            await run_operation(ctx, client, warmup, ctx.rng.choice(('create_event', 'create_recurring_event')))
+        for _ in range(len(ctx.courts) * 3):
+            await op_find_events(ctx, client, ctx.admin)
+
+        calibration = await calibrate(ctx, client, fake, args.calibration_requests)
+        before = await fake_calls(fake)
+        started = time.perf_counter()
+        recorder = await run_load(ctx, client, parse_mix(args.mix), args.duration, args.concurrency)
+        elapsed = time.perf_counter() - started
+        upstream = await fake_calls(fake) - before
+
+    summary = summarize(recorder, elapsed, calibration, upstream)
+    print_report(summary)
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--workdir', default='loadtest_run')
+    arg_parser.add_argument('--app', default='http://127.0.0.1:8000')
+    arg_parser.add_argument('--fake', default='http://127.0.0.1:8081')
+    arg_parser.add_argument('--duration', type=float, default=60.0)
+    arg_parser.add_argument('--concurrency', type=int, default=16)
+    arg_parser.add_argument('--mix', help='pesos, ex.: find_events=50,create_event=10 (padrão: DEFAULT_MIX)')
+    arg_parser.add_argument('--calibration-requests', type=int, default=5)
+    arg_parser.add_argument('--warmup-bookings', type=int, default=40)
+    arg_parser.add_argument('--timeout', type=float, default=30.0)
+    arg_parser.add_argument('--seed', type=int, default=42)
+    arg_parser.add_argument('--json-out')
+    asyncio.run(main_async(arg_parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -6,50 +6,19 @@ import logging.config # Import logging config
 import threading
 from dotenv import load_dotenv
 
+# Load .env before src.config reads config.yaml (CONFIG_PATH may come from it)
+load_dotenv()
+from src.log_pipeline import build_logging_config, remove_console_handler
+
 # --- Centralized Logging Configuration --- 
 # Get project directory for absolute log path
 project_dir_for_log = os.path.dirname(os.path.abspath(__file__))
 log_file_path = os.path.join(project_dir_for_log, 'calendar_mcp.log')
 
 # Define the logging configuration dictionary
-LOGGING_CONFIG = { 
-    'version': 1,
-    'disable_existing_loggers': False, # Let FastAPI/Uvicorn use this config
-    'formatters': { 
-        'default': { 
-            'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        },
-    },
-    'handlers': { 
-        'default': { # Console handler (used when not in MCP mode)
-            'formatter': 'default',
-            'class': 'logging.StreamHandler',
-            'stream': 'ext://sys.stderr',
-        },
-        'file': { # File handler (always used)
-            'formatter': 'default',
-            'class': 'logging.FileHandler',
-            'filename': log_file_path, # Use absolute path
-            'mode': 'a', # Append mode
-        },
-    },
-    'loggers': { 
-        '': { # Root logger
-            'handlers': ['default', 'file'], # Start with both
-            'level': 'INFO',
-        },
-        'uvicorn.error': { 
-            'level': 'INFO', # Capture uvicorn errors
-            'handlers': ['default', 'file'],
-            'propagate': False,
-        },
-        'uvicorn.access': { 
-            'level': 'WARNING', # Reduce access log noise if desired
-            'handlers': ['default', 'file'],
-            'propagate': False,
-        },
-    }
-} 
+# Every logger writes to a queue; a background thread does the I/O (text to the console,
+# JSON lines to the rotating log file). See the 'logging' section of config.yaml.
+LOGGING_CONFIG = build_logging_config(log_file_path)
 
 # --- Force Reset Existing Handlers --- 
 # Get the root logger
@@ -72,20 +41,10 @@ logger.info(f"Logging configured. Log file path: {log_file_path}") # Log the pat
 
 # Function to run the MCP server in a separate thread
 def run_mcp_server():
-    # Remove ONLY the console/stream handler for the MCP thread to keep stdio clean
-    root_logger = logging.getLogger()
-    handler_to_remove = None
-    for handler in root_logger.handlers:
-        if isinstance(handler, logging.StreamHandler):
-            handler_to_remove = handler
-            break # Found the console handler, stop looking
+    # Remove ONLY the console handler for the MCP thread to keep stdio clean
+    logger.info("MCP Mode: Removing console handler")
+    remove_console_handler()
 
-    if handler_to_remove:
-        logger.info(f"MCP Mode: Removing console handler {handler_to_remove}")
-        root_logger.removeHandler(handler_to_remove)
-    else:
-        logger.warning("MCP Mode: Console handler (StreamHandler) not found to remove.")
-        
     # Import and run MCP server
     from src.mcp_bridge import create_mcp_server
     mcp = create_mcp_server()
@@ -119,14 +78,6 @@ if __name__ == "__main__":
         logger.info("MCP server thread launched")
     else:
         logger.info("Running in HTTP-only mode (stdin is a TTY)")
-        # Ensure console handler is present if we started in HTTP mode
-        root_logger = logging.getLogger()
-        has_console = any(isinstance(h, logging.StreamHandler) for h in root_logger.handlers)
-        if not has_console:
-            logger.warning("Console handler missing in HTTP mode, adding default.")
-            console_handler = logging.StreamHandler(sys.stderr)
-            console_handler.setFormatter(logging.Formatter(LOGGING_CONFIG['formatters']['default']['format']))
-            root_logger.addHandler(console_handler)
 
     # FastAPI/Uvicorn settings
     host = os.getenv("HOST", "127.0.0.1")
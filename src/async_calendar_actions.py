@@ -0,0 +1,361 @@
+# src/async_calendar_actions.py
+"""
+Versões assíncronas das operações de calendar_actions, sobre o AsyncCalendarClient.
+
+Chamadas independentes (quadras dependentes, janelas de freebusy, inserts de uma série) rodam
+em paralelo em vez de em sequência. Quando o espelho local acompanha a quadra, a operação usa o
+caminho síncrono (em uma thread do threadpool), que já lê do espelho sem ir ao Google.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from dateutil import parser
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
+
+from .async_calendar_client import AsyncCalendarClient, BatchOperation, gather_limited
+from .calendar_actions import (
+    BATCH_CHUNK_SIZE, BLOCK_MARKER, FREEBUSY_MAX_ITEMS, FREEBUSY_MAX_SPAN,
+    build_create_result, build_event_body, build_potential_slots, cached_calendar_name, compute_block_envelopes,
+    compute_block_updates_on_delete, count_batches, get_dependent_calendar_ids, group_events_by_source,
+    hold_queued_blocks, match_conflict_summaries, prime_calendar_name, split_busy_by_day,
+    create_event, delete_event, get_availability, get_availability_matrix,
+)
+from .block_queue import get_block_queue
+from .calendar_mirror import get_mirror, note_calendar_writes
+from .interval_index import IntervalIndex
+from .models import ActionResponse, EventCreateRequest
+from .reservations import RESERVED_REASON, reserve_slots
+from .metrics import google_method_name
+from .upstream import Priority, prioritized, retry_reason, upstream_priority, wait_before_batch_retry_async
+
+logger = logging.getLogger(__name__)
+
+
+def _mirror_tracks(*calendar_ids: str) -> bool:
+    mirror = get_mirror()
+    return mirror is not None and any(mirror.is_tracked(calendar_id) for calendar_id in calendar_ids)
+
+
+async def _execute_batch_async(
+    client: AsyncCalendarClient, operations: List[Tuple[str, BatchOperation]], chunk_size: int = BATCH_CHUNK_SIZE
+) -> Dict[str, Tuple[Optional[Dict], Optional[Exception]]]:
+    """Versão assíncrona de _execute_batch: mesmos blocos, mesma repetição das operações recusadas dentro do batch."""
+    results: Dict[str, Tuple[Optional[Dict], Optional[Exception]]] = {}
+
+    if len(operations) == 1:
+        operation_id, operation = operations[0]
+        try:
+            results[operation_id] = (await client.execute(operation), None)
+        except Exception as e:
+            results[operation_id] = (None, e)
+        return results
+
+    for i in range(0, len(operations), chunk_size):
+        pending, attempt = operations[i:i + chunk_size], 0
+        while pending:
+            try:
+                results.update(await client.batch(pending))
+            except Exception as e:
+                logger.error(f"Falha ao executar batch com {len(pending)} requisições: {e}")
+                for operation_id, _ in pending:
+                    results[operation_id] = (None, e)
+                break
+            failures = [
+                (operation_id, operation, google_method_name(operation.api_method), results[operation_id][1])
+                for operation_id, operation in pending if results[operation_id][1] is not None
+            ]
+            retryable = [failure for failure in failures if retry_reason(failure[2], failure[3])]
+            if not retryable or not await wait_before_batch_retry_async([(method, error) for _, _, method, error in retryable], attempt):
+                break
+            pending = [(operation_id, operation) for operation_id, operation, _, _ in retryable]
+            attempt += 1
+
+    count_batches(len(operations), chunk_size)
+    return results
+
+
+async def _get_calendar_name_async(client: AsyncCalendarClient, calendar_id: str) -> str:
+    cached = cached_calendar_name(calendar_id)
+    if cached is not None:
+        return cached
+    try:
+        calendar = await client.calendars_get(calendar_id)
+        summary = calendar.get('summary', calendar_id)
+        prime_calendar_name(calendar_id, summary)
+        return summary
+    except HttpError:
+        return calendar_id
+
+
+async def _list_blocks_async(client: AsyncCalendarClient, calendar_id: str, time_min: datetime, time_max: datetime) -> List[Dict]:
+    return await client.events_list_all(
+        calendar_id,
+        timeMin=time_min.isoformat(),
+        timeMax=time_max.isoformat(),
+        sharedExtendedProperty=BLOCK_MARKER,
+        singleEvents=True,
+        maxResults=2500,
+    )
+
+
+# --- Disponibilidade ---
+async def _query_busy_intervals_multi_async(
+    client: AsyncCalendarClient, calendar_ids: List[str], time_min: datetime, time_max: datetime
+) -> Tuple[Dict[str, List[Tuple[datetime, datetime]]], Dict[str, str]]:
+    """Como _query_busy_intervals_multi, mas com todas as consultas (grupos × janelas) em paralelo."""
+    queries = []
+    for i in range(0, len(calendar_ids), FREEBUSY_MAX_ITEMS):
+        chunk = calendar_ids[i:i + FREEBUSY_MAX_ITEMS]
+        window_start = time_min
+        while window_start < time_max:
+            window_end = min(window_start + FREEBUSY_MAX_SPAN, time_max)
+            queries.append((chunk, {"timeMin": window_start.isoformat(), "timeMax": window_end.isoformat(), "items": [{"id": calendar_id} for calendar_id in chunk]}))
+            window_start = window_end
+
+    results = await gather_limited(client.freebusy_query(body) for _, body in queries)
+
+    busy: Dict[str, list] = {calendar_id: [] for calendar_id in calendar_ids}
+    errors: Dict[str, str] = {}
+    for (chunk, _), result in zip(queries, results):
+        calendars_data = result.get('calendars', {})
+        for calendar_id in chunk:
+            data = calendars_data.get(calendar_id, {})
+            if data.get('errors'):
+                errors.setdefault(calendar_id, data['errors'][0].get('reason', 'desconhecido'))
+            for interval in data.get('busy', []):
+                busy[calendar_id].append((parser.isoparse(interval['start']), parser.isoparse(interval['end'])))
+    merged = {calendar_id: IntervalIndex.from_intervals(intervals).merged() for calendar_id, intervals in busy.items()}
+    return merged, errors
+
+
+@prioritized(Priority.INTERACTIVE)
+async def get_availability_async(credentials: Credentials, calendar_id: str, time_min: datetime, time_max: datetime) -> List[Dict[str, datetime]]:
+    """Versão assíncrona de get_availability."""
+    if _mirror_tracks(calendar_id):
+        return await run_in_threadpool(get_availability, credentials, calendar_id, time_min, time_max)
+
+    client = AsyncCalendarClient(credentials)
+    logger.info("Verificando disponibilidade para o calendário '%s' entre %s e %s", calendar_id, time_min, time_max)
+    try:
+        result = await client.freebusy_query({"timeMin": time_min.isoformat(), "timeMax": time_max.isoformat(), "items": [{"id": calendar_id}]})
+    except HttpError as e:
+        logger.error(f"Erro na chamada da API freebusy.query: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno ao consultar a API do Google Calendar.")
+
+    calendar_data = result.get('calendars', {}).get(calendar_id, {})
+    if calendar_data.get('errors'):
+        error_details = calendar_data['errors'][0].get('reason', 'desconhecido')
+        logger.error(f"API do Google retornou um erro ao buscar disponibilidade: {error_details}")
+        raise HTTPException(status_code=404, detail=f"Não foi possível obter informações para a quadra selecionada (motivo: {error_details}).")
+
+    parsed_intervals = [
+        {"start": parser.isoparse(interval['start']), "end": parser.isoparse(interval['end'])}
+        for interval in calendar_data.get('busy', [])
+    ]
+    logger.info("Encontrados %d horários ocupados.", len(parsed_intervals))
+    return parsed_intervals
+
+
+@prioritized(Priority.INTERACTIVE)
+async def get_availability_matrix_async(
+    credentials: Credentials, day_windows: Dict[str, List[Tuple[date, datetime, datetime]]]
+) -> Dict[str, Dict[str, Any]]:
+    """Versão assíncrona de get_availability_matrix."""
+    if _mirror_tracks(*day_windows):
+        return await run_in_threadpool(get_availability_matrix, credentials, day_windows)
+
+    client = AsyncCalendarClient(credentials)
+    calendar_ids = [calendar_id for calendar_id, windows in day_windows.items() if windows]
+    busy_by_calendar, errors = {}, {}
+    if calendar_ids:
+        time_min = min(day_windows[calendar_id][0][1] for calendar_id in calendar_ids)
+        time_max = max(day_windows[calendar_id][-1][2] for calendar_id in calendar_ids)
+        logger.info("Verificando disponibilidade de %d quadra(s) entre %s e %s", len(calendar_ids), time_min, time_max)
+        try:
+            busy_by_calendar, errors = await _query_busy_intervals_multi_async(client, calendar_ids, time_min, time_max)
+        except HttpError as e:
+            logger.error(f"Erro na chamada da API freebusy.query: {e}")
+            raise HTTPException(status_code=500, detail="Erro interno ao consultar a API do Google Calendar.")
+
+    return split_busy_by_day(busy_by_calendar, errors, day_windows)
+
+
+# --- Blocos nas quadras dependentes ---
+async def _apply_block_changes_async(client: AsyncCalendarClient, dep_cal_id: str, inserts: List[Dict],
+                                     patches: List[Tuple[str, Dict]], deletes: List[str], context: str):
+    operations = (
+        [client.events_insert(dep_cal_id, body) for body in inserts]
+        + [client.events_patch(dep_cal_id, block_id, body) for block_id, body in patches]
+        + [client.events_delete(dep_cal_id, block_id) for block_id in deletes]
+    )
+    for result in await gather_limited(operations, return_exceptions=True):
+        if isinstance(result, Exception):
+            logger.error(f"ERRO ao {context} bloco em {dep_cal_id}: {result}")
+
+
+@prioritized(Priority.BACKGROUND)
+async def _update_or_create_blocking_events_bulk_async(client: AsyncCalendarClient, primary_events: List[Dict], settings: dict) -> int:
+    """Como _update_or_create_blocking_events_bulk, com cada quadra dependente tratada em paralelo."""
+
+    async def _update_dependent(dep_cal_id: str, events: List[Dict], main_calendar_name: str, span_start: datetime, span_end: datetime) -> bool:
+        try:
+            existing_blocks = await _list_blocks_async(client, dep_cal_id, span_start, span_end)
+        except Exception as e:
+            logger.error(f"ERRO ao buscar blocos existentes em {dep_cal_id}: {e}")
+            return False
+        inserts, patches, deletes = compute_block_envelopes(existing_blocks, events, main_calendar_name)
+        logger.info(f"Blocos em {dep_cal_id}: {len(inserts)} novo(s), {len(patches)} atualizado(s), {len(deletes)} removido(s).")
+        await _apply_block_changes_async(client, dep_cal_id, inserts, patches, deletes, 'criar/atualizar')
+        return True
+
+    tasks = []
+    for source_calendar_id, events in group_events_by_source(primary_events).items():
+        dependent_calendar_ids = get_dependent_calendar_ids(source_calendar_id, settings)
+        if not dependent_calendar_ids:
+            continue
+        main_calendar_name = await _get_calendar_name_async(client, source_calendar_id)
+        span_start = min(parser.isoparse(event['start']['dateTime']) for event in events)
+        span_end = max(parser.isoparse(event['end']['dateTime']) for event in events)
+        tasks.extend(_update_dependent(dep_cal_id, events, main_calendar_name, span_start, span_end) for dep_cal_id in dependent_calendar_ids)
+
+    return sum(await asyncio.gather(*tasks))
+
+
+@prioritized(Priority.BACKGROUND)
+async def _handle_block_updates_on_delete_bulk_async(client: AsyncCalendarClient, deleted_events: List[Dict], settings: dict):
+    """Como _handle_block_updates_on_delete_bulk, com cada quadra dependente tratada em paralelo."""
+
+    async def _update_dependent(dep_cal_id: str, deleted_event_ids: set, search_start: datetime, search_end: datetime):
+        try:
+            blocks_in_range = await _list_blocks_async(client, dep_cal_id, search_start, search_end)
+        except Exception as e:
+            logger.error(f"Erro ao processar atualização de bloqueio em {dep_cal_id} após exclusão: {e}")
+            return
+        patches, deletes = compute_block_updates_on_delete(blocks_in_range, deleted_event_ids, dep_cal_id)
+        await _apply_block_changes_async(client, dep_cal_id, [], patches, deletes, 'atualizar após exclusão o')
+
+    tasks = []
+    for source_calendar_id, events in group_events_by_source(deleted_events).items():
+        deleted_event_ids = {event['id'] for event in events}
+        search_start = min(parser.isoparse(event['start']['dateTime']) for event in events) - timedelta(hours=12)
+        search_end = max(parser.isoparse(event['end']['dateTime']) for event in events) + timedelta(hours=12)
+        tasks.extend(
+            _update_dependent(dep_cal_id, deleted_event_ids, search_start, search_end)
+            for dep_cal_id in get_dependent_calendar_ids(source_calendar_id, settings)
+        )
+    await asyncio.gather(*tasks)
+
+
+# --- Ações ---
+async def _fetch_conflict_summaries_async(client: AsyncCalendarClient, calendar_id: str, conflicting_slots: List[Dict[str, datetime]]) -> List[str]:
+    if not conflicting_slots:
+        return []
+    try:
+        candidate_events = await client.events_list_all(
+            calendar_id,
+            timeMin=min(slot['start'] for slot in conflicting_slots).isoformat(),
+            timeMax=max(slot['end'] for slot in conflicting_slots).isoformat(),
+            singleEvents=True,
+            orderBy='startTime',
+            maxResults=2500,
+        )
+        return match_conflict_summaries(candidate_events, conflicting_slots)
+    except Exception as e:
+        logger.warning(f"Não foi possível obter os títulos dos eventos em conflito em {calendar_id}: {e}")
+        return ["Evento existente"] * len(conflicting_slots)
+
+
+async def create_event_async(
+    credentials: Credentials,
+    event_data: EventCreateRequest,
+    calendar_id: str,
+    user_info: Dict[str, Any],
+    settings: dict,
+    send_notifications: bool = True
+) -> Dict[str, Any]:
+    """Versão assíncrona de create_event: as ocorrências livres são inseridas em paralelo."""
+    if _mirror_tracks(calendar_id):
+        return await run_in_threadpool(create_event, credentials, event_data, calendar_id, user_info, settings, send_notifications)
+
+    client = AsyncCalendarClient(credentials)
+    series_id = str(uuid.uuid4()) if event_data.frequency and event_data.frequency != 'none' else None
+    potential_slots = build_potential_slots(event_data)
+
+    # Reserva no livro do processo, como em create_event: horários sobrepostos a outra solicitação
+    # em andamento são recusados sem ida ao Google.
+    dependent_calendar_ids = get_dependent_calendar_ids(calendar_id, settings)
+    with reserve_slots(calendar_id, potential_slots, dependent_calendar_ids) as reservation:
+        conflict_reasons = {potential_slots[index]['start']: RESERVED_REASON for index in reservation.rejected}
+        reserved_slots = [potential_slots[index] for index in reservation.accepted]
+
+        if reserved_slots:
+            try:
+                busy, _ = await _query_busy_intervals_multi_async(
+                    client, [calendar_id],
+                    min(slot['start'] for slot in reserved_slots),
+                    max(slot['end'] for slot in reserved_slots)
+                )
+                busy_index = IntervalIndex.from_intervals(busy[calendar_id])
+                conflicting_slots = [slot for slot in reserved_slots if busy_index.overlaps(slot['start'], slot['end'])]
+                conflict_reasons.update(zip(
+                    (slot['start'] for slot in conflicting_slots),
+                    await _fetch_conflict_summaries_async(client, calendar_id, conflicting_slots)
+                ))
+            except Exception as e:
+                conflict_reasons.update({slot['start']: f"Erro interno no servidor: {e}" for slot in reserved_slots})
+
+        free_indexes = [index for index, slot in enumerate(potential_slots) if slot['start'] not in conflict_reasons]
+        # Uma série inteira cede a cota às leituras interativas.
+        with upstream_priority(Priority.BACKGROUND if series_id else Priority.NORMAL):
+            insert_results = await _execute_batch_async(client, [
+                (
+                    str(index),
+                    client.events_insert_operation(
+                        calendar_id, build_event_body(event_data, potential_slots[index], user_info, series_id),
+                        sendNotifications=send_notifications,
+                    ),
+                )
+                for index in free_indexes
+            ])
+
+        created_events, result = build_create_result(potential_slots, conflict_reasons, insert_results)
+
+        if created_events:
+            block_queue = get_block_queue()
+            if block_queue is not None:
+                await run_in_threadpool(block_queue.enqueue, calendar_id, upserted=created_events)
+                hold_queued_blocks(reservation, insert_results)
+            else:
+                await _update_or_create_blocking_events_bulk_async(client, created_events, settings)
+            note_calendar_writes([calendar_id] + dependent_calendar_ids)
+
+    return result
+
+
+async def delete_event_async(credentials: Credentials, event_id: str, calendar_id: str, settings: dict, send_notifications: bool = True) -> ActionResponse:
+    """Versão assíncrona de delete_event (o evento principal primeiro, depois os blocos dependentes)."""
+    if _mirror_tracks(calendar_id):
+        return await run_in_threadpool(delete_event, credentials, event_id, calendar_id, settings, send_notifications)
+
+    client = AsyncCalendarClient(credentials)
+    try:
+        event_to_delete = await client.events_get(calendar_id, event_id)
+    except HttpError:
+        raise HTTPException(status_code=404, detail="Evento a ser deletado não encontrado.")
+
+    # O principal é apagado primeiro: se falhar, os blocos das dependentes continuam intactos.
+    await client.events_delete(calendar_id, event_id, sendNotifications=send_notifications)
+    block_queue = get_block_queue()
+    if block_queue is not None:
+        await run_in_threadpool(block_queue.enqueue, calendar_id, removed=[event_to_delete])
+    else:
+        await _handle_block_updates_on_delete_bulk_async(client, [event_to_delete], settings)
+    note_calendar_writes([calendar_id] + get_dependent_calendar_ids(calendar_id, settings))
+    logger.info(f"Evento principal '{event_id}' deletado com sucesso.")
+    return ActionResponse(message="Agendamento removido e bloqueios atualizados com sucesso.")
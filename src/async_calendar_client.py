@@ -0,0 +1,271 @@
+# src/async_calendar_client.py
+import asyncio
+import json
+import logging
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from typing import Any, Awaitable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote, urlencode, urlsplit
+
+import httplib2
+import httpx
+from google.auth.transport.requests import Request
+from googleapiclient.errors import HttpError
+
+from .config import settings
+from .metrics import google_call, record_batched_requests
+from .upstream import call_upstream_async
+from .service_pool import get_api_base_url, get_api_batch_url
+
+logger = logging.getLogger(__name__)
+
+_async_config = settings.get('async_client', {})
+ASYNC_CLIENT_ENABLED = bool(_async_config.get('enabled', False))
+# Chamadas simultâneas ao Google disparadas por uma mesma operação (ex.: blocos em várias quadras).
+MAX_CONCURRENCY = _async_config.get('max_concurrency', 10)
+
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_base_url: Optional[str] = None
+_batch_url: Optional[str] = None
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Retorna o cliente httpx do processo: um pool de conexões HTTP/1.1 keep-alive compartilhado
+    por todas as requisições (e usuários), criado na primeira chamada dentro do event loop.
+    As conexões pertencem ao loop que as abriu; em outro loop (ex.: testes), um novo pool é criado.
+    """
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        _http_client_loop = loop
+        _http_client = httpx.AsyncClient(
+            http2=False,
+            timeout=httpx.Timeout(_async_config.get('timeout_seconds', 30)),
+            limits=httpx.Limits(
+                max_connections=_async_config.get('max_connections', 20),
+                max_keepalive_connections=_async_config.get('max_keepalive_connections', 10),
+            ),
+        )
+    return _http_client
+
+
+async def close_async_http_client():
+    """Fecha as conexões do pool (no shutdown da aplicação)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def _api_base_url() -> str:
+    global _base_url
+    if _base_url is None:
+        _base_url = get_api_base_url()
+    return _base_url
+
+
+def _api_batch_url() -> str:
+    global _batch_url
+    if _batch_url is None:
+        _batch_url = get_api_batch_url()
+    return _batch_url
+
+
+def _encode_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    # Como no googleapiclient: parâmetros None são omitidos e booleanos viram 'true'/'false'.
+    encoded = {}
+    for key, value in params.items():
+        if value is None:
+            continue
+        encoded[key] = ('true' if value else 'false') if isinstance(value, bool) else value
+    return encoded
+
+
+class BatchOperation(NamedTuple):
+    """Uma operação dentro de um batch: método da API (para métricas/repetições), verbo HTTP, caminho, parâmetros e corpo."""
+    api_method: str
+    method: str
+    path: str
+    params: Dict[str, Any]
+    body: Optional[Dict]
+
+
+def _http_error(status: int, headers, content: bytes, uri: str) -> HttpError:
+    return HttpError(httplib2.Response({'status': status, **headers}), content, uri=uri)
+
+
+def _parse_batch_response(content_type: str, content: bytes, uri: str) -> Dict[str, Tuple[Optional[Dict], Optional[HttpError]]]:
+    """Lê a resposta multipart/mixed do batch: {Content-ID da requisição: (resposta, HttpError)}."""
+    message = BytesParser(policy=HTTP).parsebytes(f'Content-Type: {content_type}\r\n\r\n'.encode() + content)
+    results = {}
+    for part in message.iter_parts():
+        # '<response-abc+3>' responde a '<abc+3>'.
+        content_id = part['Content-ID'].strip('<>').replace('response-', '', 1)
+        raw = part.get_payload(decode=True).replace(b'\r\n', b'\n')
+        status_line, _, rest = raw.partition(b'\n')
+        header_blob, _, body = rest.partition(b'\n\n')
+        status = int(status_line.split()[1])
+        headers = dict(line.decode().split(':', 1) for line in header_blob.splitlines() if b':' in line)
+        headers = {key.strip().lower(): value.strip() for key, value in headers.items()}
+        if status >= 400:
+            results[content_id] = (None, _http_error(status, headers, body, uri))
+        else:
+            results[content_id] = (json.loads(body) if body.strip() else {}, None)
+    return results
+
+
+async def gather_limited(coroutines: Iterable[Awaitable], limit: int = MAX_CONCURRENCY, return_exceptions: bool = False) -> List[Any]:
+    """asyncio.gather com no máximo 'limit' corrotinas em andamento ao mesmo tempo."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def _run(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(_run(coroutine) for coroutine in coroutines), return_exceptions=return_exceptions)
+
+
+class AsyncCalendarClient:
+    """
+    Cliente assíncrono (httpx) para as chamadas da Calendar API usadas pelo sistema:
+    events list/get/insert/patch/delete, freebusy.query e calendars.get.
+
+    Erros HTTP são lançados como googleapiclient.errors.HttpError, com o mesmo 'resp.status'
+    do caminho síncrono, para que o tratamento de erros das ações seja o mesmo nos dois caminhos.
+    """
+
+    def __init__(self, credentials, http_client: Optional[httpx.AsyncClient] = None, base_url: Optional[str] = None):
+        self.credentials = credentials
+        self._http = http_client or get_async_http_client()
+        self._base_url = base_url or _api_base_url()
+        self._refresh_lock = asyncio.Lock()
+
+    async def _authorization(self, force_refresh: bool = False) -> str:
+        if force_refresh or not self.credentials.valid:
+            async with self._refresh_lock:
+                if force_refresh or not self.credentials.valid:
+                    # A renovação do google-auth é bloqueante; roda fora do event loop.
+                    await asyncio.to_thread(self.credentials.refresh, Request())
+        return f"Bearer {self.credentials.token}"
+
+    async def _request(self, api_method: str, method: str, path: str, params: Optional[Dict] = None, body: Optional[Dict] = None) -> Dict:
+        url = self._base_url + path
+        params = _encode_params(params or {})
+        # Cota, prioridade e repetições: as mesmas do caminho síncrono (src/upstream.py).
+        return await call_upstream_async(api_method, lambda: self._send(api_method, method, url, params, body))
+
+    async def _send(self, api_method: str, method: str, url: str, params: Dict, body: Optional[Dict]) -> Dict:
+        response = None
+        for attempt in range(2):
+            headers = {'Authorization': await self._authorization(force_refresh=attempt > 0)}
+            with google_call(api_method) as call:
+                response = await self._http.request(method, url, params=params, json=body, headers=headers)
+                call.request_bytes = len(response.request.content)
+                call.response_bytes = len(response.content)
+                if response.status_code >= 400:
+                    call.status = response.status_code
+            # Um 401 com token aparentemente válido: renova uma vez e tenta de novo.
+            if response.status_code != 401:
+                break
+        if response.status_code >= 400:
+            raise _http_error(response.status_code, response.headers, response.content, str(response.url))
+        return response.json() if response.content else {}
+
+    # --- batch ---
+    async def batch(self, operations: List[Tuple[str, BatchOperation]]) -> Dict[str, Tuple[Optional[Dict], Optional[Exception]]]:
+        """
+        Envia as operações (id, BatchOperation) num único envelope do endpoint de batch do Google.
+        Retorna {id: (resposta, exceção)}; operações sem resposta no envelope recebem um erro.
+        A falha do envelope inteiro (após as repetições do agendador) é lançada.
+        """
+        boundary = f'batch_{uuid.uuid4().hex}'
+        base_id = uuid.uuid4().hex
+        base_path = urlsplit(self._base_url).path
+        parts = []
+        for index, (_, operation) in enumerate(operations):
+            path = base_path + operation.path
+            params = _encode_params(operation.params)
+            if params:
+                path += '?' + urlencode(params)
+            body = json.dumps(operation.body) if operation.body is not None else ''
+            parts.append(
+                f'--{boundary}\r\nContent-Type: application/http\r\nContent-Transfer-Encoding: binary\r\n'
+                f'Content-ID: <{base_id}+{index}>\r\n\r\n'
+                f'{operation.method} {path} HTTP/1.1\r\nContent-Type: application/json\r\n\r\n{body}\r\n'
+            )
+        payload = (''.join(parts) + f'--{boundary}--\r\n').encode()
+        record_batched_requests(operation.api_method for _, operation in operations)
+        responses = await call_upstream_async(
+            'batch', lambda: self._send_batch(payload, boundary, len(operations)), cost=len(operations)
+        )
+        results = {}
+        for index, (operation_id, operation) in enumerate(operations):
+            results[operation_id] = responses.get(
+                f'{base_id}+{index}', (None, _http_error(500, {}, b'missing batch response', operation.path))
+            )
+        return results
+
+    async def _send_batch(self, payload: bytes, boundary: str, operations: int) -> Dict[str, Tuple[Optional[Dict], Optional[HttpError]]]:
+        url = _api_batch_url()
+        response = None
+        for attempt in range(2):
+            headers = {
+                'Authorization': await self._authorization(force_refresh=attempt > 0),
+                'Content-Type': f'multipart/mixed; boundary="{boundary}"',
+            }
+            with google_call('batch', operations=operations) as call:
+                response = await self._http.post(url, content=payload, headers=headers)
+                call.request_bytes = len(payload)
+                call.response_bytes = len(response.content)
+                if response.status_code >= 400:
+                    call.status = response.status_code
+            if response.status_code != 401:
+                break
+        if response.status_code >= 400:
+            raise _http_error(response.status_code, response.headers, response.content, url)
+        return _parse_batch_response(response.headers.get('content-type', ''), response.content, url)
+
+    # --- events ---
+    async def events_list(self, calendar_id: str, **params) -> Dict:
+        return await self._request('events.list', 'GET', f"calendars/{quote(calendar_id, safe='')}/events", params=params)
+
+    async def events_list_all(self, calendar_id: str, **params) -> List[Dict]:
+        """events.list seguindo todas as páginas."""
+        items, page_token = [], None
+        while True:
+            response = await self.events_list(calendar_id, pageToken=page_token, **params)
+            items.extend(response.get('items', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return items
+
+    async def events_get(self, calendar_id: str, event_id: str, **params) -> Dict:
+        return await self._request('events.get', 'GET', f"calendars/{quote(calendar_id, safe='')}/events/{quote(event_id, safe='')}", params=params)
+
+    async def events_insert(self, calendar_id: str, body: Dict, **params) -> Dict:
+        return await self._request('events.insert', 'POST', f"calendars/{quote(calendar_id, safe='')}/events", params=params, body=body)
+
+    @staticmethod
+    def events_insert_operation(calendar_id: str, body: Dict, **params) -> BatchOperation:
+        """events.insert como operação de batch (ver batch)."""
+        return BatchOperation('events.insert', 'POST', f"calendars/{quote(calendar_id, safe='')}/events", params, body)
+
+    async def execute(self, operation: BatchOperation) -> Dict:
+        """Executa uma BatchOperation isolada (sem o envelope do batch)."""
+        return await self._request(operation.api_method, operation.method, operation.path, params=operation.params, body=operation.body)
+
+    async def events_patch(self, calendar_id: str, event_id: str, body: Dict, **params) -> Dict:
+        return await self._request('events.patch', 'PATCH', f"calendars/{quote(calendar_id, safe='')}/events/{quote(event_id, safe='')}", params=params, body=body)
+
+    async def events_delete(self, calendar_id: str, event_id: str, **params) -> Dict:
+        return await self._request('events.delete', 'DELETE', f"calendars/{quote(calendar_id, safe='')}/events/{quote(event_id, safe='')}", params=params)
+
+    # --- freebusy / calendars ---
+    async def freebusy_query(self, body: Dict) -> Dict:
+        return await self._request('freebusy.query', 'POST', 'freeBusy', body=body)
+
+    async def calendars_get(self, calendar_id: str) -> Dict:
+        return await self._request('calendars.get', 'GET', f"calendars/{quote(calendar_id, safe='')}")
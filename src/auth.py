@@ -1,27 +1,63 @@
 # Em src/auth.py - VERSÃO MODIFICADA E CORRETA
 import os
 import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
 from google.oauth2 import service_account
 from google.auth.exceptions import DefaultCredentialsError
+from google.auth.transport.requests import Request
 from .config import settings # Importar as configurações do seu projeto
 from typing import Optional
 
-KEY_FILE_PATH = 'service-account-key.json'
+# Caminho da chave da Conta de Serviço (pode ser trocado pela variável de ambiente SERVICE_ACCOUNT_KEY_FILE).
+KEY_FILE_PATH = os.environ.get('SERVICE_ACCOUNT_KEY_FILE', 'service-account-key.json')
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
 logger = logging.getLogger(__name__)
 
+# --- Cache de credenciais personificadas ---
+# Cada objeto 'with_subject' guarda o seu próprio token OAuth. Reutilizá-lo evita uma
+# ida ao endpoint de token por requisição; o renovador em segundo plano troca o token
+# antes de expirar, para que o caminho da requisição nunca espere pela renovação.
+_cache_config = settings.get('credentials_cache', {})
+CREDENTIALS_CACHE_MAX_ENTRIES = _cache_config.get('max_entries', 64)
+REFRESH_MARGIN = timedelta(seconds=_cache_config.get('refresh_margin_seconds', 300))
+REFRESH_INTERVAL_SECONDS = _cache_config.get('refresh_interval_seconds', 60)
+# Credenciais sem uso há mais tempo que isso deixam de ser renovadas (mas continuam no cache).
+REFRESH_IDLE_LIMIT = timedelta(seconds=_cache_config.get('refresh_idle_seconds', 3600))
+
+_base_credentials = None
+_credentials_cache = OrderedDict() # email -> {'credentials': ..., 'last_used': datetime}
+_credentials_lock = threading.Lock()
+_credentials_stats = {'hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_failures': 0, 'evictions': 0}
+_refresher_thread = None
+_refresher_stop = threading.Event()
+
+def _utcnow() -> datetime:
+    # O google-auth guarda 'expiry' como datetime UTC sem fuso.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _load_base_credentials():
+    """Lê o arquivo de chave uma única vez e guarda as credenciais base da Conta de Serviço."""
+    global _base_credentials
+    if _base_credentials is None:
+        if not os.path.exists(KEY_FILE_PATH):
+            logger.error(f"Arquivo de chave da Conta de Serviço não encontrado: '{KEY_FILE_PATH}'")
+            raise FileNotFoundError(f"O arquivo de chave '{KEY_FILE_PATH}' é necessário.")
+        _base_credentials = service_account.Credentials.from_service_account_file(
+            KEY_FILE_PATH, scopes=SCOPES
+        )
+    return _base_credentials
+
 def get_service_account_credentials(user_to_impersonate: Optional[str] = None):
     """
     Carrega as credenciais da Conta de Serviço e as prepara para
     personificar um usuário.
     - Se 'user_to_impersonate' for fornecido, usa esse email.
     - Caso contrário, usa o email padrão do config.yaml.
+    As credenciais são reaproveitadas entre requisições (cache LRU por email).
     """
-    if not os.path.exists(KEY_FILE_PATH):
-        logger.error(f"Arquivo de chave da Conta de Serviço não encontrado: '{KEY_FILE_PATH}'")
-        raise FileNotFoundError(f"O arquivo de chave '{KEY_FILE_PATH}' é necessário.")
-
     # --- INÍCIO DA ALTERAÇÃO ---
     # Se um e-mail não for passado diretamente para a função,
     # pegamos o e-mail do admin padrão do arquivo de configuração.
@@ -33,18 +69,90 @@ def get_service_account_credentials(user_to_impersonate: Optional[str] = None):
         logger.error("A chave 'impersonation_user_email' não foi encontrada no config.yaml e nenhum usuário foi fornecido.")
         raise ValueError("Email para personificação não configurado.")
 
-    try:
-        # Carrega as credenciais base do arquivo JSON
-        base_creds = service_account.Credentials.from_service_account_file(
-            KEY_FILE_PATH, scopes=SCOPES
-        )
-        
-        # Cria um novo objeto de credenciais que irá personificar o usuário especificado.
-        creds_with_subject = base_creds.with_subject(user_to_impersonate)
-        
-        logger.info(f"Credenciais da Conta de Serviço carregadas com sucesso e configuradas para personificar '{user_to_impersonate}'.")
-        return creds_with_subject
-        
-    except Exception as e:
-        logger.error(f"Falha ao carregar ou personificar as credenciais da Conta de Serviço: {e}", exc_info=True)
-        raise DefaultCredentialsError(f"Erro ao processar o arquivo de chave ou configurar a personificação: {e}")
\ No newline at end of file
+    with _credentials_lock:
+        entry = _credentials_cache.get(user_to_impersonate)
+        if entry is not None:
+            _credentials_cache.move_to_end(user_to_impersonate)
+            entry['last_used'] = _utcnow()
+            _credentials_stats['hits'] += 1
+            return entry['credentials']
+
+        try:
+            # Carrega as credenciais base do arquivo JSON (apenas na primeira vez)
+            base_creds = _load_base_credentials()
+
+            # Cria um novo objeto de credenciais que irá personificar o usuário especificado.
+            creds_with_subject = base_creds.with_subject(user_to_impersonate)
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            logger.error(f"Falha ao carregar ou personificar as credenciais da Conta de Serviço: {e}", exc_info=True)
+            raise DefaultCredentialsError(f"Erro ao processar o arquivo de chave ou configurar a personificação: {e}")
+
+        _credentials_stats['misses'] += 1
+        _credentials_cache[user_to_impersonate] = {'credentials': creds_with_subject, 'last_used': _utcnow()}
+        while len(_credentials_cache) > CREDENTIALS_CACHE_MAX_ENTRIES:
+            _credentials_cache.popitem(last=False)
+            _credentials_stats['evictions'] += 1
+
+    _ensure_refresher_started()
+    logger.info(f"Credenciais da Conta de Serviço carregadas com sucesso e configuradas para personificar '{user_to_impersonate}'.")
+    return creds_with_subject
+
+def _refresh_expiring_credentials(request: Request):
+    """Renova os tokens em uso que expiram dentro de REFRESH_MARGIN."""
+    now = _utcnow()
+    with _credentials_lock:
+        candidates = [
+            (email, entry['credentials']) for email, entry in _credentials_cache.items()
+            if now - entry['last_used'] <= REFRESH_IDLE_LIMIT
+        ]
+
+    for email, creds in candidates:
+        # Tokens ainda não emitidos são obtidos pela primeira chamada à API.
+        if not creds.token or creds.expiry is None or creds.expiry - now > REFRESH_MARGIN:
+            continue
+        try:
+            creds.refresh(request)
+            with _credentials_lock:
+                _credentials_stats['refreshes'] += 1
+        except Exception as e:
+            with _credentials_lock:
+                _credentials_stats['refresh_failures'] += 1
+            logger.warning(f"Falha ao renovar o token de '{email}' em segundo plano: {e}")
+
+def _refresher_loop():
+    request = Request()
+    while not _refresher_stop.wait(REFRESH_INTERVAL_SECONDS):
+        try:
+            _refresh_expiring_credentials(request)
+        except Exception as e:
+            logger.error(f"Erro no renovador de credenciais: {e}", exc_info=True)
+
+def _ensure_refresher_started():
+    global _refresher_thread
+    if _refresher_thread is not None and _refresher_thread.is_alive():
+        return
+    with _credentials_lock:
+        if _refresher_thread is None or not _refresher_thread.is_alive():
+            _refresher_stop.clear()
+            _refresher_thread = threading.Thread(target=_refresher_loop, name='credentials-refresher', daemon=True)
+            _refresher_thread.start()
+
+def stop_credentials_refresher():
+    """Interrompe o renovador em segundo plano (usado no desligamento e em testes)."""
+    _refresher_stop.set()
+
+def clear_credentials_cache():
+    """Descarta todas as credenciais em cache e a chave base carregada do disco."""
+    global _base_credentials
+    with _credentials_lock:
+        _credentials_cache.clear()
+        _base_credentials = None
+
+def get_credentials_cache_stats() -> dict:
+    """Retorna os contadores do cache de credenciais (hits, misses, refreshes, ...)."""
+    with _credentials_lock:
+        stats = dict(_credentials_stats)
+        stats['size'] = len(_credentials_cache)
+    return stats
@@ -0,0 +1,333 @@
+# src/block_queue.py
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from dateutil import parser
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS block_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_calendar_id TEXT NOT NULL,
+    action TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    window_start REAL NOT NULL,
+    window_end REAL NOT NULL,
+    enqueued_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_until REAL NOT NULL DEFAULT 0,
+    claimed_by TEXT,
+    last_error TEXT,
+    failed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_block_jobs_due ON block_jobs (failed, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_block_jobs_court ON block_jobs (source_calendar_id, claimed_until);
+"""
+
+UPSERT = 'upsert'
+REMOVE = 'remove'
+
+# processor(service, removed_events, upserted_events): aplica as mudanças nos blocos e propaga
+# qualquer falha (a fila reagenda o grupo inteiro; a reconciliação dos envelopes é idempotente).
+Processor = Callable[[object, List[Dict], List[Dict]], object]
+
+
+def _event_window(event: Dict) -> Optional[Tuple[float, float]]:
+    """Início/fim do evento em timestamps; eventos de dia inteiro não geram bloqueios (None)."""
+    try:
+        return parser.isoparse(event['start']['dateTime']).timestamp(), parser.isoparse(event['end']['dateTime']).timestamp()
+    except (KeyError, ValueError, TypeError):
+        return None
+
+
+def _clusters(jobs: List[tuple]) -> List[List[tuple]]:
+    """
+    Agrupa os jobs cujas janelas se sobrepõem ou que tratam do mesmo evento (transitivamente):
+    cada grupo vira uma atualização de envelope. Manter as versões de um evento juntas garante
+    que a remoção da versão antiga nunca seja aplicada depois da inserção da nova.
+    """
+    parent = list(range(len(jobs)))
+
+    def _find(index: int) -> int:
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    def _union(a: int, b: int):
+        parent[_find(a)] = _find(b)
+
+    by_start = sorted(range(len(jobs)), key=lambda index: jobs[index][5])
+    current, current_end = None, None
+    for index in by_start:
+        if current is not None and jobs[index][5] < current_end:
+            _union(index, current)
+            current_end = max(current_end, jobs[index][6])
+        else:
+            current, current_end = index, jobs[index][6]
+    first_by_event: Dict[str, int] = {}
+    for index, job in enumerate(jobs):
+        _union(index, first_by_event.setdefault(job[3], index))
+
+    clusters: Dict[int, List[tuple]] = {}
+    for index, job in enumerate(jobs):
+        clusters.setdefault(_find(index), []).append(job)
+    return list(clusters.values())
+
+
+def _coalesce(jobs: List[tuple]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Reduz as mudanças pendentes de um grupo a (removidos, inseridos): cada versão antiga de um
+    evento sai dos blocos, e a versão mais recente entra de novo só se a última mudança for um upsert.
+    """
+    removed: Dict[Tuple[str, float, float], Dict] = {}
+    latest: Dict[str, Tuple[str, Dict]] = {}
+    for _, _, action, event_id, payload, window_start, window_end in sorted(jobs):
+        event = json.loads(payload)
+        if action == REMOVE:
+            removed[(event_id, window_start, window_end)] = event
+        latest[event_id] = (action, event)
+    upserted = [event for action, event in latest.values() if action == UPSERT]
+    return list(removed.values()), upserted
+
+
+class BlockQueue:
+    """
+    Fila durável (SQLite) da manutenção dos blocos nas quadras dependentes.
+
+    A ação principal grava o evento no Google e só registra aqui a mudança (evento inserido ou
+    removido, com a quadra de origem e a janela do evento). Threads trabalhadoras consomem a fila:
+    as mudanças pendentes de uma mesma quadra com janelas sobrepostas são reduzidas a uma única
+    atualização de envelope. Cada quadra é reservada (com prazo) por um trabalhador de cada vez,
+    inclusive entre processos que compartilham o arquivo. Falhas voltam para a fila com backoff;
+    depois de 'max_attempts' o job fica marcado como falho (e continua no banco para inspeção).
+    """
+
+    def __init__(self, path: str, workers: int = 2, max_attempts: int = 8, lease_seconds: float = 120.0,
+                 poll_interval_seconds: float = 1.0, retry_base_seconds: float = 5.0, retry_max_seconds: float = 600.0):
+        self.path = path
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.lease_seconds = lease_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.stats = Counter()
+        self.last_lag_seconds = 0.0
+        with self._db_lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA busy_timeout=5000')
+            self._conn.executescript(_SCHEMA)
+
+    # --- Produtores ---
+    def enqueue(self, source_calendar_id: str, removed: Iterable[Dict] = (), upserted: Iterable[Dict] = ()) -> int:
+        """Registra as mudanças (removidos primeiro, como na execução imediata). Retorna quantos jobs entraram."""
+        now = time.time()
+        rows = []
+        for action, events in ((REMOVE, removed), (UPSERT, upserted)):
+            for event in events:
+                window = _event_window(event)
+                if window is None or not event.get('id'):
+                    continue
+                rows.append((source_calendar_id, action, event['id'], json.dumps(event), window[0], window[1], now, now))
+        if not rows:
+            return 0
+        with self._db_lock:
+            self._conn.executemany(
+                'INSERT INTO block_jobs (source_calendar_id, action, event_id, payload, window_start, window_end, enqueued_at, next_attempt_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows
+            )
+        self.stats['enqueued'] += len(rows)
+        self._wake.set()
+        return len(rows)
+
+    # --- Trabalhadores ---
+    def _claim(self) -> List[tuple]:
+        """
+        Reserva o grupo (mesma quadra, janelas sobrepostas) que contém o job vencido mais antigo.
+        Jobs da quadra ainda em espera de nova tentativa entram no grupo se tiverem relação com ele.
+        """
+        now = time.time()
+        with self._db_lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute(
+                    'SELECT source_calendar_id FROM block_jobs WHERE failed = 0 AND next_attempt_at <= ? AND source_calendar_id NOT IN '
+                    '(SELECT source_calendar_id FROM block_jobs WHERE claimed_until > ?) ORDER BY id LIMIT 1',
+                    (now, now)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute('COMMIT')
+                    return []
+                jobs = self._conn.execute(
+                    'SELECT id, source_calendar_id, action, event_id, payload, window_start, window_end FROM block_jobs '
+                    'WHERE source_calendar_id = ? AND failed = 0 ORDER BY id',
+                    (row[0],)
+                ).fetchall()
+                oldest = self._conn.execute(
+                    'SELECT MIN(id) FROM block_jobs WHERE source_calendar_id = ? AND failed = 0 AND next_attempt_at <= ?', (row[0], now)
+                ).fetchone()[0]
+                group = next(cluster for cluster in _clusters(jobs) if any(job[0] == oldest for job in cluster))
+                self._conn.executemany(
+                    'UPDATE block_jobs SET claimed_until = ?, claimed_by = ? WHERE id = ?',
+                    [(now + self.lease_seconds, self._owner, job[0]) for job in group]
+                )
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        return group
+
+    def _complete(self, jobs: List[tuple]):
+        ids = [job[0] for job in jobs]
+        placeholders = ','.join('?' * len(ids))
+        with self._db_lock:
+            self._conn.execute('BEGIN')
+            try:
+                # Só remove o que ainda é nosso: se a reserva expirou e outro trabalhador pegou o grupo, ele decide o destino
+                oldest = self._conn.execute(
+                    f"SELECT MIN(enqueued_at) FROM block_jobs WHERE id IN ({placeholders}) AND claimed_by = ?", [*ids, self._owner]
+                ).fetchone()[0]
+                deleted = self._conn.execute(
+                    f"DELETE FROM block_jobs WHERE id IN ({placeholders}) AND claimed_by = ?", [*ids, self._owner]
+                ).rowcount
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        self.last_lag_seconds = time.time() - oldest if oldest is not None else 0.0
+        self.stats['processed'] += deleted
+        self.stats['envelope_updates'] += 1
+        self.stats['coalesced'] += max(deleted - 1, 0)
+
+    def _reschedule(self, jobs: List[tuple], error: Exception):
+        now = time.time()
+        gave_up = 0
+        rescheduled = 0
+        with self._db_lock:
+            self._conn.execute('BEGIN')
+            try:
+                for job in jobs:
+                    row = self._conn.execute(
+                        'SELECT attempts FROM block_jobs WHERE id = ? AND claimed_by = ?', (job[0], self._owner)
+                    ).fetchone()
+                    if row is None:
+                        # Job removido ou reservado por outro trabalhador depois que a nossa reserva expirou
+                        continue
+                    attempts = row[0] + 1
+                    failed = int(attempts >= self.max_attempts)
+                    gave_up += failed
+                    rescheduled += 1
+                    delay = random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** (attempts - 1)))
+                    self._conn.execute(
+                        'UPDATE block_jobs SET attempts = ?, next_attempt_at = ?, claimed_until = 0, claimed_by = NULL, last_error = ?, failed = ? '
+                        'WHERE id = ? AND claimed_by = ?',
+                        (attempts, now + delay, repr(error)[:500], failed, job[0], self._owner)
+                    )
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        self.stats['retries'] += rescheduled - gave_up
+        self.stats['gave_up'] += gave_up
+        if gave_up:
+            logger.error(f"Fila de blocos: {gave_up} mudança(s) em {jobs[0][1]} marcadas como falhas após {self.max_attempts} tentativas: {error}")
+        else:
+            logger.warning(f"Fila de blocos: falha ao atualizar os blocos de {jobs[0][1]} ({len(jobs)} mudança(s)); nova tentativa agendada: {error}")
+
+    def _run(self, service_factory: Callable[[], object], processor: Processor):
+        while not self._stop.is_set():
+            try:
+                jobs = self._claim()
+            except Exception as e:
+                logger.error(f"Fila de blocos: falha ao ler a fila: {e}")
+                jobs = []
+            if not jobs:
+                self._wake.wait(self.poll_interval_seconds)
+                self._wake.clear()
+                continue
+            removed, upserted = _coalesce(jobs)
+            try:
+                processor(service_factory(), removed, upserted)
+            except Exception as e:
+                self._reschedule(jobs, e)
+                continue
+            self._complete(jobs)
+
+    def start(self, service_factory: Callable[[], object], processor: Processor):
+        """Inicia as threads trabalhadoras ('service_factory' devolve um serviço do Calendar)."""
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, args=(service_factory, processor), name=f'block-queue-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """Encerra os trabalhadores; os jobs pendentes ficam no banco para a próxima execução."""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    def get_stats(self) -> dict:
+        now = time.time()
+        with self._db_lock:
+            depth, oldest, failed, in_flight = self._conn.execute(
+                'SELECT SUM(failed = 0), MIN(CASE WHEN failed = 0 THEN enqueued_at END), SUM(failed = 1), SUM(claimed_until > ?) FROM block_jobs',
+                (now,)
+            ).fetchone()
+        return {
+            'depth': depth or 0,
+            'lag_seconds': round(now - oldest, 3) if oldest is not None else 0.0,
+            'in_flight': in_flight or 0,
+            'failed': failed or 0,
+            'last_completed_lag_seconds': round(self.last_lag_seconds, 3),
+            'workers': len(self._threads),
+            **self.stats,
+        }
+
+
+_queue_config = settings.get('block_queue', {})
+_queue: Optional[BlockQueue] = None
+if _queue_config.get('enabled'):
+    _queue = BlockQueue(
+        path=_queue_config.get('path', 'block_queue.sqlite3'),
+        workers=_queue_config.get('workers', 2),
+        max_attempts=_queue_config.get('max_attempts', 8),
+        lease_seconds=_queue_config.get('lease_seconds', 120),
+        poll_interval_seconds=_queue_config.get('poll_interval_seconds', 1.0),
+        retry_base_seconds=_queue_config.get('retry_base_seconds', 5),
+        retry_max_seconds=_queue_config.get('retry_max_seconds', 600),
+    )
+    logger.info(f"Fila de manutenção de blocos ativada em '{_queue.path}'.")
+
+
+def get_block_queue() -> Optional[BlockQueue]:
+    """Retorna a fila de blocos, ou None se 'block_queue.enabled' estiver desligado (manutenção imediata)."""
+    return _queue
+
+
+def get_block_queue_stats() -> dict:
+    """Profundidade, atraso do job mais antigo, falhas e contadores da fila de blocos."""
+    if _queue is None:
+        return {'enabled': False}
+    return {'enabled': True, **_queue.get_stats()}
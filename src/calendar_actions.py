@@ -1,12 +1,17 @@
+import base64
+import binascii
+import contextvars
 import logging
+import math
+import queue
+import threading
 import uuid
 import pytz
 from datetime import datetime, date, timedelta, time, timezone
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Iterator, Tuple, Union
 from dateutil import parser
 import json
 
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from google.oauth2.credentials import Credentials
 from fastapi import HTTPException
@@ -22,6 +27,16 @@ from .models import (
     CalendarListEntry,
     ActionResponse
 )
+from .config import as_compiled
+from .service_pool import get_calendar_service
+from .interval_index import IntervalIndex
+from .calendar_mirror import get_mirror, note_calendar_writes, MIRROR_PAGE_PREFIX, CONFLICT_MAX_STALENESS_SECONDS
+from .block_queue import get_block_queue
+from .reservations import RESERVED_REASON, reserve_slots
+from .court_versions import get_court_version
+from .serialization import TRUSTED_UPSTREAM, project
+from .metrics import google_call, google_method_name, record_batched_requests
+from .upstream import Priority, call_upstream, prioritized, retry_reason, upstream_priority, wait_before_batch_retry
 
 # Define a classe placeholder ANTES do bloco 'try' para garantir que ela sempre exista.
 class ProjectedEventOccurrence:
@@ -39,15 +54,24 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 def _get_calendar_service(credentials: Credentials):
-    """Constrói o objeto de serviço do Google Calendar a partir das credenciais fornecidas."""
+    """Obtém do pool do processo o objeto de serviço do Google Calendar para as credenciais fornecidas."""
     try:
         # As 'credentials' que recebemos já estão configuradas para personificação pelo auth.py
-        service = build('calendar', 'v3', credentials=credentials)
+        service = get_calendar_service(credentials)
         return service
     except Exception as e:
         logger.error(f"Falha ao construir o serviço do Google Calendar: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Falha ao construir o serviço do Google Calendar: {e}")
     
+def _as_model(model_cls, payload: Dict):
+    """
+    Monta a resposta de uma ação a partir do payload do Google. No modo 'trusted_upstream',
+    devolve o dict projetado nos campos do modelo, sem validação (o endpoint o serializa direto).
+    """
+    if TRUSTED_UPSTREAM:
+        return project(model_cls, payload)
+    return model_cls(**payload)
+
 _calendar_names_cache = {}
 def _get_calendar_name(service, calendar_id: str) -> str:
     if calendar_id in _calendar_names_cache:
@@ -59,135 +83,354 @@ def _get_calendar_name(service, calendar_id: str) -> str:
         return summary
     except HttpError:
         return calendar_id
-    
-# ==============================================================================
-# FUNÇÕES COM A NOVA LÓGICA DE BLOQUEIO COMPARTILHADO E DE ENVELOPE
-# ==============================================================================
-
-def _get_overlapping_blocks(service, calendar_id: str, start_time: datetime, end_time: datetime) -> List[Dict]:
-    try:
-        events_result = service.events().list(
-            calendarId=calendar_id,
-            timeMin=start_time.isoformat(),
-            timeMax=end_time.isoformat(),
-            sharedExtendedProperty="autoGeneratedBy=courtBookingSystemMCP",
-            singleEvents=True
-        ).execute()
-        return events_result.get('items', [])
-    except HttpError:
-        return []
-
-def _update_or_create_blocking_events(service, primary_event: Dict, user_info: Dict, settings: dict) -> int:
-    # Pega os mapas do objeto de configurações
-    quadras_map = settings.get('quadras', {})
-    dependency_rules = settings.get('court_dependency_rules', {})
 
-    # Cria um mapa reverso para encontrar o nome simples a partir do ID
-    id_to_name_map = {v: k for k, v in quadras_map.items()}
+def cached_calendar_name(calendar_id: str) -> Optional[str]:
+    """Nome do calendário já em cache (None se ainda não foi lido)."""
+    return _calendar_names_cache.get(calendar_id)
 
-    source_calendar_id = primary_event.get('organizer', {}).get('email')
-    source_simple_name = id_to_name_map.get(source_calendar_id)
+def prime_calendar_name(calendar_id: str, name: str):
+    """Registra o nome de um calendário já lido (ex.: no aquecimento), evitando a consulta na primeira ação."""
+    _calendar_names_cache[calendar_id] = name
 
-    if not source_simple_name or source_simple_name not in dependency_rules:
-        return 0
+def get_calendar_name_stats() -> dict:
+    """Retorna quantos nomes de calendário estão em cache."""
+    return {'entries': len(_calendar_names_cache)}
+    
+# Limite recomendado pela Calendar API para requisições em um único batch.
+BATCH_CHUNK_SIZE = 50
 
-    # Pega os nomes simples das quadras dependentes
-    dependent_simple_names = dependency_rules.get(source_simple_name, [])
-    # Traduz os nomes simples para os IDs reais
-    dependent_calendar_ids = [quadras_map.get(name) for name in dependent_simple_names if name in quadras_map]
+_batch_stats = {'batches': 0, 'requests': 0, 'round_trips_saved': 0}
+_batch_stats_lock = threading.Lock()
 
-    main_calendar_name = _get_calendar_name(service, source_calendar_id)
-    new_start_dt = parser.isoparse(primary_event['start']['dateTime'])
-    new_end_dt = parser.isoparse(primary_event['end']['dateTime'])
+def _execute_batch(service, requests: List[Tuple[str, Any]], chunk_size: int = BATCH_CHUNK_SIZE) -> Dict[str, Tuple[Optional[Dict], Optional[Exception]]]:
+    """
+    Executa as requisições (id, HttpRequest) pelo endpoint de batch do Google, em blocos de 'chunk_size'.
+    Retorna {id: (resposta, exceção)}; uma falha do batch inteiro é atribuída a todas as requisições do bloco.
+    """
+    results: Dict[str, Tuple[Optional[Dict], Optional[Exception]]] = {}
 
-    for dep_cal_id in dependent_calendar_ids:
-        # O resto da lógica de envelope continua a mesma
+    # Uma requisição isolada não ganha nada com o envelope multipart do batch.
+    if len(requests) == 1:
+        request_id, request = requests[0]
         try:
-            overlapping_blocks = _get_overlapping_blocks(service, dep_cal_id, new_start_dt, new_end_dt)
-            final_start, final_end = new_start_dt, new_end_dt
-            all_source_ids = {primary_event['id']}
-            for block in overlapping_blocks:
-                final_start = min(final_start, parser.isoparse(block['start']['dateTime']))
-                final_end = max(final_end, parser.isoparse(block['end']['dateTime']))
-                source_ids_str = block.get('extendedProperties', {}).get('private', {}).get('sourceEventIds', '')
-                if source_ids_str:
-                    all_source_ids.update(source_ids_str.split(','))
-                service.events().delete(calendarId=dep_cal_id, eventId=block['id']).execute()
-            source_event_summary = primary_event.get('summary', 'Evento Principal')
-            new_block_body = {
-                'summary': f"Bloqueado - Reserva '{source_event_summary}' ({main_calendar_name})",
-                'description': "Este horário está bloqueado por um ou mais agendamentos.",
-                'start': {'dateTime': final_start.isoformat(), 'timeZone': 'UTC'},
-                'end': {'dateTime': final_end.isoformat(), 'timeZone': 'UTC'},
-                'transparency': 'opaque',
-                'extendedProperties': {
-                    'shared': {'autoGeneratedBy': 'courtBookingSystemMCP'},
-                    'private': {'sourceEventIds': ','.join(sorted(list(all_source_ids)))}
-                }
-            }
-            service.events().insert(calendarId=dep_cal_id, body=new_block_body).execute()
-            logger.info(f"Bloco consolidado criado/atualizado em {dep_cal_id}.")
+            results[request_id] = (request.execute(), None)
         except Exception as e:
-            logger.error(f"ERRO ao criar/atualizar bloco em {dep_cal_id}: {e}")
+            results[request_id] = (None, e)
+        return results
+
+    def _callback(request_id, response, exception):
+        results[request_id] = (response, exception)
+
+    for i in range(0, len(requests), chunk_size):
+        pending, attempt = requests[i:i + chunk_size], 0
+        while pending:
+            batch = service.new_batch_http_request(callback=_callback)
+            for request_id, request in pending:
+                batch.add(request, request_id=request_id)
+            record_batched_requests(request.methodId for _, request in pending)
+            try:
+                # O envelope consome uma ficha por operação e é repetido pelo agendador em 429/5xx.
+                call_upstream('batch', lambda: _send_batch(batch, len(pending)), cost=len(pending))
+            except Exception as e:
+                logger.error(f"Falha ao executar batch com {len(pending)} requisições: {e}")
+                for request_id, _ in pending:
+                    results.setdefault(request_id, (None, e))
+                break
+            # Operações recusadas dentro do batch (limite de taxa, 5xx em métodos idempotentes) voltam num novo batch.
+            failures = [
+                (request_id, request, google_method_name(request.methodId), results[request_id][1])
+                for request_id, request in pending if results[request_id][1] is not None
+            ]
+            retryable = [failure for failure in failures if retry_reason(failure[2], failure[3])]
+            if not retryable or not wait_before_batch_retry([(method, error) for _, _, method, error in retryable], attempt):
+                break
+            pending = [(request_id, request) for request_id, request, _, _ in retryable]
+            attempt += 1
 
-    return len(dependent_calendar_ids)
+    count_batches(len(requests), chunk_size)
+    return results
 
+def count_batches(requests: int, chunk_size: int):
+    """
+    Contabiliza 'requests' requisições enviadas em envelopes de 'chunk_size': cada envelope é uma
+    ida e volta no lugar de uma por requisição (as repetições das recusadas não entram na conta).
+    """
+    batches = math.ceil(requests / chunk_size)
+    saved = requests - batches
+    with _batch_stats_lock:
+        _batch_stats['batches'] += batches
+        _batch_stats['requests'] += requests
+        _batch_stats['round_trips_saved'] += saved
+    logger.info(f"{requests} requisições enviadas em {batches} batch(es); {saved} idas e voltas HTTP economizadas.")
+
+def _send_batch(batch, operations: int):
+    with google_call('batch', operations=operations):
+        batch.execute()
+
+def get_batch_stats() -> dict:
+    """Retorna quantos batches foram enviados e quantas idas e voltas HTTP foram economizadas."""
+    with _batch_stats_lock:
+        return dict(_batch_stats)
 
-def _handle_block_updates_on_delete(service, deleted_event: Dict, settings: dict):
-    quadras_map = settings.get('quadras', {})
-    dependency_rules = settings.get('court_dependency_rules', {})
-    id_to_name_map = {v: k for k, v in quadras_map.items()}
+# ==============================================================================
+# FUNÇÕES COM A NOVA LÓGICA DE BLOQUEIO COMPARTILHADO E DE ENVELOPE
+# ==============================================================================
 
-    source_calendar_id = deleted_event.get('organizer', {}).get('email')
-    source_simple_name = id_to_name_map.get(source_calendar_id)
+BLOCK_MARKER = "autoGeneratedBy=courtBookingSystemMCP"
 
-    if not source_simple_name or source_simple_name not in dependency_rules:
-        return
+def _list_blocks(service, calendar_id: str, time_min: datetime, time_max: datetime) -> List[Dict]:
+    """Lista, com paginação completa, todos os blocos automáticos de um calendário que intersectam o intervalo."""
+    blocks = []
+    page_token = None
+    while True:
+        events_result = service.events().list(
+            calendarId=calendar_id,
+            timeMin=time_min.isoformat(),
+            timeMax=time_max.isoformat(),
+            sharedExtendedProperty=BLOCK_MARKER,
+            singleEvents=True,
+            maxResults=2500,
+            pageToken=page_token
+        ).execute()
+        blocks.extend(events_result.get('items', []))
+        page_token = events_result.get('nextPageToken')
+        if not page_token:
+            return blocks
 
-    dependent_simple_names = dependency_rules.get(source_simple_name, [])
-    dependent_calendar_ids = [quadras_map.get(name) for name in dependent_simple_names if name in quadras_map]
+def get_dependent_calendar_ids(source_calendar_id: str, settings: dict) -> List[str]:
+    """Retorna os IDs reais das quadras dependentes (regras pré-calculadas na configuração compilada)."""
+    return list(as_compiled(settings).dependent_ids(source_calendar_id))
 
-    deleted_event_id = deleted_event['id']
-    start_dt = parser.isoparse(deleted_event['start']['dateTime'])
-    end_dt = parser.isoparse(deleted_event['end']['dateTime'])
+def _block_source_ids(block: Dict) -> set:
+    source_ids_str = block.get('extendedProperties', {}).get('private', {}).get('sourceEventIds', '')
+    return set(source_ids_str.split(',')) if source_ids_str else set()
 
-    for dep_cal_id in dependent_calendar_ids:
-        # O resto da lógica de busca e atualização de blocos continua a mesma
-        try:
-            search_start = start_dt - timedelta(hours=12)
-            search_end = end_dt + timedelta(hours=12)
-            blocks_in_range = _get_overlapping_blocks(service, dep_cal_id, search_start, search_end)
-            for block in blocks_in_range:
-                source_ids_str = block.get('extendedProperties', {}).get('private', {}).get('sourceEventIds', '')
-                source_ids = set(source_ids_str.split(',')) if source_ids_str else set()
-                if deleted_event_id in source_ids:
-                    source_ids.remove(deleted_event_id)
-                    if not source_ids:
-                        logger.info(f"Último dono removido. Deletando bloco {block['id']} em {dep_cal_id}.")
-                        service.events().delete(calendarId=dep_cal_id, eventId=block['id']).execute()
-                    else:
-                        logger.info(f"Removendo referência de {block['id']} em {dep_cal_id}. Bloco mantido.")
-                        patch_body = {'extendedProperties': {'private': {'sourceEventIds': ','.join(sorted(list(source_ids)))}}}
-                        service.events().patch(calendarId=dep_cal_id, eventId=block['id'], body=patch_body).execute()
-        except Exception as e:
-            logger.error(f"Erro ao processar atualização de bloqueio em {dep_cal_id} após exclusão: {e}")
+def compute_block_envelopes(existing_blocks: List[Dict], new_events: List[Dict], main_calendar_name: str) -> Tuple[List[Dict], List[Tuple[str, Dict]], List[str]]:
+    """
+    Calcula em memória os envelopes de bloqueio de uma quadra dependente.
 
-def create_event(
-    credentials: Credentials, 
-    event_data: EventCreateRequest, 
-    calendar_id: str, 
-    user_info: Dict[str, Any], 
-    settings: dict, 
-    send_notifications: bool = True
-) -> Dict[str, Any]:
-    
-    service = _get_calendar_service(credentials)
-    MAX_RECURRENCES = 30
-    potential_slots = []
-    
-    # Gera um ID único para toda a série, se for um evento recorrente
-    series_id = str(uuid.uuid4()) if event_data.frequency and event_data.frequency != 'none' else None
+    Cada grupo de eventos novos e blocos existentes que se sobrepõem vira um único bloco
+    cobrindo todo o grupo, com a união dos 'sourceEventIds'. O primeiro bloco existente do
+    grupo é reaproveitado (patch) e os demais são apagados. Retorna (inserts, patches, deletes),
+    contendo apenas as mudanças líquidas.
+    """
+    items = []
+    for event in new_events:
+        items.append((parser.isoparse(event['start']['dateTime']), parser.isoparse(event['end']['dateTime']), None, event))
+    for block in existing_blocks:
+        if 'dateTime' not in block.get('start', {}):
+            continue
+        items.append((parser.isoparse(block['start']['dateTime']), parser.isoparse(block['end']['dateTime']), block, None))
+    # Em empates, blocos existentes vêm antes dos eventos novos (mantém a ordem estável).
+    items.sort(key=lambda item: (item[0], item[2] is None))
+
+    groups = []
+    for item in items:
+        if groups and item[0] < groups[-1]['end']:
+            group = groups[-1]
+            group['end'] = max(group['end'], item[1])
+        else:
+            group = {'start': item[0], 'end': item[1], 'blocks': [], 'events': []}
+            groups.append(group)
+        if item[2] is not None:
+            group['blocks'].append(item[2])
+        else:
+            group['events'].append(item[3])
+
+    inserts, patches, deletes = [], [], []
+    for group in groups:
+        if not group['events']:
+            continue
+        all_source_ids = {event['id'] for event in group['events']}
+        for block in group['blocks']:
+            all_source_ids.update(_block_source_ids(block))
+        source_event_summary = group['events'][0].get('summary', 'Evento Principal')
+        block_body = {
+            'summary': f"Bloqueado - Reserva '{source_event_summary}' ({main_calendar_name})",
+            'description': "Este horário está bloqueado por um ou mais agendamentos.",
+            'start': {'dateTime': group['start'].isoformat(), 'timeZone': 'UTC'},
+            'end': {'dateTime': group['end'].isoformat(), 'timeZone': 'UTC'},
+            'transparency': 'opaque',
+            'extendedProperties': {
+                'shared': {'autoGeneratedBy': 'courtBookingSystemMCP'},
+                'private': {'sourceEventIds': ','.join(sorted(all_source_ids))}
+            }
+        }
+        if not group['blocks']:
+            inserts.append(block_body)
+            continue
+        kept, *extra = group['blocks']
+        deletes.extend(block['id'] for block in extra)
+        unchanged = (
+            parser.isoparse(kept['start']['dateTime']) == group['start']
+            and parser.isoparse(kept['end']['dateTime']) == group['end']
+            and _block_source_ids(kept) == all_source_ids
+        )
+        if not unchanged:
+            patches.append((kept['id'], block_body))
+    return inserts, patches, deletes
+
+def group_events_by_source(events: List[Dict]) -> Dict[str, List[Dict]]:
+    """Agrupa os eventos (com horário) pelo calendário de origem (o organizador)."""
+    events_by_source: Dict[str, List[Dict]] = {}
+    for event in events:
+        if 'dateTime' not in event.get('start', {}):
+            continue
+        events_by_source.setdefault(event.get('organizer', {}).get('email'), []).append(event)
+    return events_by_source
+
+def _is_gone(request_id: str, error: Exception) -> bool:
+    """Delete de um bloco que já não existe (aplicado numa tentativa anterior): não é falha."""
+    return '|delete|' in request_id and isinstance(error, HttpError) and getattr(error.resp, 'status', None) in (404, 410)
+
+@prioritized(Priority.BACKGROUND)
+def _update_or_create_blocking_events_bulk(service, primary_events: List[Dict], settings: dict, raise_errors: bool = False) -> int:
+    """
+    Cria/atualiza os bloqueios nas quadras dependentes para vários eventos principais de uma vez.
+    Busca os blocos existentes uma única vez por calendário dependente (em todo o intervalo da
+    série), calcula os envelopes em memória e aplica apenas as mudanças líquidas via batch.
+    Retorna o número de agendas dependentes afetadas. Com 'raise_errors', a primeira falha é
+    relançada ao final (a fila de blocos reagenda a mudança).
+    """
+    updated_calendars = 0
+    errors = []
+    for source_calendar_id, events in group_events_by_source(primary_events).items():
+        dependent_calendar_ids = get_dependent_calendar_ids(source_calendar_id, settings)
+        if not dependent_calendar_ids:
+            continue
+
+        main_calendar_name = _get_calendar_name(service, source_calendar_id)
+        span_start = min(parser.isoparse(event['start']['dateTime']) for event in events)
+        span_end = max(parser.isoparse(event['end']['dateTime']) for event in events)
+
+        requests = []
+        for dep_cal_id in dependent_calendar_ids:
+            try:
+                existing_blocks = _list_blocks(service, dep_cal_id, span_start, span_end)
+            except Exception as e:
+                logger.error(f"ERRO ao buscar blocos existentes em {dep_cal_id}: {e}")
+                errors.append(e)
+                continue
+            inserts, patches, deletes = compute_block_envelopes(existing_blocks, events, main_calendar_name)
+            for i, body in enumerate(inserts):
+                requests.append((f"{dep_cal_id}|insert|{i}", service.events().insert(calendarId=dep_cal_id, body=body)))
+            for block_id, body in patches:
+                requests.append((f"{dep_cal_id}|patch|{block_id}", service.events().patch(calendarId=dep_cal_id, eventId=block_id, body=body)))
+            for block_id in deletes:
+                requests.append((f"{dep_cal_id}|delete|{block_id}", service.events().delete(calendarId=dep_cal_id, eventId=block_id)))
+            updated_calendars += 1
+            logger.info(f"Blocos em {dep_cal_id}: {len(inserts)} novo(s), {len(patches)} atualizado(s), {len(deletes)} removido(s).")
+
+        if requests:
+            for request_id, (_, error) in _execute_batch(service, requests).items():
+                if error is not None and not _is_gone(request_id, error):
+                    logger.error(f"ERRO ao criar/atualizar bloco ({request_id}): {error}")
+                    errors.append(error)
+
+    if errors and raise_errors:
+        raise errors[0]
+    return updated_calendars
+
+
+def compute_block_updates_on_delete(blocks: List[Dict], deleted_event_ids: set, dep_cal_id: str) -> Tuple[List[Tuple[str, Dict]], List[str]]:
+    """Retorna (patches, deletes) que tiram os eventos apagados dos 'sourceEventIds' dos blocos."""
+    patches, deletes = [], []
+    for block in blocks:
+        source_ids = _block_source_ids(block)
+        if not source_ids & deleted_event_ids:
+            continue
+        source_ids -= deleted_event_ids
+        if not source_ids:
+            logger.info(f"Último dono removido. Deletando bloco {block['id']} em {dep_cal_id}.")
+            deletes.append(block['id'])
+        else:
+            logger.info(f"Removendo referência de {block['id']} em {dep_cal_id}. Bloco mantido.")
+            patches.append((block['id'], {'extendedProperties': {'private': {'sourceEventIds': ','.join(sorted(source_ids))}}}))
+    return patches, deletes
 
+@prioritized(Priority.BACKGROUND)
+def _handle_block_updates_on_delete_bulk(service, deleted_events: List[Dict], settings: dict, raise_errors: bool = False):
+    """
+    Remove as referências de vários eventos apagados dos blocos das quadras dependentes.
+    Faz uma única busca de blocos por calendário dependente (todo o intervalo dos eventos,
+    com folga de 12h) e aplica os patches/deletes necessários via batch.
+    """
+    errors = []
+    for source_calendar_id, events in group_events_by_source(deleted_events).items():
+        dependent_calendar_ids = get_dependent_calendar_ids(source_calendar_id, settings)
+        if not dependent_calendar_ids:
+            continue
+
+        deleted_event_ids = {event['id'] for event in events}
+        search_start = min(parser.isoparse(event['start']['dateTime']) for event in events) - timedelta(hours=12)
+        search_end = max(parser.isoparse(event['end']['dateTime']) for event in events) + timedelta(hours=12)
+
+        requests = []
+        for dep_cal_id in dependent_calendar_ids:
+            try:
+                blocks_in_range = _list_blocks(service, dep_cal_id, search_start, search_end)
+            except Exception as e:
+                logger.error(f"Erro ao processar atualização de bloqueio em {dep_cal_id} após exclusão: {e}")
+                errors.append(e)
+                continue
+            patches, deletes = compute_block_updates_on_delete(blocks_in_range, deleted_event_ids, dep_cal_id)
+            for block_id, patch_body in patches:
+                requests.append((f"{dep_cal_id}|patch|{block_id}", service.events().patch(calendarId=dep_cal_id, eventId=block_id, body=patch_body)))
+            for block_id in deletes:
+                requests.append((f"{dep_cal_id}|delete|{block_id}", service.events().delete(calendarId=dep_cal_id, eventId=block_id)))
+
+        if requests:
+            for request_id, (_, error) in _execute_batch(service, requests).items():
+                if error is not None and not _is_gone(request_id, error):
+                    logger.error(f"Erro ao processar atualização de bloqueio ({request_id}) após exclusão: {error}")
+                    errors.append(error)
+
+    if errors and raise_errors:
+        raise errors[0]
+
+def _maintain_blocks(service, calendar_id: str, settings: dict, removed: List[Dict] = (), upserted: List[Dict] = ()) -> int:
+    """
+    Atualiza os bloqueios das quadras dependentes após uma mudança na quadra principal: tira dos
+    blocos os eventos removidos (ou as versões antigas) e cobre os inseridos. Com a fila de blocos
+    ativa ('block_queue.enabled'), só registra as mudanças e retorna 0; senão, aplica na hora e
+    retorna o número de agendas dependentes afetadas.
+    """
+    if not get_dependent_calendar_ids(calendar_id, settings):
+        return 0
+    block_queue = get_block_queue()
+    if block_queue is not None:
+        block_queue.enqueue(calendar_id, removed=removed, upserted=upserted)
+        return 0
+    if removed:
+        _handle_block_updates_on_delete_bulk(service, list(removed), settings)
+    return _update_or_create_blocking_events_bulk(service, list(upserted), settings) if upserted else 0
+
+def hold_queued_blocks(reservation, insert_results: Dict[str, Tuple[Optional[Dict], Optional[Exception]]]):
+    """
+    Com a fila de blocos, os bloqueios das dependentes ainda não existem no Google quando a ação
+    termina: a reserva deles é mantida para os horários criados até a fila ter tempo de aplicá-los.
+    """
+    if get_block_queue() is not None:
+        reservation.hold_blocks(int(index) for index, (created, error) in insert_results.items() if created is not None and error is None)
+
+def apply_queued_block_changes(service, removed: List[Dict], upserted: List[Dict], settings: dict):
+    """Processador da fila de blocos: aplica um grupo de mudanças coalescidas, relançando as falhas."""
+    if removed:
+        _handle_block_updates_on_delete_bulk(service, removed, settings, raise_errors=True)
+    if upserted:
+        _update_or_create_blocking_events_bulk(service, upserted, settings, raise_errors=True)
+    source_calendar_ids = {event.get('organizer', {}).get('email') for event in removed + upserted}
+    note_calendar_writes({dep_cal_id for source in source_calendar_ids for dep_cal_id in get_dependent_calendar_ids(source, settings)})
+
+# Janela máxima por consulta freebusy; séries mais longas são divididas em janelas consecutivas.
+FREEBUSY_MAX_SPAN = timedelta(days=60)
+# Máximo de calendários por consulta freebusy (limite da API).
+FREEBUSY_MAX_ITEMS = 50
+MAX_RECURRENCES = 30
+
+def build_potential_slots(event_data: EventCreateRequest, max_recurrences: int = MAX_RECURRENCES) -> List[Dict[str, datetime]]:
+    """Gera os horários (início/fim) de todas as ocorrências solicitadas."""
+    potential_slots = []
     # Lógica de cálculo de datas (mantida da versão anterior, que está correta)
     if event_data.frequency and event_data.frequency != 'none':
         start_dt_base = event_data.start.date_time.astimezone(pytz.timezone("America/Sao_Paulo"))
@@ -198,72 +441,222 @@ def create_event(
         selected_weekdays = {isoweekday_map.get(day) for day in event_data.recurrence_days or []}
         current_date_iterator = start_dt_base.date()
         while current_date_iterator <= end_date_limit:
-            if len(potential_slots) >= MAX_RECURRENCES: break
+            if len(potential_slots) >= max_recurrences: break
             if (event_data.frequency == 'daily') or (event_data.frequency == 'weekly' and current_date_iterator.isoweekday() in selected_weekdays):
                 new_start_dt = datetime.combine(current_date_iterator, start_dt_base.time(), tzinfo=start_dt_base.tzinfo)
                 potential_slots.append({'start': new_start_dt, 'end': new_start_dt + duration})
             current_date_iterator += timedelta(days=1)
     else:
         potential_slots.append({'start': event_data.start.date_time, 'end': event_data.end.date_time})
-    
-    created_events_count = 0
-    skipped_events = []
+    return potential_slots
 
-    for slot in potential_slots:
-        start_time = slot['start']
-        end_time = slot['end']
-        try:
-            freebusy_query = {"timeMin": start_time.isoformat(), "timeMax": end_time.isoformat(), "items": [{"id": calendar_id}]}
+def _query_busy_intervals_multi(
+    service, calendar_ids: List[str], time_min: datetime, time_max: datetime
+) -> Tuple[Dict[str, List[Tuple[datetime, datetime]]], Dict[str, str]]:
+    """
+    Consulta o freebusy de vários calendários de uma vez: uma chamada por grupo de até
+    FREEBUSY_MAX_ITEMS calendários e por janela de FREEBUSY_MAX_SPAN.
+    Retorna (intervalos ocupados por calendário, ordenados e unidos; motivo do erro por calendário).
+    """
+    busy: Dict[str, list] = {calendar_id: [] for calendar_id in calendar_ids}
+    errors: Dict[str, str] = {}
+    for i in range(0, len(calendar_ids), FREEBUSY_MAX_ITEMS):
+        chunk = calendar_ids[i:i + FREEBUSY_MAX_ITEMS]
+        window_start = time_min
+        while window_start < time_max:
+            window_end = min(window_start + FREEBUSY_MAX_SPAN, time_max)
+            freebusy_query = {"timeMin": window_start.isoformat(), "timeMax": window_end.isoformat(), "items": [{"id": calendar_id} for calendar_id in chunk]}
             result = service.freebusy().query(body=freebusy_query).execute()
-            
-            if result.get('calendars', {}).get(calendar_id, {}).get('busy'):
-                # ... (lógica de conflito mantida) ...
-                conflicting_event_info = "Evento existente"
-                try:
-                    events = service.events().list(calendarId=calendar_id, timeMin=start_time.isoformat(), timeMax=end_time.isoformat(), maxResults=1).execute().get('items', [])
-                    if events: conflicting_event_info = events[0].get('summary', 'Evento sem título')
-                except Exception: pass
-                skipped_events.append({"start": start_time.isoformat(), "end": end_time.isoformat(), "reason": conflicting_event_info})
-            else:
-                extended_properties = {
-                    'private': {
-                        'requesterEmail': user_info.get('email'), 
-                        'requesterName': user_info.get('name')
-                    }
-                }
-                # --- 2. ADICIONA A ETIQUETA 'seriesId' SE FOR RECORRENTE ---
-                if series_id:
-                    extended_properties['private']['seriesId'] = series_id
-
-                impersonation_user = settings.get('impersonation_user_email')
-
-                event_body = {
-                    'summary': event_data.summary,
-                    'description': f"{event_data.description or ''}\n\n---\nSolicitado por: {user_info.get('name')} ({user_info.get('email')})",
-                    'start': {'dateTime': start_time.isoformat()},
-                    'end': {'dateTime': end_time.isoformat()},
-                    'extendedProperties': extended_properties,
-                }
-                
-                created_event = service.events().insert(calendarId=calendar_id, body=event_body, sendNotifications=send_notifications).execute()
-                _update_or_create_blocking_events(service, created_event, user_info, settings)
-                created_events_count += 1
-        except Exception as e:
-            # ... (lógica de erro mantida) ...
-            skipped_events.append({"start": start_time.isoformat(), "end": end_time.isoformat(), "reason": f"Erro interno no servidor: {e}"})
+            calendars_data = result.get('calendars', {})
+            for calendar_id in chunk:
+                data = calendars_data.get(calendar_id, {})
+                if data.get('errors'):
+                    errors.setdefault(calendar_id, data['errors'][0].get('reason', 'desconhecido'))
+                for interval in data.get('busy', []):
+                    busy[calendar_id].append((parser.isoparse(interval['start']), parser.isoparse(interval['end'])))
+            window_start = window_end
+    # Une intervalos contíguos ou sobrepostos (ex.: um evento que atravessa duas janelas).
+    merged = {calendar_id: IntervalIndex.from_intervals(intervals).merged() for calendar_id, intervals in busy.items()}
+    return merged, errors
+
+def _query_busy_intervals(service, calendar_id: str, time_min: datetime, time_max: datetime) -> List[Tuple[datetime, datetime]]:
+    """
+    Consulta o freebusy de um calendário para todo o intervalo [time_min, time_max)
+    e retorna os intervalos ocupados ordenados e sem sobreposição. Usa uma chamada por janela de FREEBUSY_MAX_SPAN,
+    ou o espelho local quando ele está ativo para o calendário.
+    """
+    mirror = get_mirror()
+    if mirror is not None and mirror.is_tracked(calendar_id):
+        mirror.ensure_fresh(service, calendar_id, CONFLICT_MAX_STALENESS_SECONDS)
+        return mirror.busy_intervals(calendar_id, time_min, time_max)
+
+    busy, _ = _query_busy_intervals_multi(service, [calendar_id], time_min, time_max)
+    return busy[calendar_id]
+
+def match_conflict_summaries(candidate_events: List[Dict], conflicting_slots: List[Dict[str, datetime]]) -> List[str]:
+    """Associa a cada horário em conflito o título do primeiro evento opaco que o ocupa."""
+    summaries = ["Evento existente"] * len(conflicting_slots)
+    existing_events = []
+    for event in candidate_events:
+        if event.get('transparency') == 'transparent' or 'dateTime' not in event.get('start', {}):
+            continue
+        existing_events.append((parser.isoparse(event['start']['dateTime']), parser.isoparse(event['end']['dateTime']), event))
+    for i, slot in enumerate(conflicting_slots):
+        for ev_start, ev_end, event in existing_events:
+            if ev_start >= slot['end']:
+                break
+            if ev_end > slot['start']:
+                summaries[i] = event.get('summary', 'Evento sem título')
+                break
+    return summaries
+
+def _fetch_conflict_summaries(service, calendar_id: str, conflicting_slots: List[Dict[str, datetime]]) -> List[str]:
+    """Busca, com um único events.list paginado, o título do evento que ocupa cada horário em conflito."""
+    summaries = ["Evento existente"] * len(conflicting_slots)
+    if not conflicting_slots:
+        return summaries
+    try:
+        range_start = min(slot['start'] for slot in conflicting_slots)
+        range_end = max(slot['end'] for slot in conflicting_slots)
+        mirror = get_mirror()
+        if mirror is not None and mirror.is_tracked(calendar_id):
+            # O espelho já foi atualizado pela checagem de conflitos.
+            candidate_events = mirror.list_events(calendar_id, range_start, range_end)
+        else:
+            candidate_events = []
+            page_token = None
+            while True:
+                response = service.events().list(
+                    calendarId=calendar_id,
+                    timeMin=range_start.isoformat(),
+                    timeMax=range_end.isoformat(),
+                    singleEvents=True,
+                    orderBy='startTime',
+                    maxResults=2500,
+                    pageToken=page_token
+                ).execute()
+                candidate_events.extend(response.get('items', []))
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+
+        summaries = match_conflict_summaries(candidate_events, conflicting_slots)
+    except Exception as e:
+        logger.warning(f"Não foi possível obter os títulos dos eventos em conflito em {calendar_id}: {e}")
+    return summaries
+
+def build_event_body(event_data: EventCreateRequest, slot: Dict[str, datetime], user_info: Dict[str, Any], series_id: Optional[str]) -> Dict:
+    extended_properties = {
+        'private': {
+            'requesterEmail': user_info.get('email'), 
+            'requesterName': user_info.get('name')
+        }
+    }
+    # --- 2. ADICIONA A ETIQUETA 'seriesId' SE FOR RECORRENTE ---
+    if series_id:
+        extended_properties['private']['seriesId'] = series_id
 
-    message = f"{created_events_count} agendamento(s) criados com sucesso."
+    return {
+        'summary': event_data.summary,
+        'description': f"{event_data.description or ''}\n\n---\nSolicitado por: {user_info.get('name')} ({user_info.get('email')})",
+        'start': {'dateTime': slot['start'].isoformat()},
+        'end': {'dateTime': slot['end'].isoformat()},
+        'extendedProperties': extended_properties,
+    }
+
+def build_create_result(
+    potential_slots: List[Dict[str, datetime]],
+    conflict_reasons: Dict[datetime, str],
+    insert_results: Dict[str, Tuple[Optional[Dict], Optional[Exception]]]
+) -> Tuple[List[Dict], Dict[str, Any]]:
+    """Monta a resposta do create_event a partir dos conflitos e dos resultados dos inserts (por índice do horário)."""
+    created_events = []
+    skipped_events = []
+    for index, slot in enumerate(potential_slots):
+        start_time = slot['start']
+        end_time = slot['end']
+        if start_time in conflict_reasons:
+            skipped_events.append({"start": start_time.isoformat(), "end": end_time.isoformat(), "reason": conflict_reasons[start_time]})
+            continue
+        created_event, error = insert_results.get(str(index), (None, None))
+        if error is not None or created_event is None:
+            skipped_events.append({"start": start_time.isoformat(), "end": end_time.isoformat(), "reason": f"Erro interno no servidor: {error}"})
+            continue
+        created_events.append(created_event)
+
+    message = f"{len(created_events)} agendamento(s) criados com sucesso."
     if skipped_events:
         message += f" {len(skipped_events)} horários foram pulados por conflito ou erro."
 
-    return {
+    return created_events, {
         "message": message,
         "event": None,
-        "created_count": created_events_count,
+        "created_count": len(created_events),
         "skipped_count": len(skipped_events),
         "skipped_events": skipped_events
     }
 
+def create_event(
+    credentials: Credentials, 
+    event_data: EventCreateRequest, 
+    calendar_id: str, 
+    user_info: Dict[str, Any], 
+    settings: dict, 
+    send_notifications: bool = True
+) -> Dict[str, Any]:
+    
+    service = _get_calendar_service(credentials)
+    
+    # Gera um ID único para toda a série, se for um evento recorrente
+    series_id = str(uuid.uuid4()) if event_data.frequency and event_data.frequency != 'none' else None
+
+    potential_slots = build_potential_slots(event_data)
+    
+    # Os horários ficam reservados no livro do processo (quadra e dependentes) até o fim da ação:
+    # outra solicitação com horário sobreposto é recusada sem ida ao Google.
+    dependent_calendar_ids = get_dependent_calendar_ids(calendar_id, settings)
+    with reserve_slots(calendar_id, potential_slots, dependent_calendar_ids) as reservation:
+        conflict_reasons = {potential_slots[index]['start']: RESERVED_REASON for index in reservation.rejected}
+        reserved_slots = [potential_slots[index] for index in reservation.accepted]
+
+        # Uma única consulta freebusy para toda a série; os conflitos são resolvidos em memória.
+        if reserved_slots:
+            try:
+                busy = _query_busy_intervals(
+                    service, calendar_id,
+                    min(slot['start'] for slot in reserved_slots),
+                    max(slot['end'] for slot in reserved_slots)
+                )
+                busy_index = IntervalIndex.from_intervals(busy)
+                conflicting_slots = [slot for slot in reserved_slots if busy_index.overlaps(slot['start'], slot['end'])]
+                conflict_reasons.update(zip(
+                    (slot['start'] for slot in conflicting_slots),
+                    _fetch_conflict_summaries(service, calendar_id, conflicting_slots)
+                ))
+            except Exception as e:
+                conflict_reasons.update({slot['start']: f"Erro interno no servidor: {e}" for slot in reserved_slots})
+
+        # Os horários livres são inseridos pelo endpoint de batch, em blocos, em vez de um insert por vez.
+        insert_requests = []
+        for index, slot in enumerate(potential_slots):
+            if slot['start'] in conflict_reasons:
+                continue
+            event_body = build_event_body(event_data, slot, user_info, series_id)
+            insert_requests.append((str(index), service.events().insert(calendarId=calendar_id, body=event_body, sendNotifications=send_notifications)))
+
+        # Uma série inteira é operação em massa: cede a cota às leituras interativas.
+        with upstream_priority(Priority.BACKGROUND if series_id else Priority.NORMAL):
+            insert_results = _execute_batch(service, insert_requests) if insert_requests else {}
+
+        created_events, result = build_create_result(potential_slots, conflict_reasons, insert_results)
+
+        if created_events:
+            _maintain_blocks(service, calendar_id, settings, upserted=created_events)
+            hold_queued_blocks(reservation, insert_results)
+            note_calendar_writes([calendar_id] + dependent_calendar_ids)
+
+    return result
+
 
 
 def _find_source_calendar(event_id, service):
@@ -278,15 +671,15 @@ def delete_event(credentials: Credentials, event_id: str, calendar_id: str, sett
     except HttpError:
         raise HTTPException(status_code=404, detail="Evento a ser deletado não encontrado.")
 
-    _handle_block_updates_on_delete(service, event_to_delete, settings)
-
     service.events().delete(calendarId=calendar_id, eventId=event_id, sendNotifications=send_notifications).execute()
+    _maintain_blocks(service, calendar_id, settings, removed=[event_to_delete])
+    note_calendar_writes([calendar_id] + get_dependent_calendar_ids(calendar_id, settings))
     logger.info(f"Evento principal '{event_id}' deletado com sucesso.")
     return ActionResponse(message="Agendamento removido e bloqueios atualizados com sucesso.")
 
 # Em src/calendar_actions.py
 
-def update_event(credentials: Credentials, event_id: str, update_data: EventUpdateRequest, calendar_id: str, user_info: Dict[str, Any], settings: dict, send_notifications: bool = True) -> ActionResponse:
+def update_event(credentials: Credentials, event_id: str, update_data: EventUpdateRequest, calendar_id: str, user_info: Dict[str, Any], settings: dict, send_notifications: bool = True) -> Union[ActionResponse, Dict]:
     service = _get_calendar_service(credentials)
     
     try:
@@ -309,30 +702,8 @@ def update_event(credentials: Credentials, event_id: str, update_data: EventUpda
 
         if end_time <= start_time:
             raise HTTPException(status_code=400, detail="A data/hora de fim deve ser posterior à de início.")
-        
-        # OTIMIZAÇÃO: Usando events.list mas com checagem para evitar auto-conflito.
-        # freebusy.query não informa o ID do evento, tornando-o inadequado para updates.
-        try:
-            conflicting_events = service.events().list(
-                calendarId=calendar_id,
-                timeMin=start_time.isoformat(),
-                timeMax=end_time.isoformat(),
-                singleEvents=True
-            ).execute().get('items', [])
-
-            # Filtra o próprio evento que está sendo atualizado da lista de conflitos.
-            other_conflicts = [ev for ev in conflicting_events if ev.get('id') != event_id]
-
-            if other_conflicts:
-                raise HTTPException(status_code=409, detail="O novo horário para o reagendamento está em conflito com outro evento existente.")
-        except HttpError as e:
-            logger.error(f"Erro de API ao verificar conflitos para atualização: {e}")
-            raise HTTPException(status_code=500, detail="Erro ao verificar a disponibilidade para reagendamento.")
 
-    # 2. Lógica de atualização dos bloqueios (removendo os antigos)
-    _handle_block_updates_on_delete(service, original_event, settings)
-
-    # 3. Preparação do corpo da atualização
+    # 2. Preparação do corpo da atualização
     update_body = {}
     if update_data.summary is not None:
         update_body['summary'] = update_data.summary
@@ -349,20 +720,67 @@ def update_event(credentials: Credentials, event_id: str, update_data: EventUpda
     update_body['description'] = f"{base_description}\n\n---\nSolicitado por: {user_info.get('name')} ({user_info.get('email')})"
     # --- FIM DA OTIMIZAÇÃO E CORREÇÃO ---
 
-    # Aplica a atualização no evento principal
-    updated_event = service.events().patch(calendarId=calendar_id, eventId=event_id, body=update_body, sendNotifications=send_notifications).execute()
-
-    # Cria/atualiza os bloqueios para o novo horário
-    successful_blocks = _update_or_create_blocking_events(service, updated_event, user_info, settings)
+    # O novo horário fica reservado (quadra e dependentes) da checagem de conflito até o patch.
+    dependent_calendar_ids = get_dependent_calendar_ids(calendar_id, settings)
+    new_slots = [{'start': start_time, 'end': end_time}] if start_time and end_time else []
+    with reserve_slots(calendar_id, new_slots, dependent_calendar_ids) as reservation:
+        if reservation.rejected:
+            raise HTTPException(status_code=409, detail=RESERVED_REASON)
+
+        if new_slots:
+            # OTIMIZAÇÃO: Usando events.list mas com checagem para evitar auto-conflito.
+            # freebusy.query não informa o ID do evento, tornando-o inadequado para updates.
+            try:
+                mirror = get_mirror()
+                if mirror is not None and mirror.is_tracked(calendar_id):
+                    mirror.ensure_fresh(service, calendar_id, CONFLICT_MAX_STALENESS_SECONDS)
+                    conflicting_events = mirror.list_events(calendar_id, start_time, end_time)
+                else:
+                    conflicting_events = service.events().list(
+                        calendarId=calendar_id,
+                        timeMin=start_time.isoformat(),
+                        timeMax=end_time.isoformat(),
+                        singleEvents=True
+                    ).execute().get('items', [])
+
+                # Filtra o próprio evento que está sendo atualizado da lista de conflitos.
+                other_conflicts = [ev for ev in conflicting_events if ev.get('id') != event_id]
+
+                if other_conflicts:
+                    raise HTTPException(status_code=409, detail="O novo horário para o reagendamento está em conflito com outro evento existente.")
+            except HttpError as e:
+                logger.error(f"Erro de API ao verificar conflitos para atualização: {e}")
+                raise HTTPException(status_code=500, detail="Erro ao verificar a disponibilidade para reagendamento.")
+
+        # Aplica a atualização no evento principal
+        updated_event = service.events().patch(calendarId=calendar_id, eventId=event_id, body=update_body, sendNotifications=send_notifications).execute()
+        note_calendar_writes([calendar_id] + dependent_calendar_ids)
+
+        # Tira dos bloqueios o horário antigo e cobre o novo
+        successful_blocks = _maintain_blocks(service, calendar_id, settings, removed=[original_event], upserted=[updated_event])
+        if new_slots:
+            hold_queued_blocks(reservation, {'0': (updated_event, None)})
     
     summary_name = updated_event.get('summary', 'Sem Título')
     success_message = f"Agendamento '{summary_name}' atualizado com sucesso!"
     if successful_blocks > 0:
         success_message += f" {successful_blocks} agenda(s) dependente(s) foram bloqueada(s)/atualizada(s)."
     
-    parsed_event = GoogleCalendarEvent(**updated_event)
-    return ActionResponse(message=success_message, event=parsed_event)
+    return _as_model(ActionResponse, {'message': success_message, 'event': updated_event})
 
+def get_read_version(credentials: Credentials, calendar_id: str) -> Optional[str]:
+    """
+    Versão atual dos dados da quadra para montar ETags de leitura, ou None se não houver uma
+    versão confiável (quadra fora do espelho: edições feitas direto no Google não passam por aqui).
+    Sincroniza o espelho antes, se necessário, para que a versão corresponda ao que será lido.
+    """
+    mirror = get_mirror()
+    if mirror is None or not mirror.is_tracked(calendar_id):
+        return None
+    mirror.ensure_fresh(_get_calendar_service(credentials), calendar_id)
+    return get_court_version(calendar_id)
+
+@prioritized(Priority.INTERACTIVE)
 def find_events(
     credentials: Credentials,
     calendar_id: str = 'primary',
@@ -372,7 +790,7 @@ def find_events(
     max_results: int = 25,
     single_events: bool = True,
     order_by: str = 'startTime'
-) -> Optional[EventsResponse]:
+) -> Optional[Union[EventsResponse, Dict]]:
     service = _get_calendar_service(credentials)
     if not service:
         return None
@@ -391,19 +809,128 @@ def find_events(
     
     # Remove chaves com valor None para não enviar parâmetros vazios para a API
     list_kwargs = {k: v for k, v in list_kwargs.items() if v is not None}
+
+    # Com o espelho ativo, a leitura é local. Assim como os do Google, os page tokens do espelho
+    # carregam a consulta original (janela de tempo e offset), pois as páginas seguintes chegam sem ela.
+    mirror = get_mirror()
+    if mirror is not None and mirror.is_tracked(calendar_id) and single_events and (not page_token or page_token.startswith(MIRROR_PAGE_PREFIX)):
+        mirror.ensure_fresh(service, calendar_id)
+        query = {'offset': 0, 'timeMin': time_min, 'timeMax': time_max}
+        try:
+            if page_token:
+                query = json.loads(base64.urlsafe_b64decode(page_token[len(MIRROR_PAGE_PREFIX):].encode()).decode())
+            window_min = parser.isoparse(query['timeMin']) if query['timeMin'] else None
+            window_max = parser.isoparse(query['timeMax']) if query['timeMax'] else None
+            offset = int(query['offset'])
+        except (ValueError, TypeError, binascii.Error, KeyError):
+            raise HTTPException(status_code=400, detail="Page token inválido.")
+        items = mirror.list_events(calendar_id, window_min, window_max, offset=offset, limit=max_results + 1)
+        next_page_token = None
+        if len(items) > max_results:
+            query['offset'] = offset + max_results
+            next_page_token = MIRROR_PAGE_PREFIX + base64.urlsafe_b64encode(json.dumps(query).encode()).decode()
+        logger.info("Found %d events in local mirror for '%s'.", len(items[:max_results]), calendar_id)
+        return _as_model(EventsResponse, {'items': items[:max_results], 'nextPageToken': next_page_token})
     
-    logger.info(f"Fetching events from calendar '{calendar_id}' with parameters: {list_kwargs}")
+    logger.debug("Fetching events from calendar '%s' with parameters: %s", calendar_id, list_kwargs)
     
     try:
         events_result = service.events().list(**list_kwargs).execute()
-        logger.info(f"Found {len(events_result.get('items', []))} events.")
-        return EventsResponse(**events_result)
+        logger.info("Found %d events.", len(events_result.get('items', [])))
+        return _as_model(EventsResponse, events_result)
     except HttpError as error:
         logger.error(f"Google API Error: {error}")
         raise error
 
+# Página máxima do events.list; a exportação usa o limite da API para minimizar idas e voltas.
+EXPORT_PAGE_SIZE = 2500
+# Páginas buscadas à frente enquanto a atual é escrita. Limita a memória da exportação a
+# (EXPORT_PREFETCH_PAGES + 2) páginas, independentemente do tamanho do período.
+EXPORT_PREFETCH_PAGES = 1
+_EXPORT_DONE = object()
+
+def iter_event_pages(
+    credentials: Credentials,
+    calendar_id: str,
+    time_min: datetime,
+    time_max: datetime,
+    page_size: int = EXPORT_PAGE_SIZE,
+    prefetch_pages: int = EXPORT_PREFETCH_PAGES
+) -> Iterator[List[Dict]]:
+    """
+    Percorre, página a página, todos os eventos (ocorrências expandidas) da quadra no período.
+
+    Uma thread busca as páginas seguintes enquanto o consumidor processa a atual; a fila entre
+    as duas é limitada, então a thread espera quando o consumidor está atrasado. Quadras
+    acompanhadas pelo espelho local são lidas dele. Fechar o iterador interrompe a busca.
+    """
+    pages: queue.Queue = queue.Queue(maxsize=prefetch_pages)
+    stop = threading.Event()
+    mirror = get_mirror()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @prioritized(Priority.BACKGROUND)
+    def _produce():
+        try:
+            service = _get_calendar_service(credentials)
+            if mirror is not None and mirror.is_tracked(calendar_id):
+                mirror.ensure_fresh(service, calendar_id)
+                offset = 0
+                while True:
+                    items = mirror.list_events(calendar_id, time_min, time_max, offset=offset, limit=page_size)
+                    if items and not _put(items):
+                        return
+                    if len(items) < page_size:
+                        break
+                    offset += page_size
+            else:
+                page_token = None
+                while True:
+                    response = service.events().list(
+                        calendarId=calendar_id,
+                        timeMin=time_min.isoformat(),
+                        timeMax=time_max.isoformat(),
+                        singleEvents=True,
+                        orderBy='startTime',
+                        showDeleted=False,
+                        maxResults=page_size,
+                        pageToken=page_token
+                    ).execute()
+                    items = response.get('items', [])
+                    if items and not _put(items):
+                        return
+                    page_token = response.get('nextPageToken')
+                    if not page_token:
+                        break
+            _put(_EXPORT_DONE)
+        except Exception as e:
+            _put(e)
+
+    # O produtor herda o contexto da requisição (as chamadas ao Google contam na rota do export).
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(_produce,), name='events-export', daemon=True).start()
+    try:
+        while True:
+            item = pages.get()
+            if item is _EXPORT_DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
 # Em src/calendar_actions.py, adicione esta nova função
 
+@prioritized(Priority.INTERACTIVE)
 def get_availability(
     credentials: Credentials,
     calendar_id: str,
@@ -418,7 +945,12 @@ def get_availability(
         Ex: [{'start': datetime_obj, 'end': datetime_obj}]
     """
     service = _get_calendar_service(credentials)
-    logger.info(f"Verificando disponibilidade para o calendário '{calendar_id}' entre {time_min} e {time_max}")
+    logger.info("Verificando disponibilidade para o calendário '%s' entre %s e %s", calendar_id, time_min, time_max)
+
+    mirror = get_mirror()
+    if mirror is not None and mirror.is_tracked(calendar_id):
+        mirror.ensure_fresh(service, calendar_id)
+        return [{"start": start, "end": end} for start, end in mirror.busy_intervals(calendar_id, time_min, time_max)]
     
     try:
         freebusy_query = {
@@ -446,13 +978,72 @@ def get_availability(
             for interval in busy_intervals
         ]
         
-        logger.info(f"Encontrados {len(parsed_intervals)} horários ocupados.")
+        logger.info("Encontrados %d horários ocupados.", len(parsed_intervals))
         return parsed_intervals
 
     except HttpError as e:
         logger.error(f"Erro na chamada da API freebusy.query: {e}")
         raise HTTPException(status_code=500, detail="Erro interno ao consultar a API do Google Calendar.")
 
+def split_busy_by_day(
+    busy_by_calendar: Dict[str, List[Tuple[datetime, datetime]]],
+    errors: Dict[str, str],
+    day_windows: Dict[str, List[Tuple[date, datetime, datetime]]]
+) -> Dict[str, Dict[str, Any]]:
+    """Recorta os intervalos ocupados de cada calendário nas janelas dos seus dias."""
+    matrix = {}
+    for calendar_id, windows in day_windows.items():
+        index = IntervalIndex.from_intervals(busy_by_calendar.get(calendar_id, []))
+        matrix[calendar_id] = {
+            'days': {
+                day.isoformat(): [{"start": start, "end": end} for start, end in index.merged(day_start, day_end)]
+                for day, day_start, day_end in windows
+            },
+            'error': errors.get(calendar_id),
+        }
+    return matrix
+
+@prioritized(Priority.INTERACTIVE)
+def get_availability_matrix(
+    credentials: Credentials,
+    day_windows: Dict[str, List[Tuple[date, datetime, datetime]]]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Horários ocupados de várias quadras em vários dias, com uma única consulta freebusy
+    (ou uma por grupo de calendários/janela, nos limites da API). Quadras acompanhadas pelo
+    espelho local são lidas dele.
+
+    'day_windows' mapeia cada calendário para seus dias: (dia, início, fim) no fuso da quadra.
+    Retorna, por calendário: {'days': {'AAAA-MM-DD': [{'start', 'end'}]}, 'error': motivo ou None}.
+    """
+    service = _get_calendar_service(credentials)
+    mirror = get_mirror()
+    busy_by_calendar: Dict[str, List[Tuple[datetime, datetime]]] = {}
+    errors: Dict[str, str] = {}
+
+    remote_ids = []
+    for calendar_id, windows in day_windows.items():
+        if not windows:
+            continue
+        if mirror is not None and mirror.is_tracked(calendar_id):
+            mirror.ensure_fresh(service, calendar_id)
+            busy_by_calendar[calendar_id] = mirror.busy_intervals(calendar_id, windows[0][1], windows[-1][2])
+        else:
+            remote_ids.append(calendar_id)
+
+    if remote_ids:
+        time_min = min(day_windows[calendar_id][0][1] for calendar_id in remote_ids)
+        time_max = max(day_windows[calendar_id][-1][2] for calendar_id in remote_ids)
+        logger.info("Verificando disponibilidade de %d quadra(s) entre %s e %s", len(remote_ids), time_min, time_max)
+        try:
+            remote_busy, errors = _query_busy_intervals_multi(service, remote_ids, time_min, time_max)
+        except HttpError as e:
+            logger.error(f"Erro na chamada da API freebusy.query: {e}")
+            raise HTTPException(status_code=500, detail="Erro interno ao consultar a API do Google Calendar.")
+        busy_by_calendar.update(remote_busy)
+
+    return split_busy_by_day(busy_by_calendar, errors, day_windows)
+
 def quick_add_event(
     credentials: Credentials, text: str, calendar_id: str = 'primary', send_notifications: bool = False
 ) -> Optional[GoogleCalendarEvent]:
@@ -535,6 +1126,7 @@ def check_attendee_status(
             
     return status_map
 
+@prioritized(Priority.INTERACTIVE)
 def find_availability(
     credentials: Credentials, time_min: datetime, time_max: datetime, calendar_ids: List[str]
 ) -> Optional[Dict[str, Dict[str, Any]]]:
@@ -570,15 +1162,8 @@ def find_availability(
 
 def _merge_intervals(intervals: List[Dict[str, datetime]]) -> List[Dict[str, datetime]]:
     if not intervals: return []
-    sorted_intervals = sorted(intervals, key=lambda x: x['start'])
-    merged = [sorted_intervals[0]]
-    for current in sorted_intervals[1:]:
-        last_merged = merged[-1]
-        if current['start'] <= last_merged['end']:
-            merged[-1]['end'] = max(last_merged['end'], current['end'])
-        else:
-            merged.append(current)
-    return merged
+    index = IntervalIndex.from_intervals((interval['start'], interval['end']) for interval in intervals)
+    return [{'start': start, 'end': end} for start, end in index.merged()]
 
 def _find_first_available_slot(
     time_min: datetime, time_max: datetime, duration: timedelta, busy_intervals: List[Dict[str, datetime]],
@@ -593,16 +1178,10 @@ def _find_first_available_slot(
         return None
         
     effective_start = max(time_min_utc, now_utc)
-    busy_intervals_utc = []
-    for interval in busy_intervals:
-        try:
-            start_utc = interval['start'].astimezone(timezone.utc) if interval['start'].tzinfo else interval['start'].replace(tzinfo=timezone.utc)
-            end_utc = interval['end'].astimezone(timezone.utc) if interval['end'].tzinfo else interval['end'].replace(tzinfo=timezone.utc)
-            busy_intervals_utc.append({'start': start_utc, 'end': end_utc})
-        except Exception as busy_tz_err:
-             logger.warning(f"Could not normalize busy interval to UTC: {busy_tz_err}")
-             
-    busy_intervals_utc.sort(key=lambda x: x['start'])
+    # O índice trata datetimes sem fuso como UTC e salta blocos ocupados por bisect,
+    # em vez de reexaminar todos os intervalos a cada candidato.
+    busy_index = IntervalIndex.from_intervals((interval['start'], interval['end']) for interval in busy_intervals)
+    duration_seconds = duration.total_seconds()
     current_search_time = effective_start
     
     def is_within_working_hours(slot_start: datetime, slot_end: datetime) -> bool:
@@ -612,22 +1191,14 @@ def _find_first_available_slot(
         except TypeError: return True
         
     while current_search_time < time_max_utc:
-        potential_end_time = current_search_time + duration
-        if potential_end_time > time_max_utc: break
-        
-        overlap_found = False
-        for busy in busy_intervals_utc:
-            if current_search_time < busy['end'] and potential_end_time > busy['start']:
-                current_search_time = busy['end']
-                overlap_found = True
-                break
-                
-        if overlap_found: continue
+        slot_start = busy_index.next_free(current_search_time, duration_seconds, time_max_utc)
+        if slot_start is None: break
+        potential_end_time = slot_start + duration
         
-        if is_within_working_hours(current_search_time, potential_end_time):
-            return current_search_time, potential_end_time
+        if is_within_working_hours(slot_start, potential_end_time):
+            return slot_start, potential_end_time
         else:
-            current_search_time += timedelta(minutes=15)
+            current_search_time = slot_start + timedelta(minutes=15)
             
     return None
 
@@ -702,6 +1273,42 @@ def get_busyness_analysis(
 
 # Em src/calendar_actions.py, SUBSTITUA a função delete_recurring_event inteira por esta:
 
+def _list_series_events(service, calendar_id: str, series_id: str, time_min: Optional[datetime] = None) -> List[Dict]:
+    """Lista, percorrendo todas as páginas, os eventos de uma série (marcados com 'seriesId')."""
+    events = []
+    page_token = None
+    while True:
+        list_kwargs = {
+            'calendarId': calendar_id,
+            'privateExtendedProperty': f"seriesId={series_id}",
+            'singleEvents': True,
+            'maxResults': 2500,
+            'pageToken': page_token
+        }
+        if time_min is not None:
+            list_kwargs['timeMin'] = time_min.isoformat()
+        response = service.events().list(**list_kwargs).execute()
+        events.extend(response.get('items', []))
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return events
+
+def _delete_events_batch(service, calendar_id: str, events: List[Dict]) -> List[Dict]:
+    """
+    Apaga os eventos via batch e retorna os que de fato não existem mais
+    (inclui os que já tinham sido apagados, 404/410).
+    """
+    requests = [(event['id'], service.events().delete(calendarId=calendar_id, eventId=event['id'])) for event in events]
+    results = _execute_batch(service, requests) if requests else {}
+    deleted = []
+    for event in events:
+        _, error = results.get(event['id'], (None, None))
+        if error is None or (isinstance(error, HttpError) and error.resp.status in (404, 410)):
+            deleted.append(event)
+        else:
+            logger.error(f"Falha ao apagar a ocorrência '{event['id']}' da série: {error}")
+    return deleted
+
 def delete_recurring_event(credentials: Credentials, event_id: str, calendar_id: str, delete_scope: str, settings: dict) -> ActionResponse:
     """
     Deleta um evento recorrente com base no escopo ('this_event', 'future_events' ou 'all_events').
@@ -717,47 +1324,29 @@ def delete_recurring_event(credentials: Credentials, event_id: str, calendar_id:
     if delete_scope == 'this_event':
         # Apagamos o evento individual pelo seu ID.
         service.events().delete(calendarId=calendar_id, eventId=event_id).execute()
-        _handle_block_updates_on_delete(service, event_instance, settings)
+        _maintain_blocks(service, calendar_id, settings, removed=[event_instance])
+        note_calendar_writes([calendar_id] + get_dependent_calendar_ids(calendar_id, settings))
         return ActionResponse(message="Apenas esta ocorrência do evento foi cancelada.")
 
-    # --- CASO 2: Excluir esta e as futuras ocorrências (O BLOCO QUE FALTAVA) ---
-    elif delete_scope == 'future_events':
+    # --- CASO 2 e 3: Excluir esta e as futuras ocorrências, ou a série inteira ---
+    elif delete_scope in ('future_events', 'all_events'):
         series_id = event_instance.get('extendedProperties', {}).get('private', {}).get('seriesId')
         if not series_id:
             raise HTTPException(status_code=400, detail="Este não é um evento de uma série válida.")
-        
-        # Lista todos os eventos da mesma série a partir da data do evento clicado
-        instance_start_dt = parser.isoparse(event_instance['start']['dateTime'])
-        
-        future_events = service.events().list(
-            calendarId=calendar_id,
-            privateExtendedProperty=f"seriesId={series_id}",
-            timeMin=instance_start_dt.isoformat()
-        ).execute().get('items', [])
-        
-        for event_to_delete in future_events:
-            service.events().delete(calendarId=calendar_id, eventId=event_to_delete['id']).execute()
-            _handle_block_updates_on_delete(service, event_to_delete, settings)
-            
-        return ActionResponse(message=f"{len(future_events)} agendamento(s) (este e os futuros) foram excluídos.")
 
-    # --- CASO 3: Excluir todas as ocorrências da série (passadas e futuras) ---
-    elif delete_scope == 'all_events':
-        series_id = event_instance.get('extendedProperties', {}).get('private', {}).get('seriesId')
-        if not series_id:
-            raise HTTPException(status_code=400, detail="Este não é um evento de uma série válida.")
+        # Para 'future_events', lista a partir da data do evento clicado; para 'all_events', sem filtro de data
+        time_min = parser.isoparse(event_instance['start']['dateTime']) if delete_scope == 'future_events' else None
+        # A série inteira é operação em massa: cede a cota às leituras interativas. A exclusão de uma
+        # só ocorrência (acima) segue com a prioridade normal; os blocos já são BACKGROUND.
+        with upstream_priority(Priority.BACKGROUND):
+            events_to_delete = _list_series_events(service, calendar_id, series_id, time_min)
+            deleted_events = _delete_events_batch(service, calendar_id, events_to_delete)
+            _maintain_blocks(service, calendar_id, settings, removed=deleted_events)
+        note_calendar_writes([calendar_id] + get_dependent_calendar_ids(calendar_id, settings))
+
+        if delete_scope == 'future_events':
+            return ActionResponse(message=f"{len(deleted_events)} agendamento(s) (este e os futuros) foram excluídos.")
+        return ActionResponse(message=f"Todos os {len(deleted_events)} agendamento(s) da série foram excluídos.")
 
-        # Lista TODOS os eventos da mesma série, sem filtro de data
-        all_series_events = service.events().list(
-            calendarId=calendar_id,
-            privateExtendedProperty=f"seriesId={series_id}"
-        ).execute().get('items', [])
-        
-        for event_to_delete in all_series_events:
-            service.events().delete(calendarId=calendar_id, eventId=event_to_delete['id']).execute()
-            _handle_block_updates_on_delete(service, event_to_delete, settings)
-        
-        return ActionResponse(message=f"Todos os {len(all_series_events)} agendamento(s) da série foram excluídos.")
-    
     else:
         raise HTTPException(status_code=400, detail="Escopo de exclusão inválido.")
\ No newline at end of file
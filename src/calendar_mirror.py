@@ -0,0 +1,295 @@
+# src/calendar_mirror.py
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dateutil import parser
+from googleapiclient.errors import HttpError
+
+from .config import CompiledConfig, on_config_reload, settings
+from .court_versions import bump_court_versions
+from .interval_index import IntervalIndex
+from .upstream import Priority, prioritized
+
+logger = logging.getLogger(__name__)
+
+# Prefixo dos page tokens gerados pelo espelho (para não confundi-los com os do Google).
+MIRROR_PAGE_PREFIX = 'mirror:'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    calendar_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    start_ts REAL NOT NULL,
+    end_ts REAL NOT NULL,
+    transparent INTEGER NOT NULL DEFAULT 0,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (calendar_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS idx_events_range ON events (calendar_id, start_ts, end_ts);
+CREATE TABLE IF NOT EXISTS sync_state (
+    calendar_id TEXT PRIMARY KEY,
+    sync_token TEXT,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+def _from_ts(value: float) -> datetime:
+    return datetime.fromtimestamp(value, timezone.utc)
+
+
+def _event_bounds(event: Dict) -> Optional[Tuple[float, float]]:
+    """Converte o início/fim do evento em timestamps UTC. Eventos de dia inteiro usam meia-noite UTC."""
+    try:
+        start, end = event['start'], event['end']
+        start_dt = parser.isoparse(start['dateTime']) if 'dateTime' in start else datetime.fromisoformat(start['date']).replace(tzinfo=timezone.utc)
+        end_dt = parser.isoparse(end['dateTime']) if 'dateTime' in end else datetime.fromisoformat(end['date']).replace(tzinfo=timezone.utc)
+        return start_dt.timestamp(), end_dt.timestamp()
+    except (KeyError, ValueError, TypeError):
+        return None
+
+
+class CalendarMirror:
+    """
+    Espelho local (SQLite) dos calendários das quadras, mantido por sincronização incremental.
+
+    A primeira sincronização de cada calendário lista todos os eventos; as seguintes usam o
+    'nextSyncToken' do events.list e aplicam só as mudanças. Um 410 (token expirado) provoca uma
+    nova sincronização completa. As leituras são locais, desde que a última sincronização esteja
+    dentro do limite de defasagem informado.
+    """
+
+    def __init__(self, path: str, calendar_ids: List[str], max_staleness_seconds: float = 30.0):
+        self.path = path
+        self.calendar_ids = set(calendar_ids)
+        self.max_staleness_seconds = max_staleness_seconds
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db_lock = threading.Lock()
+        self._sync_locks = {calendar_id: threading.Lock() for calendar_id in self.calendar_ids}
+        self._dirty = set()
+        # Índices de intervalos ocupados por quadra, construídos sob demanda e mantidos a cada sincronização.
+        self._indexes: Dict[str, IntervalIndex] = {}
+        self.stats = {'full_syncs': 0, 'incremental_syncs': 0, 'resyncs_410': 0, 'reads': 0}
+        with self._db_lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(_SCHEMA)
+            self._synced_at = dict(self._conn.execute('SELECT calendar_id, synced_at FROM sync_state').fetchall())
+
+    def is_tracked(self, calendar_id: str) -> bool:
+        return calendar_id in self.calendar_ids
+
+    def set_tracked(self, calendar_ids: Iterable[str]):
+        """Passa a acompanhar exatamente estes calendários; os novos são sincronizados na primeira leitura."""
+        calendar_ids = set(calendar_ids)
+        for calendar_id in calendar_ids - self.calendar_ids:
+            self._sync_locks.setdefault(calendar_id, threading.Lock())
+        self.calendar_ids = calendar_ids
+
+    # --- Sincronização ---
+    def _list_all(self, service, **list_kwargs) -> Tuple[List[Dict], Optional[str]]:
+        items, page_token = [], None
+        while True:
+            response = service.events().list(pageToken=page_token, **list_kwargs).execute()
+            items.extend(response.get('items', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return items, response.get('nextSyncToken')
+
+    def _rows(self, calendar_id: str, events: List[Dict]):
+        for event in events:
+            bounds = _event_bounds(event)
+            if bounds is None:
+                continue
+            yield (calendar_id, event['id'], bounds[0], bounds[1], int(event.get('transparency') == 'transparent'), json.dumps(event))
+
+    def _full_sync(self, service, calendar_id: str):
+        events, sync_token = self._list_all(service, calendarId=calendar_id, singleEvents=True, showDeleted=False, maxResults=2500)
+        events = [event for event in events if event.get('status') != 'cancelled']
+        with self._db_lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.execute('DELETE FROM events WHERE calendar_id = ?', (calendar_id,))
+                self._conn.executemany('INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)', self._rows(calendar_id, events))
+                self._save_state(calendar_id, sync_token)
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._indexes.pop(calendar_id, None)
+        bump_court_versions([calendar_id])
+        self.stats['full_syncs'] += 1
+        logger.info(f"Espelho: sincronização completa de {calendar_id} ({len(events)} eventos).")
+
+    def _incremental_sync(self, service, calendar_id: str, sync_token: str):
+        changes, new_token = self._list_all(service, calendarId=calendar_id, singleEvents=True, maxResults=2500, syncToken=sync_token)
+        removed = [(calendar_id, event['id']) for event in changes if event.get('status') == 'cancelled']
+        upserts = [event for event in changes if event.get('status') != 'cancelled']
+        # Eventos alterados sem início/fim válidos não geram linha: a versão antiga precisa sair do espelho
+        untimed = [(calendar_id, event['id']) for event in upserts if _event_bounds(event) is None]
+        with self._db_lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany('DELETE FROM events WHERE calendar_id = ? AND event_id = ?', removed + untimed)
+                self._conn.executemany('INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?)', self._rows(calendar_id, upserts))
+                self._save_state(calendar_id, new_token or sync_token)
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            index = self._indexes.get(calendar_id)
+            if index is not None:
+                for _, event_id in removed:
+                    index.remove_key(event_id)
+                for event in upserts:
+                    bounds = _event_bounds(event)
+                    if bounds is None or event.get('transparency') == 'transparent':
+                        index.remove_key(event['id'])
+                    else:
+                        index.insert(_from_ts(bounds[0]), _from_ts(bounds[1]), key=event['id'])
+        self.stats['incremental_syncs'] += 1
+        if changes:
+            bump_court_versions([calendar_id])
+            logger.info(f"Espelho: {len(changes)} mudança(s) aplicadas em {calendar_id}.")
+
+    def _save_state(self, calendar_id: str, sync_token: Optional[str]):
+        now = time.time()
+        self._conn.execute('INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)', (calendar_id, sync_token, now))
+        self._synced_at[calendar_id] = now
+
+    def sync(self, service, calendar_id: str):
+        """Sincroniza um calendário (incremental quando há token, completa caso contrário)."""
+        with self._sync_locks[calendar_id]:
+            self._dirty.discard(calendar_id)
+            try:
+                with self._db_lock:
+                    row = self._conn.execute('SELECT sync_token FROM sync_state WHERE calendar_id = ?', (calendar_id,)).fetchone()
+                sync_token = row[0] if row else None
+                if not sync_token:
+                    self._full_sync(service, calendar_id)
+                    return
+                try:
+                    self._incremental_sync(service, calendar_id, sync_token)
+                except HttpError as e:
+                    if e.resp.status != 410:
+                        raise
+                    logger.warning(f"Espelho: sync token de {calendar_id} expirou (410). Ressincronizando.")
+                    self.stats['resyncs_410'] += 1
+                    self._full_sync(service, calendar_id)
+            except Exception:
+                # Mantém o calendário pendente para que a próxima leitura tente de novo.
+                self._dirty.add(calendar_id)
+                raise
+
+    def ensure_fresh(self, service, calendar_id: str, max_staleness_seconds: Optional[float] = None):
+        """Sincroniza o calendário se ele tiver escritas pendentes ou estiver além do limite de defasagem."""
+        bound = self.max_staleness_seconds if max_staleness_seconds is None else max_staleness_seconds
+        synced_at = self._synced_at.get(calendar_id)
+        if calendar_id in self._dirty or synced_at is None or time.time() - synced_at >= bound:
+            self.sync(service, calendar_id)
+
+    def note_write(self, calendar_id: str):
+        """Marca o calendário para sincronizar antes da próxima leitura (após uma escrita nossa)."""
+        if calendar_id in self.calendar_ids:
+            self._dirty.add(calendar_id)
+
+    # --- Leituras ---
+    def list_events(self, calendar_id: str, time_min: Optional[datetime] = None, time_max: Optional[datetime] = None,
+                    offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        """Eventos que intersectam [time_min, time_max), ordenados pelo início."""
+        query = 'SELECT payload FROM events WHERE calendar_id = ?'
+        params: list = [calendar_id]
+        if time_min is not None:
+            query += ' AND end_ts > ?'
+            params.append(time_min.timestamp())
+        if time_max is not None:
+            query += ' AND start_ts < ?'
+            params.append(time_max.timestamp())
+        query += ' ORDER BY start_ts, event_id LIMIT ? OFFSET ?'
+        params.extend([-1 if limit is None else limit, offset])
+        with self._db_lock:
+            rows = self._conn.execute(query, params).fetchall()
+        self.stats['reads'] += 1
+        return [json.loads(row[0]) for row in rows]
+
+    def _court_index(self, calendar_id: str) -> IntervalIndex:
+        # Chamado com _db_lock adquirido.
+        index = self._indexes.get(calendar_id)
+        if index is None:
+            rows = self._conn.execute(
+                'SELECT start_ts, end_ts, event_id FROM events WHERE calendar_id = ? AND transparent = 0', (calendar_id,)
+            ).fetchall()
+            index = IntervalIndex.from_intervals((_from_ts(start), _from_ts(end), event_id) for start, end, event_id in rows)
+            self._indexes[calendar_id] = index
+        return index
+
+    def busy_intervals(self, calendar_id: str, time_min: datetime, time_max: datetime) -> List[Tuple[datetime, datetime]]:
+        """Intervalos ocupados (eventos opacos), recortados à janela, ordenados e unidos, como no freebusy."""
+        with self._db_lock:
+            busy = self._court_index(calendar_id).merged(time_min, time_max)
+        self.stats['reads'] += 1
+        return busy
+
+    # --- Sincronização periódica ---
+    def start_background_sync(self, service_factory, interval_seconds: float):
+        """Mantém todos os calendários atualizados em uma thread daemon ('service_factory' devolve um serviço)."""
+        @prioritized(Priority.BACKGROUND)
+        def _loop():
+            while True:
+                time.sleep(interval_seconds)
+                try:
+                    service = service_factory()
+                except Exception as e:
+                    logger.error(f"Espelho: não foi possível obter o serviço para sincronizar: {e}")
+                    continue
+                for calendar_id in sorted(self.calendar_ids):
+                    try:
+                        self.ensure_fresh(service, calendar_id, max_staleness_seconds=interval_seconds)
+                    except Exception as e:
+                        logger.error(f"Espelho: falha ao sincronizar {calendar_id}: {e}")
+
+        threading.Thread(target=_loop, name='calendar-mirror-sync', daemon=True).start()
+
+
+_mirror_config = settings.get('calendar_mirror', {})
+_mirror: Optional[CalendarMirror] = None
+if _mirror_config.get('enabled'):
+    _mirror = CalendarMirror(
+        path=_mirror_config.get('path', 'calendar_mirror.sqlite3'),
+        calendar_ids=list(settings.get('quadras', {}).values()),
+        max_staleness_seconds=_mirror_config.get('max_staleness_seconds', 30),
+    )
+    logger.info(f"Espelho local de calendários ativado em '{_mirror.path}'.")
+
+def _track_reloaded_courts(old: CompiledConfig, new: CompiledConfig):
+    # Quadras adicionadas ou removidas no config.yaml entram/saem do espelho sem reiniciar.
+    if _mirror is not None and dict(old.court_ids) != dict(new.court_ids):
+        _mirror.set_tracked(new.court_ids.values())
+
+
+on_config_reload(_track_reloaded_courts)
+
+# Limite de defasagem das checagens de conflito de create_event/update_event. O padrão (0) faz
+# uma sincronização incremental antes de cada checagem: uma chamada barata que substitui o freebusy.
+CONFLICT_MAX_STALENESS_SECONDS = _mirror_config.get('conflict_max_staleness_seconds', 0)
+
+
+def get_mirror() -> Optional[CalendarMirror]:
+    """Retorna o espelho local, ou None se 'calendar_mirror.enabled' estiver desligado."""
+    return _mirror
+
+
+def note_calendar_writes(calendar_ids):
+    """
+    Avisa que os calendários foram alterados por este processo: os ETags das leituras dessas
+    quadras deixam de valer e o espelho (se ativo) sincroniza antes da próxima leitura.
+    """
+    calendar_ids = list(calendar_ids)
+    bump_court_versions(calendar_ids)
+    if _mirror is not None:
+        for calendar_id in calendar_ids:
+            _mirror.note_write(calendar_id)
@@ -0,0 +1,326 @@
+# src/compression.py
+import logging
+import re
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_compression_config = settings.get('compression', {})
+
+# Tipos que valem a pena comprimir (JSON, NDJSON e texto).
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/', 'application/javascript')
+# Corpos maiores que isso são comprimidos fora do event loop.
+OFFLOAD_THRESHOLD = 256 * 1024
+# Faixas de tamanho (bytes, antes da compressão) usadas nas estatísticas, para escolher o limite mínimo.
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+_ETAG_SUFFIX = re.compile(r'-(gzip|br|zstd)"')
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        # Z_SYNC_FLUSH: cada pedaço sai decodificável, sem esperar o fim do stream.
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def available_encodings() -> List[str]:
+    """Codificações suportadas neste processo (brotli e zstd dependem de pacotes opcionais)."""
+    encodings = []
+    if brotli is not None:
+        encodings.append('br')
+    if zstandard is not None:
+        encodings.append('zstd')
+    encodings.append('gzip')
+    return encodings
+
+
+def _size_bucket(size: int) -> str:
+    for limit in SIZE_BUCKETS:
+        if size < limit:
+            return f"<{limit // 1024}KiB"
+    return f">={SIZE_BUCKETS[-1] // 1024}KiB"
+
+
+class CompressionStats:
+    """Bytes antes/depois e tempo de CPU da compressão, por codificação e faixa de tamanho."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_encoding: Dict[Tuple[str, str], Dict] = {}
+        self.skipped = {'below_minimum': 0, 'not_accepted': 0, 'not_compressible': 0}
+        self.skipped_bytes = 0
+
+    def record(self, encoding: str, bucket: str, bytes_in: int, bytes_out: int, cpu_seconds: float):
+        with self._lock:
+            entry = self._by_encoding.setdefault((encoding, bucket), {'responses': 0, 'bytes_in': 0, 'bytes_out': 0, 'cpu_seconds': 0.0})
+            entry['responses'] += 1
+            entry['bytes_in'] += bytes_in
+            entry['bytes_out'] += bytes_out
+            entry['cpu_seconds'] += cpu_seconds
+
+    def skip(self, reason: str, size: int = 0):
+        with self._lock:
+            self.skipped[reason] += 1
+            self.skipped_bytes += size
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            entries = {key: dict(value) for key, value in self._by_encoding.items()}
+            stats = {'skipped': dict(self.skipped), 'skipped_bytes': self.skipped_bytes}
+        encodings: Dict[str, Dict] = {}
+        for (encoding, bucket), entry in sorted(entries.items()):
+            entry['ratio'] = round(entry['bytes_in'] / entry['bytes_out'], 3) if entry['bytes_out'] else None
+            entry['cpu_ms_per_mib'] = round(entry['cpu_seconds'] * 1000 / (entry['bytes_in'] / 1048576), 3) if entry['bytes_in'] else None
+            entry['cpu_seconds'] = round(entry['cpu_seconds'], 6)
+            encodings.setdefault(encoding, {})[bucket] = entry
+        stats['encodings'] = encodings
+        return stats
+
+
+_stats = CompressionStats()
+
+
+def get_compression_stats() -> dict:
+    """Taxa de compressão e CPU gasto, por codificação e faixa de tamanho, e respostas não comprimidas."""
+    stats = _stats.get_stats()
+    stats['available_encodings'] = available_encodings()
+    return stats
+
+
+def _accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    accepted = {}
+    for item in accept_encoding.split(','):
+        parts = [part.strip() for part in item.split(';')]
+        if not parts[0]:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        accepted[parts[0].lower()] = quality
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI de compressão negociada pelo Accept-Encoding (preferência do servidor: a ordem
+    de 'encodings'). Respostas menores que 'minimum_size' saem sem compressão; respostas em
+    streaming são comprimidas pedaço a pedaço. O ETag das respostas comprimidas ganha o sufixo
+    da codificação ("abc" -> "abc-gzip") e o sufixo é removido do If-None-Match recebido, então
+    os endpoints continuam comparando os ETags que eles mesmos geram.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, encodings: Optional[List[str]] = None,
+                 gzip_level: int = 6, brotli_quality: int = 4, zstd_level: int = 3):
+        self.app = app
+        self.minimum_size = minimum_size
+        supported = available_encodings()
+        self.encodings = [encoding for encoding in (encodings or supported) if encoding in supported]
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.zstd_level = zstd_level
+
+    def _negotiate(self, accept_encoding: str) -> Optional[str]:
+        accepted = _accepted_encodings(accept_encoding)
+        wildcard = accepted.get('*', 0.0)
+        for encoding in self.encodings:
+            if accepted.get(encoding, wildcard) > 0:
+                return encoding
+        return None
+
+    def new_encoder(self, encoding: str):
+        if encoding == 'br':
+            return _BrotliEncoder(self.brotli_quality)
+        if encoding == 'zstd':
+            return _ZstdEncoder(self.zstd_level)
+        return _GzipEncoder(self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        request_suffix = _strip_if_none_match_suffix(scope)
+        encoding = self._negotiate(Headers(scope=scope).get('accept-encoding', ''))
+        responder = _CompressionResponder(self, encoding, request_suffix, send)
+        await self.app(scope, receive, responder.send)
+
+
+def _strip_if_none_match_suffix(scope) -> Optional[str]:
+    """Remove os sufixos de codificação do If-None-Match; retorna o sufixo encontrado (ex.: 'gzip')."""
+    found = None
+    headers = []
+    for name, value in scope['headers']:
+        if name == b'if-none-match':
+            text = value.decode('latin-1')
+            match = _ETAG_SUFFIX.search(text)
+            if match:
+                found = match.group(1)
+                value = _ETAG_SUFFIX.sub('"', text).encode('latin-1')
+        headers.append((name, value))
+    scope['headers'] = headers
+    return found
+
+
+def _suffixed_etag(etag: str, encoding: str) -> str:
+    return etag[:-1] + f'-{encoding}"' if etag.endswith('"') else etag
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: Optional[str], request_suffix: Optional[str], send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.request_suffix = request_suffix
+        self._send = send
+        self.start_message = None
+        self.mode = None  # 'identity' ou 'stream', decidido no primeiro pedaço do corpo
+        self.encoder = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+
+    def _compress(self, data: bytes, finish: bool) -> bytes:
+        started = time.thread_time()
+        output = self.encoder.compress(data) if data else b''
+        if finish:
+            output += self.encoder.finish()
+        self.cpu_seconds += time.thread_time() - started
+        self.bytes_in += len(data)
+        self.bytes_out += len(output)
+        return output
+
+    async def send(self, message):
+        message_type = message['type']
+        if message_type == 'http.response.start':
+            self.start_message = message
+            return
+        if message_type != 'http.response.body':
+            await self._send(message)
+            return
+        if self.mode is None:
+            await self._start(message)
+        elif self.mode == 'identity':
+            await self._send(message)
+        else:
+            more_body = message.get('more_body', False)
+            body = self._compress(message.get('body', b''), finish=not more_body)
+            if not more_body:
+                self._record()
+            if body or not more_body:
+                await self._send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
+
+    async def _start(self, message):
+        start = self.start_message
+        headers = MutableHeaders(raw=start['headers'])
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+        status = start['status']
+
+        content_type = headers.get('content-type', '')
+        compressible = (
+            status not in (204, 304) and 'content-encoding' not in headers
+            and any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+        )
+        if status == 304 and self.request_suffix and 'etag' in headers:
+            # O cliente guardou a versão comprimida: o 304 confirma o mesmo ETag (com sufixo).
+            headers['etag'] = _suffixed_etag(headers['etag'], self.request_suffix)
+        if compressible:
+            headers.add_vary_header('Accept-Encoding')
+
+        if not compressible or self.encoding is None or (not more_body and len(body) < self.middleware.minimum_size):
+            if not compressible:
+                _stats.skip('not_compressible')
+            elif self.encoding is None:
+                _stats.skip('not_accepted', len(body))
+            else:
+                _stats.skip('below_minimum', len(body))
+            self.mode = 'identity'
+            await self._send(start)
+            await self._send(message)
+            return
+
+        self.mode = 'stream'
+        self.encoder = self.middleware.new_encoder(self.encoding)
+        headers['content-encoding'] = self.encoding
+        if 'etag' in headers:
+            headers['etag'] = _suffixed_etag(headers['etag'], self.encoding)
+        if more_body:
+            del headers['content-length']
+            compressed = self._compress(body, finish=False)
+        else:
+            if len(body) > OFFLOAD_THRESHOLD:
+                compressed = await anyio.to_thread.run_sync(self._compress, body, True)
+            else:
+                compressed = self._compress(body, finish=True)
+            headers['content-length'] = str(len(compressed))
+            self._record()
+        await self._send(start)
+        await self._send({'type': 'http.response.body', 'body': compressed, 'more_body': more_body})
+
+    def _record(self):
+        _stats.record(self.encoding, _size_bucket(self.bytes_in), self.bytes_in, self.bytes_out, self.cpu_seconds)
+
+
+def add_compression(app):
+    """Registra o CompressionMiddleware conforme a seção 'compression' do config.yaml (ligado por padrão)."""
+    if not _compression_config.get('enabled', True):
+        logger.info("Compressão de respostas desligada.")
+        return
+    encodings = [encoding for encoding in (_compression_config.get('encodings') or available_encodings()) if encoding in available_encodings()]
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=_compression_config.get('minimum_size', 1024),
+        encodings=encodings,
+        gzip_level=_compression_config.get('gzip_level', 6),
+        brotli_quality=_compression_config.get('brotli_quality', 4),
+        zstd_level=_compression_config.get('zstd_level', 3),
+    )
+    logger.info(f"Compressão de respostas ativada ({', '.join(encodings)}).")
@@ -1,21 +1,228 @@
 # src/config.py
+import os
+import threading
+import types
+from collections.abc import Mapping
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
 import yaml
 import logging
 
 logger = logging.getLogger(__name__)
 
-def load_config():
+# Caminho do arquivo de configuração (pode ser trocado pela variável de ambiente CONFIG_PATH).
+CONFIG_PATH = os.environ.get('CONFIG_PATH', 'config.yaml')
+
+
+class ConfigError(ValueError):
+    """O conteúdo do config.yaml não é válido."""
+
+
+def _freeze(value):
+    """Cópia imutável: dicts viram MappingProxyType e listas viram tuplas."""
+    if isinstance(value, dict):
+        return types.MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class CompiledConfig(Mapping):
+    """
+    Configuração imutável, validada e pré-processada a partir do config.yaml.
+
+    Continua se comportando como o dict original (get, [], in), mas também expõe as estruturas
+    que os endpoints usam a cada requisição: os mapas nome↔ID das quadras, o conjunto de admins
+    e as dependências diretas entre quadras.
+    """
+
+    def __init__(self, raw: Optional[dict] = None, source_mtime: Optional[float] = None):
+        raw = raw or {}
+        if not isinstance(raw, dict):
+            raise ConfigError("O config.yaml deve conter um mapeamento na raiz.")
+        self._raw = _freeze(raw)
+        self.source_mtime = source_mtime
+
+        quadras = raw.get('quadras') or {}
+        if not isinstance(quadras, dict) or not all(isinstance(k, str) and isinstance(v, str) for k, v in quadras.items()):
+            raise ConfigError("'quadras' deve mapear nomes simples para IDs de calendário.")
+        if len(set(quadras.values())) != len(quadras):
+            raise ConfigError("'quadras' contém IDs de calendário repetidos.")
+        self.court_ids: Mapping[str, str] = types.MappingProxyType(dict(quadras))
+        self.court_names: Mapping[str, str] = types.MappingProxyType({v: k for k, v in quadras.items()})
+
+        admin_users = (raw.get('permissions') or {}).get('admin_users') or []
+        if not isinstance(admin_users, (list, tuple)):
+            raise ConfigError("'permissions.admin_users' deve ser uma lista de emails.")
+        self.admin_users: FrozenSet[str] = frozenset(admin_users)
+
+        rules = raw.get('court_dependency_rules') or {}
+        if not isinstance(rules, dict):
+            raise ConfigError("'court_dependency_rules' deve mapear quadras para listas de quadras.")
+        dependencies = {}
+        for name, dependents in rules.items():
+            if name not in quadras:
+                logger.warning(f"Regra de dependência para quadra desconhecida '{name}' ignorada.")
+                continue
+            unknown = [dep for dep in dependents or [] if dep not in quadras]
+            if unknown:
+                logger.warning(f"Quadras desconhecidas em court_dependency_rules['{name}'] ignoradas: {unknown}")
+            # Mantém a ordem do arquivo (é a ordem em que os blocos são criados).
+            dependencies[name] = tuple(dict.fromkeys(dep for dep in dependents or [] if dep in quadras and dep != name))
+        self.dependencies: Mapping[str, Tuple[str, ...]] = types.MappingProxyType(dependencies)
+        self._dependent_ids: Dict[str, Tuple[str, ...]] = {
+            quadras[name]: tuple(quadras[dep] for dep in deps) for name, deps in dependencies.items()
+        }
+
+    # --- Interface de dict (somente leitura) ---
+    def __getitem__(self, key):
+        return self._raw[key]
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __len__(self):
+        return len(self._raw)
+
+    # --- Consultas pré-calculadas ---
+    def is_admin(self, email: Optional[str]) -> bool:
+        return email in self.admin_users
+
+    def dependent_ids(self, calendar_id: str) -> Tuple[str, ...]:
+        """IDs reais das quadras que dependem diretamente da quadra informada."""
+        return self._dependent_ids.get(calendar_id, ())
+
+
+def load_config(path: Optional[str] = None) -> CompiledConfig:
+    path = path or CONFIG_PATH
     try:
-        with open('config.yaml', 'r', encoding='utf-8') as f:
+        with open(path, 'r', encoding='utf-8') as f:
             config = yaml.safe_load(f)
-        logger.info("Arquivo 'config.yaml' carregado com sucesso.")
-        return config
+        compiled = CompiledConfig(config, source_mtime=os.path.getmtime(path))
+        logger.info(f"Arquivo '{path}' carregado com sucesso.")
+        return compiled
     except FileNotFoundError:
-        logger.error("ERRO CRÍTICO: Arquivo 'config.yaml' não foi encontrado na raiz do projeto.")
-        return {} # Retorna um dict vazio para evitar que a aplicação quebre
+        logger.error(f"ERRO CRÍTICO: Arquivo '{path}' não foi encontrado na raiz do projeto.")
+        return CompiledConfig() # Retorna uma configuração vazia para evitar que a aplicação quebre
     except Exception as e:
-        logger.error(f"Erro ao carregar ou processar 'config.yaml': {e}")
-        return {}
+        logger.error(f"Erro ao carregar ou processar '{path}': {e}")
+        return CompiledConfig()
+
+
+# O que a recarga alcança: quadras, regras de dependência e administradores são lidos da
+# configuração em vigor a cada uso. As seções abaixo são copiadas pelos módulos na importação
+# (limites, caches, filas, URLs, audiência dos tokens...) e só mudam reiniciando o processo.
+RESTART_REQUIRED_KEYS = (
+    'gcp_client_id', 'id_token_certs_url', 'google_api_root_url', 'config_reload_interval_seconds',
+    'async_client', 'block_queue', 'calendar_mirror', 'compression', 'court_access_cache', 'credentials_cache',
+    'logging', 'metrics', 'profiling', 'reservations', 'serialization', 'service_pool', 'upstream', 'warmup',
+)
+
+_current: CompiledConfig = load_config()
+_reload_lock = threading.Lock()
+_reload_callbacks: List[Callable[[CompiledConfig, CompiledConfig], None]] = []
+_watcher_stop = threading.Event()
+_watcher_thread: Optional[threading.Thread] = None
+
+
+def get_config() -> CompiledConfig:
+    """Retorna a configuração compilada em vigor (troca atômica a cada recarga)."""
+    return _current
+
+
+def on_config_reload(callback: Callable[[CompiledConfig, CompiledConfig], None]):
+    """Registra uma função chamada com (antiga, nova) sempre que a configuração é recarregada."""
+    _reload_callbacks.append(callback)
+
+
+def reload_config(path: Optional[str] = None) -> bool:
+    """
+    Relê o arquivo e, se ele for válido, troca a configuração em vigor.
+    Um arquivo inválido mantém a configuração anterior. Retorna True se houve troca.
+    Mudanças nas seções de RESTART_REQUIRED_KEYS são apenas avisadas no log.
+    """
+    global _current
+    path = path or CONFIG_PATH
+    with _reload_lock:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                raw = yaml.safe_load(f)
+            new = CompiledConfig(raw, source_mtime=os.path.getmtime(path))
+        except Exception as e:
+            logger.error(f"Recarga de '{path}' ignorada, a configuração anterior continua em vigor: {e}")
+            return False
+        old, _current = _current, new
+    logger.info(f"Configuração recarregada de '{path}'.")
+    pending = [key for key in RESTART_REQUIRED_KEYS if old.get(key) != new.get(key)]
+    if pending:
+        logger.warning(f"Seções alteradas que só valem após reiniciar o processo: {pending}")
+    for callback in list(_reload_callbacks):
+        try:
+            callback(old, new)
+        except Exception as e:
+            logger.error(f"Erro ao aplicar a recarga da configuração em {callback!r}: {e}")
+    return True
+
+
+def start_config_watcher(interval_seconds: float = 5.0, path: Optional[str] = None):
+    """Verifica o mtime do arquivo periodicamente (thread daemon) e recarrega quando ele muda."""
+    global _watcher_thread
+    if _watcher_thread is not None and _watcher_thread.is_alive():
+        return
+    path = path or CONFIG_PATH
+
+    def _loop():
+        last_mtime = _current.source_mtime
+        while not _watcher_stop.wait(interval_seconds):
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if mtime != last_mtime:
+                # Um arquivo inválido também é marcado como visto, para não tentar de novo a cada volta.
+                last_mtime = mtime
+                reload_config(path)
+
+    _watcher_stop.clear()
+    _watcher_thread = threading.Thread(target=_loop, name='config-watcher', daemon=True)
+    _watcher_thread.start()
+
+
+def stop_config_watcher():
+    _watcher_stop.set()
+
+
+class _SettingsProxy(Mapping):
+    """
+    'settings' continua sendo usado como um dict; cada acesso lê a configuração em vigor,
+    então o código que guarda a referência enxerga as recargas.
+    """
+
+    def __getitem__(self, key):
+        return _current[key]
+
+    def __iter__(self):
+        return iter(_current)
+
+    def __len__(self):
+        return len(_current)
+
+    def __repr__(self):
+        return f"<settings {dict(_current)!r}>"
+
+    @property
+    def compiled(self) -> CompiledConfig:
+        return _current
+
+
+def as_compiled(config: Mapping) -> CompiledConfig:
+    """Aceita 'settings', uma CompiledConfig ou um dict comum e devolve a versão compilada."""
+    if isinstance(config, CompiledConfig):
+        return config
+    if isinstance(config, _SettingsProxy):
+        return config.compiled
+    return CompiledConfig(dict(config))
+
 
 # Carrega as configurações uma vez para serem usadas em toda a aplicação
-settings = load_config()
\ No newline at end of file
+settings = _SettingsProxy()
@@ -0,0 +1,173 @@
+# src/court_access.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Optional
+
+from fastapi import HTTPException
+
+from .auth import get_service_account_credentials
+from .config import CompiledConfig, get_config, on_config_reload, settings
+from .service_pool import get_calendar_service
+
+logger = logging.getLogger(__name__)
+
+_access_config = settings.get('court_access_cache', {})
+
+
+class CourtAccessCache:
+    """
+    Cache, por usuário, das quadras visíveis na sua lista de calendários do Google.
+
+    As entradas expiram após 'ttl_seconds' e podem ser invalidadas explicitamente (por usuário
+    ou todas). Buscas simultâneas do mesmo usuário esperam a primeira, em vez de repeti-la.
+    Falhas não são guardadas.
+    """
+
+    def __init__(self, ttl_seconds: float = 300, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()  # email -> (expira_em, nomes)
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+        # Geração global (invalidate() de todos) e por usuário: uma carga iniciada antes de uma
+        # invalidação é descartada em vez de regravar o resultado antigo.
+        self._generation = 0
+        self._user_generations: Dict[str, int] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'invalidations': 0, 'evictions': 0, 'stale_loads': 0}
+
+    def _generation_of(self, email: str) -> tuple:
+        # Chamado com _lock adquirido.
+        return self._generation, self._user_generations.get(email, 0)
+
+    def _lookup(self, email: str) -> Optional[FrozenSet[str]]:
+        # Chamado com _lock adquirido.
+        entry = self._entries.get(email)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[email]
+            self.stats['expired'] += 1
+            return None
+        self._entries.move_to_end(email)
+        return entry[1]
+
+    def get(self, email: str, loader: Callable[[str], FrozenSet[str]]) -> FrozenSet[str]:
+        with self._lock:
+            names = self._lookup(email)
+            if names is not None:
+                self.stats['hits'] += 1
+                return names
+            load_lock = self._loading.setdefault(email, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                names = self._lookup(email)
+                if names is not None:
+                    # Outra thread acabou de carregar este usuário.
+                    self.stats['hits'] += 1
+                    return names
+                self.stats['misses'] += 1
+                generation = self._generation_of(email)
+            try:
+                names = frozenset(loader(email))
+            except BaseException:
+                with self._lock:
+                    self._loading.pop(email, None)
+                raise
+            # Gravação e fim da carga no mesmo trecho do lock: quem chegar depois encontra a entrada.
+            with self._lock:
+                self._loading.pop(email, None)
+                if self._generation_of(email) != generation:
+                    self.stats['stale_loads'] += 1
+                    return names
+                self._entries[email] = (time.monotonic() + self.ttl_seconds, names)
+                self._entries.move_to_end(email)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.stats['evictions'] += 1
+            return names
+
+    def invalidate(self, email: Optional[str] = None) -> int:
+        """Descarta a entrada do usuário (ou todas, se 'email' for None). Retorna quantas foram removidas."""
+        with self._lock:
+            if email is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._generation += 1
+                self._user_generations.clear()
+            else:
+                removed = 1 if self._entries.pop(email, None) is not None else 0
+                self._user_generations[email] = self._user_generations.get(email, 0) + 1
+            self.stats['invalidations'] += removed
+        return removed
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+        stats['ttl_seconds'] = self.ttl_seconds
+        return stats
+
+
+_cache = CourtAccessCache(
+    ttl_seconds=_access_config.get('ttl_seconds', 300),
+    max_entries=_access_config.get('max_entries', 1024),
+)
+
+
+def _load_accessible_court_names(email: str) -> FrozenSet[str]:
+    """Lista (todas as páginas) os calendários do usuário, personificando-o, e traduz para nomes simples."""
+    service = get_calendar_service(get_service_account_credentials(email))
+    # Mapa reverso (ID real -> nome simples), pré-calculado na configuração compilada.
+    id_to_name_map = get_config().court_names
+    names, page_token = set(), None
+    while True:
+        response = service.calendarList().list(
+            pageToken=page_token, maxResults=250, fields='items(id),nextPageToken'
+        ).execute()
+        for calendar in response.get('items', []):
+            name = id_to_name_map.get(calendar.get('id'))
+            if name is not None:
+                names.add(name)
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return frozenset(names)
+
+
+def get_accessible_court_names(user_info: dict) -> FrozenSet[str]:
+    """
+    Retorna os nomes simples das quadras que o usuário pode ver.
+    Admins veem todas; os demais, as que aparecem na sua lista de calendários do Google (em cache).
+    """
+    if user_info.get('isAdmin'):
+        return frozenset(get_config().court_ids)
+    try:
+        return _cache.get(user_info['email'], _load_accessible_court_names)
+    except Exception as e:
+        logger.error(f"Erro ao buscar calendários para o usuário {user_info.get('email')}: {e}")
+        raise HTTPException(status_code=500, detail="Não foi possível verificar as permissões de calendário do usuário.")
+
+
+def invalidate_court_access(email: Optional[str] = None) -> int:
+    """Esquece as quadras em cache de um usuário (ou de todos), p.ex. após mudar o compartilhamento."""
+    removed = _cache.invalidate(email)
+    logger.info(f"Cache de acesso às quadras invalidado ({email or 'todos'}): {removed} entrada(s).")
+    return removed
+
+
+def _invalidate_on_court_changes(old: CompiledConfig, new: CompiledConfig):
+    # As entradas guardam nomes simples: se o mapa de quadras mudar, elas deixam de valer.
+    if dict(old.court_ids) != dict(new.court_ids):
+        invalidate_court_access()
+
+
+on_config_reload(_invalidate_on_court_changes)
+
+
+def get_court_access_stats() -> dict:
+    """Acertos, faltas, taxa de acerto e tamanho do cache de acesso às quadras."""
+    return _cache.get_stats()
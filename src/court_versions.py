@@ -0,0 +1,67 @@
+# src/court_versions.py
+import hashlib
+import threading
+import uuid
+from typing import Dict, Iterable, Optional
+
+# Identifica este processo: as versões recomeçam do zero a cada inicialização, então um ETag
+# emitido antes de um restart (ou por outro worker) nunca coincide por acaso com um novo.
+_EPOCH = uuid.uuid4().hex[:8]
+
+
+class CourtVersions:
+    """
+    Contador de versão por quadra, incrementado a cada escrita feita por este processo e a cada
+    sincronização do espelho que trouxe mudanças. Duas leituras com a mesma versão (e os mesmos
+    parâmetros) devolvem o mesmo conteúdo, o que permite responder 304 sem refazer a consulta.
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def bump(self, calendar_ids: Iterable[str]):
+        with self._lock:
+            for calendar_id in calendar_ids:
+                self._versions[calendar_id] = self._versions.get(calendar_id, 0) + 1
+
+    def get(self, calendar_id: str) -> str:
+        with self._lock:
+            return f"{_EPOCH}.{self._versions.get(calendar_id, 0)}"
+
+
+_versions = CourtVersions()
+
+
+def bump_court_versions(calendar_ids: Iterable[str]):
+    """Invalida os ETags já emitidos para as quadras informadas."""
+    _versions.bump(calendar_ids)
+
+
+def get_court_version(calendar_id: str) -> str:
+    return _versions.get(calendar_id)
+
+
+def make_etag(*parts) -> str:
+    """ETag forte (entre aspas) a partir de uma impressão digital das partes informadas."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\x1f')
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Compara o cabeçalho If-None-Match (lista separada por vírgulas, '*' ou W/"...") com o ETag."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        # If-None-Match usa comparação fraca (RFC 9110, 13.1.2).
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
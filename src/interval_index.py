@@ -0,0 +1,193 @@
+# src/interval_index.py
+import bisect
+import itertools
+from datetime import datetime, timezone
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+def _ts(value: datetime) -> float:
+    """Converte para timestamp; datetimes sem fuso são tratados como UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _dt(value: float) -> datetime:
+    return datetime.fromtimestamp(value, timezone.utc)
+
+
+class IntervalIndex:
+    """
+    Índice ordenado de intervalos [início, fim) de uma quadra, baseado em listas ordenadas e bisect.
+
+    Mantém duas visões:
+    - os intervalos originais, ordenados pelo início (para saber *quais* intervalos se sobrepõem);
+    - a união deles, como intervalos disjuntos ordenados (para responder "está ocupado?" e
+      "qual o próximo horário livre?" em O(log n)).
+
+    Inserções atualizam a união de forma incremental; remoções a invalidam e ela é reconstruída
+    na próxima consulta. Intervalos que se tocam (fim == início) são unidos, como em _merge_intervals.
+    """
+
+    def __init__(self):
+        self._items: List[Tuple[float, float, int]] = []
+        self._keys: Dict[int, Any] = {}
+        self._by_key: Dict[Hashable, Tuple[float, float, int]] = {}
+        self._seq = itertools.count()
+        self._max_length = 0.0
+        self._union_starts: List[float] = []
+        self._union_ends: List[float] = []
+        self._union_valid = True
+
+    @classmethod
+    def from_intervals(cls, intervals: Iterable[Tuple]) -> 'IntervalIndex':
+        """
+        Carga em lote a partir de pares (início, fim), como os intervalos 'busy' do freebusy,
+        ou de triplas (início, fim, chave) para permitir remove_key depois.
+        """
+        index = cls()
+        for interval in intervals:
+            start_ts, end_ts = _ts(interval[0]), _ts(interval[1])
+            seq = next(index._seq)
+            index._items.append((start_ts, end_ts, seq))
+            if len(interval) > 2 and interval[2] is not None:
+                index._keys[seq] = interval[2]
+                index._by_key[interval[2]] = (start_ts, end_ts, seq)
+        index._items.sort()
+        index._max_length = max((end - start for start, end, _ in index._items), default=0.0)
+        index._union_valid = False
+        return index
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    # --- Atualizações ---
+    def insert(self, start: datetime, end: datetime, key: Optional[Hashable] = None):
+        """Insere um intervalo. Com 'key', um intervalo anterior com a mesma chave é substituído."""
+        if key is not None and key in self._by_key:
+            self.remove_key(key)
+        start_ts, end_ts = _ts(start), _ts(end)
+        seq = next(self._seq)
+        bisect.insort(self._items, (start_ts, end_ts, seq))
+        self._max_length = max(self._max_length, end_ts - start_ts)
+        if key is not None:
+            self._keys[seq] = key
+            self._by_key[key] = (start_ts, end_ts, seq)
+        if self._union_valid:
+            self._union_insert(start_ts, end_ts)
+
+    def remove_key(self, key: Hashable) -> bool:
+        """Remove o intervalo inserido com 'key'. Retorna False se a chave não existir."""
+        item = self._by_key.pop(key, None)
+        if item is None:
+            return False
+        self._keys.pop(item[2], None)
+        return self._remove_item(item)
+
+    def remove(self, start: datetime, end: datetime) -> bool:
+        """Remove um intervalo com exatamente esse início e fim (o mais antigo, se houver vários)."""
+        start_ts, end_ts = _ts(start), _ts(end)
+        i = bisect.bisect_left(self._items, (start_ts, end_ts, -1))
+        if i < len(self._items) and self._items[i][0] == start_ts and self._items[i][1] == end_ts:
+            item = self._items[i]
+            key = self._keys.pop(item[2], None)
+            if key is not None:
+                self._by_key.pop(key, None)
+            return self._remove_item(item)
+        return False
+
+    def _remove_item(self, item: Tuple[float, float, int]) -> bool:
+        i = bisect.bisect_left(self._items, item)
+        if i < len(self._items) and self._items[i] == item:
+            del self._items[i]
+            self._union_valid = False
+            return True
+        return False
+
+    # --- União (intervalos disjuntos) ---
+    def _union_insert(self, start: float, end: float):
+        starts, ends = self._union_starts, self._union_ends
+        # Primeiro intervalo da união que termina em ou depois de 'start' (pode se unir ao novo).
+        lo = bisect.bisect_left(ends, start)
+        # Primeiro intervalo que começa depois de 'end' (não se une).
+        hi = bisect.bisect_right(starts, end)
+        if lo < hi:
+            start = min(start, starts[lo])
+            end = max(end, ends[hi - 1])
+        starts[lo:hi] = [start]
+        ends[lo:hi] = [end]
+
+    def _ensure_union(self):
+        if self._union_valid:
+            return
+        starts, ends = [], []
+        for start, end, _ in self._items:
+            if starts and start <= ends[-1]:
+                if end > ends[-1]:
+                    ends[-1] = end
+            else:
+                starts.append(start)
+                ends.append(end)
+        self._union_starts, self._union_ends = starts, ends
+        self._union_valid = True
+
+    # --- Consultas ---
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        """Indica se [start, end) intersecta algum intervalo. O(log n)."""
+        self._ensure_union()
+        start_ts, end_ts = _ts(start), _ts(end)
+        i = bisect.bisect_left(self._union_starts, end_ts) - 1
+        return i >= 0 and self._union_ends[i] > start_ts
+
+    def find_overlapping(self, start: datetime, end: datetime) -> List[Tuple[datetime, datetime, Any]]:
+        """Retorna (início, fim, chave) de cada intervalo que intersecta [start, end), em ordem de início."""
+        start_ts, end_ts = _ts(start), _ts(end)
+        hi = bisect.bisect_left(self._items, (end_ts,))
+        # Só intervalos que começam depois de 'start - maior duração' podem alcançar 'start'.
+        lo = bisect.bisect_left(self._items, (start_ts - self._max_length,))
+        return [
+            (_dt(s), _dt(e), self._keys.get(seq))
+            for s, e, seq in self._items[lo:hi]
+            if e > start_ts
+        ]
+
+    def merged(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Tuple[datetime, datetime]]:
+        """União dos intervalos (disjuntos e ordenados), opcionalmente recortada a [start, end)."""
+        self._ensure_union()
+        starts, ends = self._union_starts, self._union_ends
+        lo, hi = 0, len(starts)
+        start_ts = _ts(start) if start is not None else None
+        end_ts = _ts(end) if end is not None else None
+        if start_ts is not None:
+            lo = bisect.bisect_right(ends, start_ts)
+        if end_ts is not None:
+            hi = bisect.bisect_left(starts, end_ts)
+        result = []
+        for i in range(lo, hi):
+            s, e = starts[i], ends[i]
+            if start_ts is not None:
+                s = max(s, start_ts)
+            if end_ts is not None:
+                e = min(e, end_ts)
+            result.append((_dt(s), _dt(e)))
+        return result
+
+    def next_free(self, start: datetime, duration_seconds: float, limit: datetime) -> Optional[datetime]:
+        """
+        Primeiro início t >= start tal que [t, t + duração) não intersecta nenhum intervalo
+        e termina até 'limit'. Pula blocos ocupados inteiros por bisect: O(log n + k).
+        """
+        self._ensure_union()
+        starts, ends = self._union_starts, self._union_ends
+        t, limit_ts = _ts(start), _ts(limit)
+        i = bisect.bisect_right(starts, t) - 1
+        if i >= 0 and ends[i] > t:
+            t = ends[i]
+        j = i + 1
+        while t + duration_seconds <= limit_ts:
+            if j < len(starts) and starts[j] < t + duration_seconds:
+                t = max(t, ends[j])
+                j += 1
+                continue
+            return _dt(t)
+        return None
@@ -0,0 +1,258 @@
+# src/log_pipeline.py
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .config import settings
+
+_logging_config = settings.get('logging', {})
+_rotation_config = _logging_config.get('rotation', {})
+_sampling_config = _logging_config.get('sampling', {})
+
+# Registros aguardando o thread de escrita; com a fila cheia, os novos são descartados (e contados)
+# em vez de bloquear a thread da requisição.
+QUEUE_SIZE = _logging_config.get('queue_size', 10000)
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Atributos padrão do LogRecord; os demais (passados via 'extra') vão como campos do JSON.
+# 'color_message' é a versão com cores ANSI que o uvicorn anexa às suas mensagens.
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'color_message'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro: ts (UTC), level, logger, thread, message, campos 'extra' e exc."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Amostragem de mensagens repetitivas de nível INFO ou abaixo: em cada janela de 'window_seconds',
+    as 'initial' primeiras ocorrências de um mesmo modelo de mensagem (logger + texto antes da
+    interpolação dos argumentos) passam e, depois disso, só uma a cada 'thereafter'. Avisos e erros
+    nunca são amostrados; os registros que passam depois do limite levam o campo 'sampled' (= 1/N).
+    """
+
+    def __init__(self, window_seconds: float = 1.0, initial: int = 20, thereafter: int = 10):
+        super().__init__()
+        self.window_seconds = window_seconds
+        self.initial = initial
+        self.thereafter = max(1, thereafter)
+        self._counts: Dict[tuple, int] = {}
+        self._window_started = time.monotonic()
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        key = (record.name, record.msg if isinstance(record.msg, str) else type(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            if now - self._window_started >= self.window_seconds:
+                self._counts.clear()
+                self._window_started = now
+            count = self._counts.get(key, 0) + 1
+            self._counts[key] = count
+            if count <= self.initial:
+                return True
+            if (count - self.initial) % self.thereafter:
+                self.dropped += 1
+                return False
+        record.sampled = self.thereafter
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que nunca bloqueia: com a fila cheia, o registro é descartado e contado.
+    A mensagem é interpolada aqui (só para os registros que passaram pelo nível e pela
+    amostragem); a formatação, o JSON e a escrita em disco ficam com o thread do QueueListener.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Interpola já, pois os argumentos podem mudar depois que a requisição seguir.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _file_handler(log_file_path: str) -> logging.Handler:
+    """Handler do arquivo conforme 'logging.rotation': por tamanho ('size', padrão), por tempo ('time') ou nenhuma."""
+    kind = _rotation_config.get('type', 'size')
+    backup_count = _rotation_config.get('backup_count', 5)
+    if kind == 'time':
+        return logging.handlers.TimedRotatingFileHandler(
+            log_file_path,
+            when=_rotation_config.get('when', 'midnight'),
+            interval=_rotation_config.get('interval', 1),
+            backupCount=backup_count,
+            encoding='utf-8',
+            utc=True,
+        )
+    if kind == 'size':
+        return logging.handlers.RotatingFileHandler(
+            log_file_path,
+            maxBytes=_rotation_config.get('max_bytes', 20 * 1024 * 1024),
+            backupCount=backup_count,
+            encoding='utf-8',
+        )
+    return logging.FileHandler(log_file_path, encoding='utf-8')
+
+
+class LogPipeline:
+    """
+    Fila única do processo e o QueueListener que escreve no console e no arquivo.
+
+    O dictConfig é aplicado mais de uma vez (run_server.py e de novo pelo uvicorn), e a cada vez
+    descarta os handlers anteriores: o listener continua o mesmo e só os seus handlers de destino
+    são recriados.
+    """
+
+    def __init__(self):
+        self.queue: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.queue_handlers: List[NonBlockingQueueHandler] = []
+        self.sampling: Optional[SamplingFilter] = None
+        self.log_file_path: Optional[str] = None
+        self.console = True
+        self._lock = threading.Lock()
+
+    def _targets(self) -> List[logging.Handler]:
+        targets = []
+        if self.console:
+            console = logging.StreamHandler(sys.stderr)
+            console.setFormatter(logging.Formatter(TEXT_FORMAT))
+            targets.append(console)
+        if self.log_file_path:
+            file_handler = _file_handler(self.log_file_path)
+            file_format = _logging_config.get('file_format', 'json')
+            file_handler.setFormatter(JsonFormatter() if file_format == 'json' else logging.Formatter(TEXT_FORMAT))
+            targets.append(file_handler)
+        return targets
+
+    def _swap_targets(self):
+        # Chamado com _lock adquirido. O listener lê 'handlers' a cada registro; a troca da tupla é atômica.
+        previous = self.listener.handlers
+        self.listener.handlers = tuple(self._targets())
+        for handler in previous:
+            handler.close()
+
+    def queue_handler(self, log_file_path: Optional[str]) -> NonBlockingQueueHandler:
+        with self._lock:
+            self.log_file_path = log_file_path or self.log_file_path
+            if self.sampling is None and _sampling_config.get('enabled', True):
+                self.sampling = SamplingFilter(
+                    window_seconds=_sampling_config.get('window_seconds', 1.0),
+                    initial=_sampling_config.get('initial', 20),
+                    thereafter=_sampling_config.get('thereafter', 10),
+                )
+            if self.listener is None:
+                self.listener = logging.handlers.QueueListener(self.queue, *self._targets(), respect_handler_level=False)
+                self.listener.start()
+                atexit.register(self.stop)
+            else:
+                self._swap_targets()
+            handler = NonBlockingQueueHandler(self.queue)
+            if self.sampling is not None:
+                handler.addFilter(self.sampling)
+            self.queue_handlers.append(handler)
+            return handler
+
+    def remove_console(self):
+        """Deixa de escrever no stderr (modo MCP, em que o stdio é do protocolo)."""
+        with self._lock:
+            self.console = False
+            if self.listener is not None:
+                self._swap_targets()
+
+    def stop(self):
+        """Esvazia a fila e encerra o thread de escrita (no desligamento do processo)."""
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                for handler in self.listener.handlers:
+                    handler.close()
+                self.listener = None
+
+    def get_stats(self) -> dict:
+        return {
+            'queue_depth': self.queue.qsize(),
+            'queue_size': QUEUE_SIZE,
+            'dropped_queue_full': sum(handler.dropped for handler in self.queue_handlers),
+            'dropped_sampling': self.sampling.dropped if self.sampling is not None else 0,
+        }
+
+
+_pipeline = LogPipeline()
+
+
+def make_queue_handler(log_file_path: Optional[str] = None) -> NonBlockingQueueHandler:
+    """Fábrica para o dictConfig ('()': 'src.log_pipeline.make_queue_handler')."""
+    return _pipeline.queue_handler(log_file_path)
+
+
+def build_logging_config(log_file_path: str) -> dict:
+    """
+    Configuração do logging (dictConfig) em que todos os loggers escrevem numa fila e um thread
+    em segundo plano faz o I/O: console em texto e arquivo em JSON, com rotação. Ver a seção
+    'logging' do config.yaml (queue_size, file_format, rotation, sampling).
+    """
+    return {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'handlers': {
+            'queue': {
+                '()': make_queue_handler,
+                'log_file_path': log_file_path,
+            },
+        },
+        'loggers': {
+            '': {'handlers': ['queue'], 'level': _logging_config.get('level', 'INFO')},
+            'uvicorn.error': {'level': 'INFO', 'handlers': ['queue'], 'propagate': False},
+            'uvicorn.access': {'level': 'WARNING', 'handlers': ['queue'], 'propagate': False},
+        },
+    }
+
+
+def remove_console_handler():
+    _pipeline.remove_console()
+
+
+def get_logging_stats() -> dict:
+    """Profundidade da fila e registros descartados (fila cheia ou amostragem)."""
+    return _pipeline.get_stats()
@@ -0,0 +1,319 @@
+# src/metrics.py
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Optional
+
+from googleapiclient.errors import HttpError
+from starlette.responses import Response
+from starlette.routing import Match
+
+from .config import settings
+from .profiling import active_profile
+
+logger = logging.getLogger(__name__)
+
+try:
+    import prometheus_client
+    from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+except ImportError:
+    prometheus_client = None
+    logger.info("prometheus_client não instalado: o endpoint /metrics fica desativado.")
+
+_metrics_config = settings.get('metrics', {})
+METRICS_ENABLED = prometheus_client is not None and bool(_metrics_config.get('enabled', True))
+
+# Rótulo das chamadas ao Google feitas fora de uma requisição (sincronização do espelho, aquecimento...).
+BACKGROUND_ROUTE = 'background'
+UNMATCHED_ROUTE = 'unmatched'
+
+if METRICS_ENABLED:
+    HTTP_REQUEST_DURATION = Histogram(
+        'http_request_duration_seconds', 'Duração das requisições HTTP, por rota.',
+        ['method', 'route', 'status'],
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    )
+    GOOGLE_API_CALLS = Counter(
+        'google_api_calls_total', 'Requisições HTTP à Google Calendar API (um batch conta uma vez), por método e rota de origem.',
+        ['method', 'route', 'status'],
+    )
+    GOOGLE_API_CALL_DURATION = Histogram(
+        'google_api_call_duration_seconds', 'Duração das requisições à Google Calendar API, por método e rota de origem.',
+        ['method', 'route'],
+        buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    )
+    GOOGLE_API_BATCHED = Counter(
+        'google_api_batched_requests_total', 'Operações enviadas dentro de batches, por método e rota de origem.',
+        ['method', 'route'],
+    )
+    GOOGLE_API_PER_REQUEST = Histogram(
+        'google_api_operations_per_request', 'Operações na Google Calendar API (inclusive as de dentro de batches) por requisição HTTP.',
+        ['route'],
+        buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500),
+    )
+
+
+class _RequestScope:
+    """Rota da requisição em andamento e quantas operações no Google ela já disparou."""
+    __slots__ = ('route', 'google_operations', '_lock')
+
+    def __init__(self, route: str):
+        self.route = route
+        self.google_operations = 0
+        self._lock = threading.Lock()
+
+    def add_operations(self, count: int):
+        with self._lock:
+            self.google_operations += count
+
+
+# O contexto é copiado para o threadpool (run_in_threadpool) e para as tasks do asyncio,
+# então as chamadas ao Google feitas pelo handler enxergam a rota que as originou.
+_request_scope: ContextVar[Optional[_RequestScope]] = ContextVar('metrics_request_scope', default=None)
+
+
+def current_route() -> str:
+    scope = _request_scope.get()
+    return scope.route if scope is not None else BACKGROUND_ROUTE
+
+
+def google_method_name(method_id: Optional[str]) -> str:
+    """'calendar.events.list' -> 'events.list'."""
+    if not method_id:
+        return 'unknown'
+    return method_id[len('calendar.'):] if method_id.startswith('calendar.') else method_id
+
+
+def _count_operations(count: int):
+    scope = _request_scope.get()
+    if scope is not None:
+        scope.add_operations(count)
+
+
+class _GoogleCall:
+    __slots__ = ('status', 'request_bytes', 'response_bytes')
+
+    def __init__(self):
+        self.status = 'ok'
+        self.request_bytes: Optional[int] = None
+        self.response_bytes: Optional[int] = None
+
+
+@contextmanager
+def google_call(method: str, operations: int = 1):
+    """
+    Mede uma requisição HTTP ao Google: contador por status (código HTTP, 'ok' ou 'error') e
+    histograma de latência, rotulados pelo método e pela rota que a disparou. Para um batch,
+    'operations' é o número de operações no envelope (todas contam na cota do Google).
+    Quem não recebe o erro como HttpError informa o código em 'call.status'; os tamanhos
+    ('call.request_bytes'/'call.response_bytes') só aparecem no perfil da requisição.
+    """
+    call = _GoogleCall()
+    profile = active_profile()
+    if not METRICS_ENABLED and profile is None:
+        yield call
+        return
+    # Uma thread que ainda não era amostrada entra só durante a chamada (ela volta para o pool depois).
+    thread_id = threading.get_ident()
+    added_thread = profile.add_thread(thread_id) if profile is not None else False
+    started = time.perf_counter()
+    try:
+        yield call
+    except HttpError as e:
+        call.status = getattr(e.resp, 'status', 'error')
+        raise
+    except BaseException:
+        call.status = 'error'
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        if METRICS_ENABLED:
+            route = current_route()
+            GOOGLE_API_CALL_DURATION.labels(method, route).observe(elapsed)
+            GOOGLE_API_CALLS.labels(method, route, str(call.status)).inc()
+            _count_operations(operations)
+        if profile is not None:
+            profile.record_google_call(method, started, elapsed, call.status, call.request_bytes, call.response_bytes)
+            if added_thread:
+                profile.remove_thread(thread_id)
+
+
+def record_batched_requests(method_ids: Iterable[Optional[str]]):
+    """Conta, por método, as operações enviadas dentro de um batch."""
+    if not METRICS_ENABLED:
+        return
+    route = current_route()
+    for method_id in method_ids:
+        GOOGLE_API_BATCHED.labels(google_method_name(method_id), route).inc()
+
+
+# --- Métricas por rota ---
+def _route_template(scope) -> str:
+    """Caminho da rota com os parâmetros ('/actions/update_event/{event_id}'), para limitar a cardinalidade."""
+    app = scope.get('app')
+    router = getattr(app, 'router', None)
+    partial_match = None
+    for route in getattr(router, 'routes', ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, 'path', UNMATCHED_ROUTE)
+        if match == Match.PARTIAL and partial_match is None:
+            partial_match = getattr(route, 'path', None)
+    return partial_match or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mede cada requisição HTTP (até o último pedaço do corpo, inclusive em
+    streaming) e expõe a rota às chamadas ao Google feitas durante ela.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        request_scope = _RequestScope(_route_template(scope))
+        token = _request_scope.set(request_scope)
+        status = 500
+
+        async def _send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            route = request_scope.route
+            HTTP_REQUEST_DURATION.labels(scope['method'], route, str(status)).observe(time.perf_counter() - started)
+            GOOGLE_API_PER_REQUEST.labels(route).observe(request_scope.google_operations)
+            _request_scope.reset(token)
+
+
+# --- Caches ---
+_cache_sources: Dict[str, Callable[[], Dict]] = {}
+
+
+def register_cache(name: str, stats: Callable[[], Dict]):
+    """
+    Registra um cache do processo para os gauges cache_hits/cache_misses/cache_entries.
+    'stats' devolve um dict com 'hits', 'misses' e 'entries' (as chaves ausentes são omitidas).
+    """
+    _cache_sources[name] = stats
+
+
+class _CacheCollector:
+    """Lê os contadores dos caches registrados no momento da coleta."""
+
+    def collect(self):
+        families = {
+            'hits': GaugeMetricFamily('cache_hits', 'Acertos acumulados do cache.', labels=['cache']),
+            'misses': GaugeMetricFamily('cache_misses', 'Faltas acumuladas do cache.', labels=['cache']),
+            'entries': GaugeMetricFamily('cache_entries', 'Entradas atualmente no cache.', labels=['cache']),
+        }
+        for name, stats in list(_cache_sources.items()):
+            try:
+                values = stats()
+            except Exception as e:
+                logger.warning(f"Falha ao coletar as estatísticas do cache '{name}': {e}")
+                continue
+            for key, family in families.items():
+                if values.get(key) is not None:
+                    family.add_metric([name], values[key])
+        yield from families.values()
+
+
+# --- Filas ---
+_queue_sources: Dict[str, Callable[[], Dict]] = {}
+
+
+def register_queue(name: str, stats: Callable[[], Dict]):
+    """Registra uma fila do processo para os gauges queue_depth/queue_lag_seconds/queue_failed."""
+    _queue_sources[name] = stats
+
+
+class _QueueCollector:
+    """Lê a profundidade, o atraso do item mais antigo e as falhas das filas registradas."""
+
+    def collect(self):
+        families = {
+            'depth': GaugeMetricFamily('queue_depth', 'Itens pendentes na fila.', labels=['queue']),
+            'lag_seconds': GaugeMetricFamily('queue_lag_seconds', 'Idade do item pendente mais antigo.', labels=['queue']),
+            'failed': GaugeMetricFamily('queue_failed', 'Itens que esgotaram as tentativas.', labels=['queue']),
+        }
+        for name, stats in list(_queue_sources.items()):
+            try:
+                values = stats()
+            except Exception as e:
+                logger.warning(f"Falha ao coletar as estatísticas da fila '{name}': {e}")
+                continue
+            for key, family in families.items():
+                if values.get(key) is not None:
+                    family.add_metric([name], values[key])
+        yield from families.values()
+
+
+# --- Compressão ---
+_compression_source: Optional[Callable[[], Dict]] = None
+
+
+def register_compression(stats: Callable[[], Dict]):
+    """Registra as estatísticas da compressão de respostas (formato de get_compression_stats)."""
+    global _compression_source
+    _compression_source = stats
+
+
+class _CompressionCollector:
+    """Bytes antes/depois, CPU e taxa da compressão por codificação e faixa de tamanho, e respostas puladas."""
+
+    def collect(self):
+        labels = ['encoding', 'size']
+        families = {
+            'responses': CounterMetricFamily('compression_responses', 'Respostas comprimidas.', labels=labels),
+            'bytes_in': CounterMetricFamily('compression_bytes_in', 'Bytes antes da compressão.', labels=labels),
+            'bytes_out': CounterMetricFamily('compression_bytes_out', 'Bytes depois da compressão.', labels=labels),
+            'cpu_seconds': CounterMetricFamily('compression_cpu_seconds', 'Tempo de CPU gasto comprimindo.', labels=labels),
+            'ratio': GaugeMetricFamily('compression_ratio', 'Bytes antes / bytes depois (acumulado).', labels=labels),
+        }
+        skipped = CounterMetricFamily('compression_skipped', 'Respostas enviadas sem compressão, por motivo.', labels=['reason'])
+        if _compression_source is not None:
+            try:
+                stats = _compression_source()
+            except Exception as e:
+                logger.warning(f"Falha ao coletar as estatísticas da compressão: {e}")
+                stats = {}
+            for encoding, buckets in stats.get('encodings', {}).items():
+                for bucket, entry in buckets.items():
+                    for key, family in families.items():
+                        if entry.get(key) is not None:
+                            family.add_metric([encoding, bucket], entry[key])
+            for reason, count in stats.get('skipped', {}).items():
+                skipped.add_metric([reason], count)
+        yield from families.values()
+        yield skipped
+
+
+def add_metrics(app):
+    """Registra o MetricsMiddleware e o endpoint GET /metrics (formato texto do Prometheus)."""
+    if not METRICS_ENABLED:
+        if prometheus_client is not None:
+            logger.info("Métricas do Prometheus desligadas.")
+        return
+    prometheus_client.REGISTRY.register(_CacheCollector())
+    prometheus_client.REGISTRY.register(_QueueCollector())
+    prometheus_client.REGISTRY.register(_CompressionCollector())
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get('/metrics', tags=["Health"], include_in_schema=False)
+    def api_metrics():
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+    logger.info("Métricas do Prometheus disponíveis em /metrics.")
@@ -183,4 +183,18 @@ class CreateEventResponse(ActionResponse):
     """Resposta customizada para a criação de eventos, incluindo os pulados."""
     created_count: int
     skipped_count: int
-    skipped_events: List[SkippedEventInfo] = []
\ No newline at end of file
+    skipped_events: List[SkippedEventInfo] = []
+
+class CourtAvailability(BaseModel):
+    """Horários ocupados de uma quadra, agrupados por dia (AAAA-MM-DD, no fuso da quadra)."""
+    calendar_id: str
+    timeZone: str
+    days: Dict[str, List[BusyInterval]] = {}
+    error: Optional[str] = None
+
+class AvailabilityMatrixResponse(BaseModel):
+    """Matriz quadra × dia de horários ocupados. 'forbidden' lista as quadras pedidas sem permissão."""
+    start_date: date
+    end_date: date
+    courts: List[CourtAvailability]
+    forbidden: List[str] = []
@@ -0,0 +1,399 @@
+# src/profiling.py
+import asyncio
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_profiling_config = settings.get('profiling', {})
+PROFILING_ENABLED = bool(_profiling_config.get('enabled', True))
+SAMPLE_INTERVAL_SECONDS = _profiling_config.get('sample_interval_ms', 5) / 1000
+# Diretório dos arquivos de pilhas agregadas ("folded", aceitos pelo flamegraph.pl e pelo speedscope).
+OUTPUT_DIR = _profiling_config.get('output_dir', 'profiles')
+# Quantos relatórios recentes ficam disponíveis em /admin/profiles.
+KEEP_PROFILES = _profiling_config.get('keep', 20)
+# Entradas do Server-Timing (além dos totais); o relatório completo fica em /admin/profiles/{id}.
+MAX_SERVER_TIMING_CALLS = 30
+
+PROFILE_HEADER = b'x-profile'
+PROFILE_QUERY_PARAM = '_profile'
+# Ordem importa: a primeira regra que casar com algum quadro da pilha dá a categoria da amostra.
+_CATEGORIES = (
+    ('token', ('google/oauth2', 'google/auth')),
+    ('google_io', ('googleapiclient', 'httplib2', 'httpx', 'httpcore', 'http/client', 'ssl.py', 'socket.py')),
+    ('pydantic', ('pydantic',)),
+    ('serialization', ('json', 'orjson', 'src/serialization.py', 'src/compression.py')),
+)
+_IDLE_MARKERS = ('selectors.py', 'threading.py', 'queue.py')
+_APP_CODE_MARKER = '(src/'  # rótulos de quadros do pacote src (caminhos relativos ao diretório do servidor)
+
+
+_frame_labels: Dict = {}
+
+
+def _frame_label(code) -> str:
+    label = _frame_labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        try:
+            relative = os.path.relpath(filename)
+            filename = relative if not relative.startswith('..') else filename
+        except ValueError:
+            pass
+        label = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+        _frame_labels[code] = label
+    return label
+
+
+def _categorize(stack: Tuple[str, ...]) -> str:
+    # Event loop esperando I/O (ex.: as chamadas do cliente assíncrono) ou thread parada numa fila.
+    if any(marker in stack[-1] for marker in _IDLE_MARKERS):
+        return 'idle'
+    for category, markers in _CATEGORIES:
+        if any(marker in frame for frame in stack for marker in markers):
+            return category
+    return 'app'
+
+
+class Profile:
+    """
+    Perfil de uma única requisição: amostras periódicas das pilhas das threads que executam
+    a requisição (o event loop e as threads do threadpool que ela usou) e a lista das
+    chamadas ao Google, com método, status, duração e bytes.
+    """
+
+    def __init__(self, method: str, path: str, save_folded: bool, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.save_folded = save_folded
+        self.interval = interval
+        self.threads = {threading.get_ident()}
+        self.threads_seen = set(self.threads)
+        self.samples: Counter = Counter()
+        self.google_calls: List[Dict] = []
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, name=f'profiler-{self.id}', daemon=True)
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self.finished = time.perf_counter()
+        self._stop.set()
+        self._sampler.join()
+
+    def add_thread(self, thread_id: int) -> bool:
+        """Passa a amostrar a thread; retorna False se ela já era amostrada (quem a registrou a remove)."""
+        with self._lock:
+            if thread_id in self.threads:
+                return False
+            self.threads.add(thread_id)
+            self.threads_seen.add(thread_id)
+            return True
+
+    def remove_thread(self, thread_id: int):
+        with self._lock:
+            self.threads.discard(thread_id)
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                threads = list(self.threads)
+            frames = sys._current_frames()
+            for thread_id in threads:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    self.samples[tuple(reversed(stack))] += 1
+
+    def record_google_call(self, method: str, started: float, duration: float, status, request_bytes: Optional[int], response_bytes: Optional[int]):
+        with self._lock:
+            self.google_calls.append({
+                'method': method,
+                'status': str(status),
+                'start_ms': round((started - self.started) * 1000, 2),
+                'duration_ms': round(duration * 1000, 2),
+                'request_bytes': request_bytes,
+                'response_bytes': response_bytes,
+                'thread': threading.current_thread().name,
+            })
+
+    # --- Relatório ---
+    def total_ms(self) -> float:
+        return round(((self.finished or time.perf_counter()) - self.started) * 1000, 2)
+
+    def google_wall_ms(self) -> float:
+        """Tempo de relógio com pelo menos uma chamada ao Google em andamento (chamadas paralelas não somam)."""
+        intervals = sorted((call['start_ms'], call['start_ms'] + call['duration_ms']) for call in self.google_calls)
+        total, current_start, current_end = 0.0, None, None
+        for start, end in intervals:
+            if current_end is None or start > current_end:
+                if current_end is not None:
+                    total += current_end - current_start
+                current_start, current_end = start, end
+            else:
+                current_end = max(current_end, end)
+        if current_end is not None:
+            total += current_end - current_start
+        return round(total, 2)
+
+    def report(self, top: int = 25) -> Dict:
+        total_samples = sum(self.samples.values())
+        own, cumulative, categories = Counter(), Counter(), Counter()
+        for stack, count in self.samples.items():
+            category = _categorize(stack)
+            categories[category] += count
+            if category == 'idle':
+                continue
+            own[stack[-1]] += count
+            # No acumulado, só as funções da aplicação (os quadros do uvicorn/starlette estão em toda pilha).
+            for label in set(stack):
+                if _APP_CODE_MARKER in label:
+                    cumulative[label] += count
+
+        def _share(count):
+            return round(count / total_samples, 4) if total_samples else None
+
+        return {
+            'id': self.id,
+            'method': self.method,
+            'path': self.path,
+            'total_ms': self.total_ms(),
+            'sample_interval_ms': self.interval * 1000,
+            'samples': total_samples,
+            'threads': len(self.threads_seen),
+            'google': {
+                'calls': len(self.google_calls),
+                'sum_ms': round(sum(call['duration_ms'] for call in self.google_calls), 2),
+                'wall_ms': self.google_wall_ms(),
+                'by_method': _by_method(self.google_calls),
+            },
+            'google_calls': list(self.google_calls),
+            'categories': {category: _share(count) for category, count in categories.most_common()},
+            'top_cumulative': [{'function': label, 'share': _share(count)} for label, count in cumulative.most_common(top)],
+            'top_self': [{'function': label, 'share': _share(count)} for label, count in own.most_common(top)],
+        }
+
+    def folded(self) -> str:
+        """Pilhas no formato 'quadro;quadro;quadro contagem', uma por linha."""
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in self.samples.most_common())
+
+    def server_timing(self) -> str:
+        """Valor do cabeçalho Server-Timing: totais e as primeiras chamadas ao Google."""
+        entries = [
+            f'total;dur={self.total_ms()}',
+            f'google;dur={self.google_wall_ms()};desc="{len(self.google_calls)} chamadas"',
+        ]
+        for index, call in enumerate(self.google_calls[:MAX_SERVER_TIMING_CALLS]):
+            size = call['response_bytes'] if call['response_bytes'] is not None else '?'
+            entries.append(f'g{index};dur={call["duration_ms"]};desc="{call["method"]} {call["status"]} {size}B"')
+        return ', '.join(entries)
+
+
+def _by_method(calls: List[Dict]) -> Dict[str, Dict]:
+    summary: Dict[str, Dict] = {}
+    for call in calls:
+        entry = summary.setdefault(call['method'], {'calls': 0, 'sum_ms': 0.0, 'response_bytes': 0})
+        entry['calls'] += 1
+        entry['sum_ms'] = round(entry['sum_ms'] + call['duration_ms'], 2)
+        entry['response_bytes'] += call['response_bytes'] or 0
+    return summary
+
+
+_active_profile: ContextVar[Optional[Profile]] = ContextVar('active_profile', default=None)
+_recent_profiles: 'OrderedDict[str, Dict]' = OrderedDict()
+_recent_lock = threading.Lock()
+
+
+def active_profile() -> Optional[Profile]:
+    """O perfil da requisição em andamento, ou None (o caso comum: nada a registrar)."""
+    return _active_profile.get()
+
+
+def get_profile(profile_id: str) -> Optional[Dict]:
+    with _recent_lock:
+        return _recent_profiles.get(profile_id)
+
+
+def list_profiles() -> List[Dict]:
+    """Resumo dos perfis recentes, do mais novo para o mais antigo."""
+    with _recent_lock:
+        reports = list(_recent_profiles.values())
+    summaries = []
+    for report in reversed(reports):
+        summary = {key: report[key] for key in ('id', 'method', 'path', 'status', 'total_ms', 'samples', 'folded_file')}
+        summary['google_calls'] = report['google']['calls']
+        summary['google_wall_ms'] = report['google']['wall_ms']
+        summaries.append(summary)
+    return summaries
+
+
+def _store(report: Dict):
+    with _recent_lock:
+        _recent_profiles[report['id']] = report
+        while len(_recent_profiles) > KEEP_PROFILES:
+            _recent_profiles.popitem(last=False)
+
+
+def _save_folded(profile: Profile) -> Optional[str]:
+    try:
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        path = os.path.join(OUTPUT_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{profile.id}.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(profile.folded())
+        return path
+    except OSError as e:
+        logger.warning(f"Não foi possível gravar o perfil {profile.id}: {e}")
+        return None
+
+
+# --- Ativação ---
+def _profile_flag(scope) -> Optional[str]:
+    """Valor do cabeçalho X-Profile ou do parâmetro '_profile' ('1' ou 'flame'), se presente."""
+    for name, value in scope['headers']:
+        if name == PROFILE_HEADER:
+            return value.decode('latin-1').strip().lower()
+    query_string = scope.get('query_string', b'')
+    if query_string and PROFILE_QUERY_PARAM.encode() in query_string:
+        values = parse_qs(query_string.decode('latin-1')).get(PROFILE_QUERY_PARAM)
+        if values:
+            return values[0].strip().lower()
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI que perfila uma requisição quando ela traz 'X-Profile: 1' (ou '?_profile=1');
+    com 'flame', também grava as pilhas agregadas em OUTPUT_DIR. Só administradores podem pedir
+    o perfil ('is_admin' recebe o cabeçalho Authorization). A resposta é retida até o fim para
+    receber os cabeçalhos Server-Timing e X-Profile-Id; respostas em streaming (mais de um pedaço
+    de corpo) seguem pedaço a pedaço, só com o X-Profile-Id. O relatório completo fica em
+    /admin/profiles. Sem o pedido, a requisição segue direto para a aplicação.
+    """
+
+    def __init__(self, app, is_admin: Callable[[Optional[str]], bool]):
+        self.app = app
+        self.is_admin = is_admin
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        flag = _profile_flag(scope)
+        if not flag or flag in ('0', 'false', 'no'):
+            await self.app(scope, receive, send)
+            return
+
+        authorization = next((value.decode('latin-1') for name, value in scope['headers'] if name == b'authorization'), None)
+        # A verificação do token pode buscar os certificados do Google: fora do event loop.
+        if not await run_in_threadpool(self.is_admin, authorization):
+            body = json.dumps({'detail': 'Perfilamento restrito a administradores.'}).encode('utf-8')
+            await send({'type': 'http.response.start', 'status': 403, 'headers': [
+                (b'content-type', b'application/json'), (b'content-length', str(len(body)).encode('latin-1')),
+            ]})
+            await send({'type': 'http.response.body', 'body': body})
+            return
+
+        profile = Profile(scope['method'], scope['path'], save_folded=flag == 'flame')
+        messages = []
+        status = None
+        streaming = False
+
+        async def _hold(message):
+            nonlocal status, streaming
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            if streaming:
+                await send(message)
+                return
+            messages.append(message)
+            if message['type'] == 'http.response.body' and message.get('more_body', False):
+                # Streaming (ex.: exportação NDJSON): reter o corpo quebraria o envio progressivo.
+                streaming = True
+                for held in messages:
+                    await send(_with_profile_headers(held, profile, server_timing=False))
+                messages.clear()
+
+        token = _active_profile.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, _hold)
+        finally:
+            _active_profile.reset(token)
+            profile.stop()
+            report = profile.report()
+            report['status'] = status
+            report['folded_file'] = _save_folded(profile) if profile.save_folded else None
+            _store(report)
+            logger.info(
+                f"Perfil {profile.id}: {scope['method']} {scope['path']} em {report['total_ms']} ms, "
+                f"{report['google']['calls']} chamadas ao Google ({report['google']['wall_ms']} ms)."
+            )
+
+        for message in messages:
+            await send(_with_profile_headers(message, profile, server_timing=True))
+
+
+def _with_profile_headers(message: dict, profile: Profile, server_timing: bool) -> dict:
+    if message['type'] != 'http.response.start':
+        return message
+    headers = list(message.get('headers', []))
+    if server_timing:
+        headers.append((b'server-timing', profile.server_timing().encode('latin-1')))
+    headers.append((b'x-profile-id', profile.id.encode('latin-1')))
+    return {**message, 'headers': headers}
+
+
+class ProfiledRoute(APIRoute):
+    """
+    APIRoute cujos endpoints síncronos registram a thread do threadpool no perfil ativo,
+    para que o amostrador também enxergue o trabalho feito fora do event loop.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, endpoint, **kwargs)
+        call = self.dependant.call
+        if call is not None and not asyncio.iscoroutinefunction(call):
+            @functools.wraps(call)
+            def _call(*args, **kwargs):
+                profile = _active_profile.get()
+                if profile is None:
+                    return call(*args, **kwargs)
+                # A thread volta para o threadpool ao final e pode atender outras requisições.
+                thread_id = threading.get_ident()
+                profile.add_thread(thread_id)
+                try:
+                    return call(*args, **kwargs)
+                finally:
+                    profile.remove_thread(thread_id)
+            self.dependant.call = _call
+
+
+def add_profiling(app, is_admin: Callable[[Optional[str]], bool]):
+    """Registra o ProfilingMiddleware conforme a seção 'profiling' do config.yaml (ligado por padrão)."""
+    if not PROFILING_ENABLED:
+        logger.info("Perfilamento sob demanda desligado.")
+        return
+    app.add_middleware(ProfilingMiddleware, is_admin=is_admin)
@@ -0,0 +1,170 @@
+# src/reservations.py
+import itertools
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from .config import settings
+from .interval_index import IntervalIndex
+
+logger = logging.getLogger(__name__)
+
+_reservations_config = settings.get('reservations', {})
+RESERVATIONS_ENABLED = bool(_reservations_config.get('enabled', True))
+# Prazo de uma reserva esquecida (thread que morreu no meio da ação): depois disso ela some sozinha.
+CLAIM_TTL_SECONDS = float(_reservations_config.get('ttl_seconds', 60))
+# Com a fila de blocos ativa, os bloqueios das dependentes só chegam ao Google depois da resposta;
+# a reserva deles é mantida por este tempo para cobrir o atraso da fila.
+BLOCK_HOLD_SECONDS = float(_reservations_config.get('block_hold_seconds', 60))
+
+RESERVED_REASON = "Horário sendo reservado por outra solicitação em andamento."
+
+BOOKING = 'booking'
+BLOCK = 'block'
+
+
+class Reservation:
+    """Resultado de ReservationLedger.reserve: índices dos intervalos reservados e dos recusados."""
+    __slots__ = ('_ledger', 'id', 'accepted', 'rejected')
+
+    def __init__(self, ledger: 'ReservationLedger', reservation_id: int, accepted: List[int], rejected: List[int]):
+        self._ledger = ledger
+        self.id = reservation_id
+        self.accepted = accepted
+        self.rejected = rejected
+
+    def hold_blocks(self, indexes: Iterable[int], seconds: float = BLOCK_HOLD_SECONDS):
+        """Mantém por 'seconds' a reserva das dependentes para os intervalos informados (os demais são liberados no release)."""
+        self._ledger.hold_blocks(self.id, set(indexes), seconds)
+
+    def release(self):
+        self._ledger.release(self.id)
+
+
+class ReservationLedger:
+    """
+    Livro de reservas do processo, por quadra e intervalo de tempo.
+
+    Entre a checagem de conflitos (freebusy/espelho) e o insert, cada agendamento mantém uma
+    reserva curta dos seus horários: na quadra principal (como agendamento) e nas quadras
+    dependentes (como bloqueio que será criado). Um novo agendamento é recusado na hora, sem ida
+    ao Google, se o horário já estiver reservado na sua quadra, seja por outro agendamento, seja
+    por um bloqueio a caminho. Bloqueios não conflitam entre si (viram um envelope só), e
+    horários que não se sobrepõem seguem em paralelo, mesmo na mesma quadra. O lock protege
+    apenas a consulta e a marcação em memória, nunca as chamadas ao Google.
+    """
+
+    def __init__(self, ttl_seconds: float = 60.0):
+        self.ttl_seconds = ttl_seconds
+        self._indexes: Dict[Tuple[str, str], IntervalIndex] = {}
+        # id da reserva -> (expira em, [(quadra, tipo, chave)], retida após a ação?)
+        self._claims: Dict[int, Tuple[float, List[Tuple[str, str, tuple]], bool]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def _index(self, calendar_id: str, kind: str) -> IntervalIndex:
+        index = self._indexes.get((calendar_id, kind))
+        if index is None:
+            index = self._indexes[(calendar_id, kind)] = IntervalIndex()
+        return index
+
+    def _drop(self, claims: List[Tuple[str, str, tuple]]):
+        for calendar_id, kind, key in claims:
+            index = self._indexes.get((calendar_id, kind))
+            if index is not None:
+                index.remove_key(key)
+                if not len(index):
+                    del self._indexes[(calendar_id, kind)]
+
+    def _expire(self, now: float):
+        expired = [reservation_id for reservation_id, (expires_at, _, _) in self._claims.items() if expires_at <= now]
+        for reservation_id in expired:
+            _, claims, held = self._claims.pop(reservation_id)
+            self._drop(claims)
+            if not held:
+                # Reserva que não foi liberada pela ação (thread interrompida ou ação mais longa que o prazo).
+                self.stats['expired'] += 1
+
+    def reserve(self, calendar_id: str, intervals: Sequence[Tuple[datetime, datetime]], dependent_ids: Iterable[str] = ()) -> Reservation:
+        """Reserva, de uma vez, todos os intervalos livres da lista; os já reservados por outra ação são recusados."""
+        dependent_ids = list(dependent_ids)
+        now = time.monotonic()
+        reservation_id = next(self._ids)
+        accepted, rejected, claims = [], [], []
+        with self._lock:
+            self._expire(now)
+            taken = [index for index in (self._indexes.get((calendar_id, BOOKING)), self._indexes.get((calendar_id, BLOCK))) if index is not None]
+            for position, (start, end) in enumerate(intervals):
+                if any(index.overlaps(start, end) for index in taken):
+                    rejected.append(position)
+                    continue
+                accepted.append(position)
+                key = (reservation_id, position)
+                self._index(calendar_id, BOOKING).insert(start, end, key)
+                claims.append((calendar_id, BOOKING, key))
+                for dep_cal_id in dependent_ids:
+                    self._index(dep_cal_id, BLOCK).insert(start, end, key)
+                    claims.append((dep_cal_id, BLOCK, key))
+            if claims:
+                self._claims[reservation_id] = (now + self.ttl_seconds, claims, False)
+            self.stats['reserved'] += len(accepted)
+            self.stats['rejected'] += len(rejected)
+        if rejected:
+            logger.info("Reservas: %d horário(s) em %s recusados por sobreposição com outra solicitação.", len(rejected), calendar_id)
+        return Reservation(self, reservation_id, accepted, rejected)
+
+    def hold_blocks(self, reservation_id: int, positions: set, seconds: float):
+        with self._lock:
+            entry = self._claims.get(reservation_id)
+            if entry is None:
+                return
+            held = [claim for claim in entry[1] if claim[1] == BLOCK and claim[2][1] in positions]
+            if held:
+                self._claims[reservation_id] = (entry[0], [claim for claim in entry[1] if claim not in held], False)
+                self._claims[next(self._ids)] = (time.monotonic() + seconds, held, True)
+
+    def release(self, reservation_id: int):
+        with self._lock:
+            entry = self._claims.pop(reservation_id, None)
+            if entry is not None:
+                self._drop(entry[1])
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                'active_reservations': len(self._claims),
+                'claimed_intervals': {f"{calendar_id}:{kind}": len(index) for (calendar_id, kind), index in self._indexes.items()},
+                **self.stats,
+            }
+
+
+_ledger = ReservationLedger(ttl_seconds=CLAIM_TTL_SECONDS)
+
+
+@contextmanager
+def reserve_slots(calendar_id: str, slots: Sequence[Dict[str, datetime]], dependent_ids: Iterable[str] = ()):
+    """
+    Reserva os horários ('start'/'end') na quadra e nas dependentes durante o bloco. Os índices
+    recusados ficam em 'reservation.rejected'. Com 'reservations.enabled' desligado, aceita tudo.
+    """
+    if not RESERVATIONS_ENABLED:
+        yield Reservation(_ledger, 0, list(range(len(slots))), [])
+        return
+    reservation = _ledger.reserve(calendar_id, [(slot['start'], slot['end']) for slot in slots], dependent_ids)
+    try:
+        yield reservation
+    finally:
+        reservation.release()
+
+
+def get_reservation_stats() -> dict:
+    """Reservas ativas, intervalos reservados por quadra e contadores de aceitas/recusadas/expiradas."""
+    if not RESERVATIONS_ENABLED:
+        return {'enabled': False}
+    return {'enabled': True, **_ledger.get_stats()}
@@ -0,0 +1,105 @@
+# src/serialization.py
+import json
+import logging
+import typing
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Type
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    logger.info("orjson não instalado: as respostas rápidas usam o módulo json da biblioteca padrão.")
+
+_serialization_config = settings.get('serialization', {})
+# Confia no formato dos payloads do Google: as respostas são montadas por projeção dos dicts
+# (sem instanciar os modelos Pydantic) e serializadas direto, sem a validação do response_model.
+TRUSTED_UPSTREAM = bool(_serialization_config.get('trusted_upstream', False))
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode='json', by_alias=True)
+    raise TypeError(f"Tipo não serializável em JSON: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """JSON compacto em UTF-8 (orjson quando disponível)."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse que serializa com dumps(); o conteúdo já deve estar no formato final."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# --- Projeção de payloads confiáveis no formato dos modelos ---
+def _identity(value):
+    return value
+
+
+def _value_projector(annotation) -> Callable[[Any], Any]:
+    """Função que leva um valor bruto ao formato do tipo anotado (modelos, listas e dicts de modelos)."""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is typing.Union:
+        options = [arg for arg in args if arg is not type(None)]
+        return _value_projector(options[0]) if len(options) == 1 else _identity
+    if origin is list:
+        inner = _value_projector(args[0]) if args else _identity
+        if inner is _identity:
+            return _identity
+        return lambda value: [inner(item) for item in value] if value is not None else None
+    if origin is dict:
+        inner = _value_projector(args[1]) if len(args) == 2 else _identity
+        if inner is _identity:
+            return _identity
+        return lambda value: {key: inner(item) for key, item in value.items()} if value is not None else None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        model_projector = projector(annotation)
+        return lambda value: model_projector(value) if value is not None else None
+    return _identity
+
+
+@lru_cache(maxsize=None)
+def projector(model_cls: Type[BaseModel]) -> Callable[[Any], Dict]:
+    """
+    Compila, para o modelo, uma função que recorta um dict bruto (chaves com alias, como o Google
+    envia) para exatamente os campos do modelo, na mesma forma do model_dump(by_alias=True):
+    campos ausentes recebem o valor padrão (ou None). Os valores não são validados nem convertidos,
+    então datas seguem como as strings recebidas do Google.
+    """
+    fields = []
+    for name, field in model_cls.model_fields.items():
+        key = field.alias or name
+        default = None if field.is_required() else field.get_default(call_default_factory=True)
+        fields.append((key, default, _value_projector(field.annotation)))
+
+    def _project(data):
+        if isinstance(data, BaseModel):
+            return data.model_dump(mode='json', by_alias=True)
+        result = {}
+        for key, default, convert in fields:
+            value = data.get(key, default)
+            result[key] = convert(value) if value is not None else value
+        return result
+
+    return _project
+
+
+def project(model_cls: Type[BaseModel], data: Dict) -> Dict:
+    return projector(model_cls)(data)
@@ -1,26 +1,50 @@
 import logging
 from typing import Optional, Dict, List
 from datetime import datetime, timezone, time, timedelta
+import asyncio
+import json
+from functools import partial
 import pytz 
 
-from fastapi import FastAPI, Depends, HTTPException, Header
-from google.oauth2 import id_token
-from google.auth.transport import requests
-from googleapiclient.discovery import build
+from fastapi import FastAPI, Depends, HTTPException, Header, Query, Response
 from googleapiclient.errors import HttpError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from google.auth.transport.requests import Request as GoogleAuthRequest
 
 # Ajustes nos imports
-from src.auth import get_service_account_credentials
+from src.auth import get_service_account_credentials, get_credentials_cache_stats
 from src.models import (
-    CalendarListResponse, EventCreateRequest, EventUpdateRequest, ActionResponse,
-    FindEventsApiResponse, CalendarListEntry, AvailabilityResponse, CreateEventResponse
+    CalendarListResponse, EventCreateRequest, EventUpdateRequest, ActionResponse, GoogleCalendarEvent,
+    FindEventsApiResponse, CalendarListEntry, AvailabilityResponse, CreateEventResponse,
+    AvailabilityMatrixResponse, CourtAvailability
 )
 # Em src/server.py, nas importações de calendar_actions
 from src.calendar_actions import (
-    create_event, find_events, update_event, delete_event, get_availability, delete_recurring_event # <- Adicione
+    create_event, find_events, update_event, delete_event, get_availability, delete_recurring_event, # <- Adicione
+    get_availability_matrix, get_read_version, iter_event_pages, apply_queued_block_changes, get_batch_stats,
+    get_calendar_name_stats, prime_calendar_name
+)
+from src.config import settings, get_config, start_config_watcher
+from src.service_pool import build_calendar_service, get_calendar_service, get_service_pool_stats, warm_discovery_document
+from src.token_verifier import IdTokenVerifier, GOOGLE_CERTS_URL
+from src.calendar_mirror import get_mirror, MIRROR_PAGE_PREFIX
+from src.block_queue import get_block_queue, get_block_queue_stats
+from src.court_versions import make_etag, etag_matches
+from src.serialization import FastJSONResponse, dumps, project, TRUSTED_UPSTREAM
+from src.compression import add_compression, get_compression_stats
+from src.log_pipeline import get_logging_stats
+from src.upstream import get_upstream_stats
+from src.reservations import get_reservation_stats
+from src.metrics import add_metrics, register_cache, register_compression, register_queue
+from src.profiling import ProfiledRoute, add_profiling, get_profile, list_profiles
+from src.warmup import Warmup
+from src.court_access import get_accessible_court_names, invalidate_court_access, get_court_access_stats
+from src.async_calendar_client import ASYNC_CLIENT_ENABLED, AsyncCalendarClient, close_async_http_client
+from src.async_calendar_actions import (
+    create_event_async, delete_event_async, get_availability_async, get_availability_matrix_async
 )
-from src.config import settings
 
 _calendar_timezone_cache = {}
 def get_calendar_timezone(service, calendar_id: str) -> str:
@@ -35,30 +59,169 @@ def get_calendar_timezone(service, calendar_id: str) -> str:
     except HttpError:
         # Retorna UTC como padrão em caso de erro, para evitar que a aplicação quebre
         return 'UTC'
+
+async def get_calendar_timezone_async(credentials, calendar_id: str) -> str:
+    """Como get_calendar_timezone, sem bloquear o event loop (cliente assíncrono ou threadpool)."""
+    if calendar_id in _calendar_timezone_cache:
+        return _calendar_timezone_cache[calendar_id]
+    if not ASYNC_CLIENT_ENABLED:
+        return await run_in_threadpool(lambda: get_calendar_timezone(get_calendar_service(credentials), calendar_id))
+    try:
+        calendar = await AsyncCalendarClient(credentials).calendars_get(calendar_id)
+        tz = calendar.get('timeZone', 'UTC')
+        _calendar_timezone_cache[calendar_id] = tz
+        return tz
+    except HttpError:
+        return 'UTC'
     
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__) 
 app = FastAPI(title="Google Calendar API", version="1.0.0")
+app.router.route_class = ProfiledRoute
 origins = ["http://localhost:5500", "http://127.0.0.1:5500"]
 app.add_middleware(CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+add_compression(app)
+add_metrics(app)
+
+# Verificador local de tokens de ID: certificados e tokens já verificados ficam em cache.
+# 'id_token_certs_url' permite apontar para um substituto local dos certificados do Google.
+token_verifier = IdTokenVerifier(
+    audience=settings.get('gcp_client_id'),
+    certs_url=settings.get('id_token_certs_url', GOOGLE_CERTS_URL),
+)
+
+def _credentials_cache_metrics() -> dict:
+    stats = get_credentials_cache_stats()
+    return {'hits': stats['hits'], 'misses': stats['misses'], 'entries': stats['size']}
+
+# Caches do processo expostos em /metrics (cache_hits, cache_misses, cache_entries).
+register_cache('id_tokens', lambda: {'hits': token_verifier.stats['token_hits'], 'misses': token_verifier.stats['token_misses']})
+register_cache('credentials', _credentials_cache_metrics)
+register_cache('court_access', get_court_access_stats)
+register_cache('service_pool', get_service_pool_stats)
+register_cache('calendar_names', get_calendar_name_stats)
+register_cache('calendar_timezones', lambda: {'entries': len(_calendar_timezone_cache)})
+if get_block_queue() is not None:
+    register_queue('block_maintenance', get_block_queue().get_stats)
+# Taxa e CPU da compressão das respostas (compression_*).
+register_compression(get_compression_stats)
+
+def _is_admin_token(authorization: Optional[str]) -> bool:
+    """Se o cabeçalho Authorization traz o token de ID de um administrador (usado pelo perfilamento)."""
+    if not authorization or not authorization.startswith("Bearer "):
+        return False
+    try:
+        idinfo = token_verifier.verify(authorization.split("Bearer ")[1])
+    except ValueError:
+        return False
+    return get_config().is_admin(idinfo.get('email'))
+
+add_profiling(app, is_admin=_is_admin_token)
 
 async def get_current_user(authorization: str = Header(None)) -> Dict:
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Esquema de autorização inválido.")
     token = authorization.split("Bearer ")[1]
     try:
-        gcp_client_id = settings.get('gcp_client_id')
-        admin_users_list = settings.get('permissions', {}).get('admin_users', [])
-        idinfo = id_token.verify_oauth2_token(token, requests.Request(), gcp_client_id)
+        idinfo = token_verifier.cached_claims(token)
+        if idinfo is None:
+            # Verificação RSA e, eventualmente, busca dos certificados: fora do event loop.
+            idinfo = await run_in_threadpool(token_verifier.verify, token)
         user_email = idinfo.get('email')
-        idinfo['isAdmin'] = user_email in admin_users_list
-        logging.info(f"Requisição recebida do usuário: {user_email} (Admin: {idinfo['isAdmin']})")
+        idinfo['isAdmin'] = get_config().is_admin(user_email)
+        logger.info("Requisição recebida do usuário: %s (Admin: %s)", user_email, idinfo['isAdmin'])
         return idinfo
     except ValueError as e:
         raise HTTPException(status_code=401, detail=f"Token de ID inválido: {e}")
 def get_backend_credentials():
     return get_service_account_credentials()
 
+@app.on_event("startup")
+def start_config_reload():
+    """Recarrega o config.yaml sem reiniciar quando o arquivo muda ('config_reload_interval_seconds', 0 desliga)."""
+    interval = settings.get('config_reload_interval_seconds', 5)
+    if interval:
+        start_config_watcher(interval)
+
+@app.on_event("startup")
+def start_calendar_mirror_sync():
+    """Se configurado, mantém o espelho local das quadras atualizado em segundo plano."""
+    mirror = get_mirror()
+    interval = settings.get('calendar_mirror', {}).get('sync_interval_seconds', 0)
+    if mirror is not None and interval:
+        mirror.start_background_sync(lambda: get_calendar_service(get_backend_credentials()), interval)
+
+@app.on_event("startup")
+def start_block_queue_workers():
+    """Com 'block_queue.enabled', inicia os trabalhadores que aplicam a manutenção de blocos enfileirada."""
+    block_queue = get_block_queue()
+    if block_queue is not None:
+        block_queue.start(lambda: get_calendar_service(get_backend_credentials()), partial(apply_queued_block_changes, settings=settings))
+
+@app.on_event("shutdown")
+def stop_block_queue_workers():
+    block_queue = get_block_queue()
+    if block_queue is not None:
+        block_queue.stop()
+
+@app.on_event("shutdown")
+async def close_async_client():
+    await close_async_http_client()
+
+# --- Aquecimento e prontidão ---
+_warmup_config = settings.get('warmup', {})
+warmup = Warmup(max_workers=_warmup_config.get('max_workers', 8))
+
+def _warm_credentials():
+    credentials = get_backend_credentials()
+    if not credentials.valid:
+        credentials.refresh(GoogleAuthRequest())
+
+# As etapas rodam em threads do aquecimento, que terminam com ele: o pool de serviços é por
+# thread, então elas usam um serviço avulso e aquecem só o que é compartilhado (caches e espelho).
+def _warm_court(calendar_id: str):
+    """Uma única leitura do calendário preenche os caches de fuso horário e de nome."""
+    service = build_calendar_service(get_backend_credentials())
+    calendar = service.calendars().get(calendarId=calendar_id).execute()
+    _calendar_timezone_cache[calendar_id] = calendar.get('timeZone', 'UTC')
+    prime_calendar_name(calendar_id, calendar.get('summary', calendar_id))
+
+def _warm_mirror(calendar_id: str):
+    get_mirror().ensure_fresh(build_calendar_service(get_backend_credentials()), calendar_id)
+
+@app.on_event("startup")
+def start_warmup():
+    """
+    Se 'warmup.enabled' estiver ligado, aquece o processo em segundo plano: documento de descoberta,
+    token da conta de serviço e certificados de ID token; depois, em paralelo, fuso horário e nome
+    de cada quadra (e a primeira sincronização do espelho, se ativo). /ready responde 503 até o fim.
+    """
+    if not _warmup_config.get('enabled'):
+        warmup.skip()
+        return
+    courts = get_config().court_ids
+    phases = [
+        [
+            ('discovery_document', warm_discovery_document, True),
+            ('service_account_token', _warm_credentials, True),
+            ('id_token_certs', token_verifier.get_certs, False),
+        ],
+        [(f"court:{name}", partial(_warm_court, calendar_id), False) for name, calendar_id in courts.items()],
+    ]
+    mirror = get_mirror()
+    if mirror is not None:
+        phases[1].extend(
+            (f"mirror:{name}", partial(_warm_mirror, calendar_id), False)
+            for name, calendar_id in courts.items() if mirror.is_tracked(calendar_id)
+        )
+    warmup.start(phases)
+
+@app.get("/ready", tags=["Health"])
+def api_ready():
+    """Prontidão para o balanceador: 200 depois do aquecimento, 503 antes (com a duração de cada etapa)."""
+    report = warmup.report()
+    return JSONResponse(status_code=200 if report['ready'] else 503, content=report)
+
 @app.get("/actions/list_calendars", response_model=CalendarListResponse, tags=["Calendars"])
 def api_list_calendars(user_info: dict = Depends(get_current_user)):
     """
@@ -66,13 +229,13 @@ def api_list_calendars(user_info: dict = Depends(get_current_user)):
     Se não for admin, retorna apenas os nomes simples das quadras às quais o usuário tem acesso.
     """
     # Pega o mapa completo de quadras do arquivo de configuração
-    all_quadras_map = settings.get('quadras', {}) # Ex: {'Voleibol A': 'c_123@google.com'}
+    all_quadras_map = get_config().court_ids # Ex: {'Voleibol A': 'c_123@google.com'}
 
     # --- INÍCIO DA NOVA LÓGICA DE PERMISSÃO ---
 
     # 1. VERIFICA SE O USUÁRIO É ADMIN
     if user_info.get('isAdmin'):
-        logger.info(f"Admin '{user_info.get('email')}' acessando. Retornando todos os nomes de quadras.")
+        logger.info("Admin '%s' acessando. Retornando todos os nomes de quadras.", user_info.get('email'))
         accessible_calendars = []
         # Para admins, retorna a lista completa de "apelidos"
         for simple_name in sorted(all_quadras_map.keys()):
@@ -81,48 +244,23 @@ def api_list_calendars(user_info: dict = Depends(get_current_user)):
     
     # 2. SE NÃO FOR ADMIN, BUSCA E TRADUZ AS PERMISSÕES
     else:
-        logger.info(f"Usuário comum '{user_info.get('email')}' acessando. Verificando permissões de calendário...")
-        try:
-            # Pega credenciais personificando o usuário logado
-            user_credentials = get_service_account_credentials(user_info['email'])
-            service = build('calendar', 'v3', credentials=user_credentials)
-
-            # Busca a lista de calendários do usuário na API do Google
-            user_calendar_list = service.calendarList().list().execute()
-            user_calendars_from_google = user_calendar_list.get('items', [])
-
-            # Pega apenas os IDs reais dos calendários aos quais o usuário tem acesso
-            user_accessible_ids = {cal.get('id') for cal in user_calendars_from_google}
-            
-            # Cria um mapa reverso para encontrar o nome simples a partir do ID real
-            id_to_name_map = {v: k for k, v in all_quadras_map.items()}
-            
-            accessible_simple_names = []
-            # Itera sobre os IDs que o usuário tem acesso
-            for calendar_id in user_accessible_ids:
-                # Se o ID real estiver no nosso mapa reverso...
-                if calendar_id in id_to_name_map:
-                    # ...adiciona o "apelido" correspondente à lista final
-                    accessible_simple_names.append(id_to_name_map[calendar_id])
-
-            # Monta a resposta final para o frontend usando os "apelidos" filtrados
-            final_calendar_list = [
-                CalendarListEntry(id=name, summary=name, timeZone='America/Sao_Paulo', accessRole='writer')
-                for name in sorted(accessible_simple_names)
-            ]
-            
-            logger.info(f"Usuário tem acesso a {len(final_calendar_list)} quadras. Retornando lista de nomes filtrada.")
-            return CalendarListResponse(items=final_calendar_list)
-
-        except Exception as e:
-            logger.error(f"Erro ao buscar calendários para o usuário {user_info.get('email')}: {e}")
-            raise HTTPException(status_code=500, detail="Não foi possível verificar as permissões de calendário do usuário.")
-        
+        logger.info("Usuário comum '%s' acessando. Verificando permissões de calendário...", user_info.get('email'))
+        accessible_simple_names = get_accessible_court_names(user_info)
+
+        # Monta a resposta final para o frontend usando os "apelidos" filtrados
+        final_calendar_list = [
+            CalendarListEntry(id=name, summary=name, timeZone='America/Sao_Paulo', accessRole='writer')
+            for name in sorted(accessible_simple_names)
+        ]
+
+        logger.info("Usuário tem acesso a %d quadras. Retornando lista de nomes filtrada.", len(final_calendar_list))
+        return CalendarListResponse(items=final_calendar_list)
+
 def check_permission_and_get_event(event_id: str, calendar_id: str, user_info: dict, credentials):
     if user_info.get('isAdmin'):
         return
     try:
-        service = build('calendar', 'v3', credentials=credentials)
+        service = get_calendar_service(credentials)
         event = service.events().get(calendarId=calendar_id, eventId=event_id).execute()
         requester_email = event.get('extendedProperties', {}).get('private', {}).get('requesterEmail')
         if requester_email and requester_email == user_info.get('email'):
@@ -134,28 +272,72 @@ def check_permission_and_get_event(event_id: str, calendar_id: str, user_info: d
         raise HTTPException(status_code=500, detail="Erro ao verificar permissão do evento.")
     raise HTTPException(status_code=403, detail="Permissão negada.")
 
+async def check_permission_and_get_event_async(event_id: str, calendar_id: str, user_info: dict, credentials):
+    """Versão assíncrona de check_permission_and_get_event (cliente assíncrono ou threadpool)."""
+    if user_info.get('isAdmin'):
+        return
+    if not ASYNC_CLIENT_ENABLED:
+        return await run_in_threadpool(check_permission_and_get_event, event_id, calendar_id, user_info, credentials)
+    try:
+        event = await AsyncCalendarClient(credentials).events_get(calendar_id, event_id)
+        requester_email = event.get('extendedProperties', {}).get('private', {}).get('requesterEmail')
+        if requester_email and requester_email == user_info.get('email'):
+            return
+    except HttpError as e:
+        if e.resp.status == 404:
+            raise HTTPException(status_code=404, detail="Evento não encontrado.")
+        logging.error(f"Erro de API ao verificar permissão do evento: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao verificar permissão do evento.")
+    raise HTTPException(status_code=403, detail="Permissão negada.")
+
+# Leituras com ETag: o navegador guarda a resposta, mas revalida sempre (If-None-Match) e recebe
+# 304 quando nada mudou. 'private' porque as respostas dependem do usuário.
+CONDITIONAL_CACHE_CONTROL = 'private, no-cache'
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': CONDITIONAL_CACHE_CONTROL})
+
+def _etag_headers(etag: str) -> Dict[str, str]:
+    return {'ETag': etag, 'Cache-Control': CONDITIONAL_CACHE_CONTROL}
+
+def _events_fingerprint(events_response):
+    """
+    (id, updated) de cada evento e o próximo page token; aceita o modelo ou o dict do modo trusted_upstream.
+    Eventos sem 'updated' entram com None (o ETag ainda muda se o evento aparecer ou sumir).
+    """
+    if events_response is None:
+        return None
+    if isinstance(events_response, dict):
+        return [(event.get('id'), event.get('updated')) for event in events_response.get('items', [])], events_response.get('nextPageToken')
+    return [
+        (event.id, event.updated.isoformat() if getattr(event, 'updated', None) else None)
+        for event in events_response.items
+    ], events_response.nextPageToken
+
 # Em src/server.py, SUBSTITUA a função api_find_events inteira por esta:
 
 @app.get("/actions/find_events", response_model=FindEventsApiResponse, tags=["Events"])
 def api_find_events(
     calendar_id: str, 
+    response: Response,
     user_info: dict = Depends(get_current_user), 
     page_token: Optional[str] = None, 
     time_min_str: Optional[str] = None, 
-    time_max_str: Optional[str] = None
+    time_max_str: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
 ):
     backend_credentials = get_backend_credentials()
-    real_calendar_id = settings.get('quadras', {}).get(calendar_id)
+    real_calendar_id = get_config().court_ids.get(calendar_id)
     if not real_calendar_id:
         raise HTTPException(status_code=400, detail=f"Nome de quadra inválido: {calendar_id}")
 
     # --- LÓGICA DE DATA/HORA SIMPLIFICADA E CORRIGIDA ---
     final_time_min, final_time_max = None, None
+    service = get_calendar_service(backend_credentials)
     
     # Se uma data de início for fornecida, converte para o fuso horário correto
     if time_min_str:
         try:
-            service = build('calendar', 'v3', credentials=backend_credentials)
             calendar_tz = pytz.timezone(get_calendar_timezone(service, real_calendar_id))
             dt_min_naive = datetime.strptime(time_min_str, '%Y-%m-%d')
             dt_min_aware = calendar_tz.localize(dt_min_naive)
@@ -169,7 +351,6 @@ def api_find_events(
     # Se uma data de fim for fornecida, converte para o fuso horário correto
     if time_max_str:
         try:
-            service = build('calendar', 'v3', credentials=backend_credentials)
             calendar_tz = pytz.timezone(get_calendar_timezone(service, real_calendar_id))
             dt_max_naive = datetime.strptime(time_max_str, '%Y-%m-%d')
             # Pega o dia inteiro, até as 23:59:59
@@ -181,6 +362,16 @@ def api_find_events(
     
     # --- FIM DA LÓGICA CORRIGIDA ---
 
+    # Com o espelho, a versão da quadra identifica o conteúdo: o 304 sai sem ler os eventos.
+    etag_params = ('find_events', real_calendar_id, final_time_min, final_time_max, page_token, user_info['email'], user_info['isAdmin'])
+    version = None
+    if not page_token or page_token.startswith(MIRROR_PAGE_PREFIX):
+        version = get_read_version(backend_credentials, real_calendar_id)
+    if version is not None:
+        etag = make_etag(*etag_params, version)
+        if etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+
     events_response = find_events(
         credentials=backend_credentials,
         calendar_id=real_calendar_id,
@@ -188,32 +379,49 @@ def api_find_events(
         time_max=final_time_max,
         page_token=page_token
     )
+
+    if version is None:
+        # Sem versão confiável (quadra fora do espelho ou página do Google), a impressão digital vem do
+        # 'updated' de cada evento: o 304 poupa o corpo da resposta, mas não a consulta ao Google.
+        etag = make_etag(*etag_params, _events_fingerprint(events_response))
+        if etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+
+    if isinstance(events_response, dict):
+        # Modo trusted_upstream: o payload já está no formato da resposta; vai direto para o encoder.
+        return FastJSONResponse(
+            {'user_email': user_info['email'], 'isAdmin': user_info['isAdmin'], 'events': events_response},
+            headers=_etag_headers(etag)
+        )
+    response.headers.update(_etag_headers(etag))
     
     return FindEventsApiResponse(user_email=user_info['email'], isAdmin=user_info['isAdmin'], events=events_response)
 
 @app.post("/actions/create_event", response_model=CreateEventResponse, tags=["Events"])
-def api_create_event(body: dict, user_info: dict = Depends(get_current_user)):
+async def api_create_event(body: dict, user_info: dict = Depends(get_current_user)):
     credentials = get_backend_credentials()
     event_data = EventCreateRequest(**body.get('event_data', {}))
     # ALTERADO: Traduz nome simples para ID real
     simple_calendar_name = body.get('calendar_id')
-    real_calendar_id = settings.get('quadras', {}).get(simple_calendar_name)
+    real_calendar_id = get_config().court_ids.get(simple_calendar_name)
     if not real_calendar_id:
         raise HTTPException(status_code=400, detail=f"Nome de quadra inválido: {simple_calendar_name}")
     
     # ALTERADO: Passa o objeto 'settings' para a função de ação
-    return create_event(credentials, event_data, real_calendar_id, user_info, settings)
+    if ASYNC_CLIENT_ENABLED:
+        return await create_event_async(credentials, event_data, real_calendar_id, user_info, settings)
+    return await run_in_threadpool(create_event, credentials, event_data, real_calendar_id, user_info, settings)
 
 @app.patch("/actions/update_event/{event_id}", response_model=ActionResponse, tags=["Events"])
 def api_update_event(event_id: str, calendar_id: str, update_data: EventUpdateRequest, user_info: dict = Depends(get_current_user)):
     backend_credentials = get_backend_credentials()
-    real_calendar_id = settings.get('quadras', {}).get(calendar_id)
+    real_calendar_id = get_config().court_ids.get(calendar_id)
     if not real_calendar_id:
         raise HTTPException(status_code=400, detail=f"Nome de quadra inválido: {calendar_id}")
 
     check_permission_and_get_event(event_id, real_calendar_id, user_info, backend_credentials)
 
-    return update_event(
+    result = update_event(
         credentials=backend_credentials, 
         event_id=event_id, 
         update_data=update_data, 
@@ -221,27 +429,32 @@ def api_update_event(event_id: str, calendar_id: str, update_data: EventUpdateRe
         user_info=user_info,
         settings=settings
     )
+    return FastJSONResponse(result) if isinstance(result, dict) else result
 
 @app.delete("/actions/delete_event/{event_id}", response_model=ActionResponse, tags=["Events"])
-def api_delete_event(event_id: str, calendar_id: str, user_info: dict = Depends(get_current_user)):
+async def api_delete_event(event_id: str, calendar_id: str, user_info: dict = Depends(get_current_user)):
     backend_credentials = get_backend_credentials()
     # ALTERADO: Traduz nome simples para ID real
-    real_calendar_id = settings.get('quadras', {}).get(calendar_id)
+    real_calendar_id = get_config().court_ids.get(calendar_id)
     if not real_calendar_id:
         raise HTTPException(status_code=400, detail=f"Nome de quadra inválido: {calendar_id}")
         
-    check_permission_and_get_event(event_id, real_calendar_id, user_info, backend_credentials)
+    await check_permission_and_get_event_async(event_id, real_calendar_id, user_info, backend_credentials)
     
     # ALTERADO: Passa o objeto 'settings' para a função de ação
-    return delete_event(backend_credentials, event_id, real_calendar_id, settings)
+    if ASYNC_CLIENT_ENABLED:
+        return await delete_event_async(backend_credentials, event_id, real_calendar_id, settings)
+    return await run_in_threadpool(delete_event, backend_credentials, event_id, real_calendar_id, settings)
 
 # Em src/server.py, adicione este novo endpoint ao final do arquivo
 
 @app.get("/actions/find_availability", response_model=AvailabilityResponse, tags=["Availability"])
-def api_find_availability(
+async def api_find_availability(
     calendar_id: str, 
     date_str: str, 
-    user_info: dict = Depends(get_current_user)
+    response: Response,
+    user_info: dict = Depends(get_current_user),
+    if_none_match: Optional[str] = Header(None)
 ):
     """
     Encontra e retorna todos os intervalos de tempo OCUPADOS para uma quadra em um dia específico.
@@ -249,14 +462,13 @@ def api_find_availability(
     backend_credentials = get_backend_credentials()
 
     # 1. Traduz o nome simples da quadra para seu ID real
-    real_calendar_id = settings.get('quadras', {}).get(calendar_id)
+    real_calendar_id = get_config().court_ids.get(calendar_id)
     if not real_calendar_id:
         raise HTTPException(status_code=404, detail=f"Nome de quadra inválido: {calendar_id}")
 
     # 2. Cria a janela de tempo (o dia inteiro) com o fuso horário correto
-    service = build('calendar', 'v3', credentials=backend_credentials)
     try:
-        calendar_tz = pytz.timezone(get_calendar_timezone(service, real_calendar_id))
+        calendar_tz = pytz.timezone(await get_calendar_timezone_async(backend_credentials, real_calendar_id))
         target_day = datetime.strptime(date_str, '%Y-%m-%d').date()
 
         # Define o início (00:00) e o fim (23:59:59) do dia, no fuso horário da agenda
@@ -268,22 +480,107 @@ def api_find_availability(
     except ValueError:
         raise HTTPException(status_code=400, detail="Formato de data inválido. Use AAAA-MM-DD.")
 
-    # 3. Chama a função de lógica para buscar os horários
-    busy_slots = get_availability(
-        credentials=backend_credentials,
-        calendar_id=real_calendar_id,
-        time_min=time_min,
-        time_max=time_max
-    )
+    # 3. Responde 304 se a versão da quadra (espelho) não mudou desde o ETag do cliente
+    etag_params = ('find_availability', real_calendar_id, time_min.isoformat(), time_max.isoformat())
+    version = await run_in_threadpool(get_read_version, backend_credentials, real_calendar_id)
+    if version is not None:
+        etag = make_etag(*etag_params, version)
+        if etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+
+    # 4. Chama a função de lógica para buscar os horários
+    if ASYNC_CLIENT_ENABLED:
+        busy_slots = await get_availability_async(backend_credentials, real_calendar_id, time_min, time_max)
+    else:
+        busy_slots = await run_in_threadpool(get_availability, backend_credentials, real_calendar_id, time_min, time_max)
+
+    if version is None:
+        etag = make_etag(*etag_params, [(slot['start'].isoformat(), slot['end'].isoformat()) for slot in busy_slots])
+        if etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+    response.headers.update(_etag_headers(etag))
 
     return AvailabilityResponse(busy=busy_slots)
 
+# Limite de dias da matriz de disponibilidade (a semana ou o mês visível no frontend).
+MAX_AVAILABILITY_MATRIX_DAYS = 42
+
+@app.get("/actions/find_availability_matrix", response_model=AvailabilityMatrixResponse, tags=["Availability"])
+async def api_find_availability_matrix(
+    start_date: str,
+    end_date: str,
+    calendar_ids: List[str] = Query(..., description="Nomes das quadras (parâmetro repetido ou separado por vírgulas)."),
+    user_info: dict = Depends(get_current_user)
+):
+    """
+    Retorna os intervalos OCUPADOS de várias quadras em vários dias (matriz quadra × dia),
+    com uma única consulta freebusy ao Google. Quadras sem permissão voltam em 'forbidden'.
+    """
+    try:
+        first_day = datetime.strptime(start_date, '%Y-%m-%d').date()
+        last_day = datetime.strptime(end_date, '%Y-%m-%d').date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de data inválido. Use AAAA-MM-DD.")
+    day_count = (last_day - first_day).days + 1
+    if day_count < 1:
+        raise HTTPException(status_code=400, detail="A data de fim deve ser igual ou posterior à data de início.")
+    if day_count > MAX_AVAILABILITY_MATRIX_DAYS:
+        raise HTTPException(status_code=400, detail=f"O período máximo é de {MAX_AVAILABILITY_MATRIX_DAYS} dias.")
+
+    # 1. Traduz os nomes simples para IDs reais, mantendo a ordem pedida e sem repetições
+    all_quadras_map = get_config().court_ids
+    requested_names = list(dict.fromkeys(name.strip() for value in calendar_ids for name in value.split(',') if name.strip()))
+    invalid_names = [name for name in requested_names if name not in all_quadras_map]
+    if not requested_names or invalid_names:
+        raise HTTPException(status_code=400, detail=f"Nome de quadra inválido: {', '.join(invalid_names) or '(nenhum)'}")
+
+    # 2. Filtra pelas permissões do usuário
+    accessible_names = await run_in_threadpool(get_accessible_court_names, user_info)
+    allowed_names = [name for name in requested_names if name in accessible_names]
+    forbidden_names = [name for name in requested_names if name not in accessible_names]
+    if not allowed_names:
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+
+    # 3. Monta as janelas de cada dia no fuso horário de cada quadra
+    backend_credentials = get_backend_credentials()
+    days = [first_day + timedelta(days=offset) for offset in range(day_count)]
+    timezone_names = await asyncio.gather(*(get_calendar_timezone_async(backend_credentials, all_quadras_map[name]) for name in allowed_names))
+    court_timezones = dict(zip(allowed_names, timezone_names))
+    day_windows = {}
+    for name in allowed_names:
+        real_calendar_id = all_quadras_map[name]
+        try:
+            calendar_tz = pytz.timezone(court_timezones[name])
+        except pytz.UnknownTimeZoneError:
+            raise HTTPException(status_code=500, detail="Fuso horário desconhecido para o calendário.")
+        day_windows[real_calendar_id] = [
+            (day, calendar_tz.localize(datetime.combine(day, time.min)), calendar_tz.localize(datetime.combine(day, time.max)))
+            for day in days
+        ]
+
+    # 4. Uma consulta para todas as quadras e dias
+    if ASYNC_CLIENT_ENABLED:
+        matrix = await get_availability_matrix_async(backend_credentials, day_windows)
+    else:
+        matrix = await run_in_threadpool(get_availability_matrix, backend_credentials, day_windows)
+
+    courts = [
+        CourtAvailability(
+            calendar_id=name,
+            timeZone=court_timezones[name],
+            days=matrix[all_quadras_map[name]]['days'],
+            error=matrix[all_quadras_map[name]]['error'],
+        )
+        for name in allowed_names
+    ]
+    return AvailabilityMatrixResponse(start_date=first_day, end_date=last_day, courts=courts, forbidden=forbidden_names)
+
 # Em src/server.py, adicione este novo endpoint
 
 @app.delete("/actions/delete_recurring_event/{event_id}", response_model=ActionResponse, tags=["Events"])
 def api_delete_recurring_event(event_id: str, calendar_id: str, delete_scope: str, user_info: dict = Depends(get_current_user)):
     backend_credentials = get_backend_credentials()
-    real_calendar_id = settings.get('quadras', {}).get(calendar_id)
+    real_calendar_id = get_config().court_ids.get(calendar_id)
     if not real_calendar_id:
         raise HTTPException(status_code=400, detail=f"Nome de quadra inválido: {calendar_id}")
 
@@ -296,3 +593,108 @@ def api_delete_recurring_event(event_id: str, calendar_id: str, delete_scope: st
         delete_scope=delete_scope,
         settings=settings
     )
+
+def require_admin(user_info: dict = Depends(get_current_user)) -> dict:
+    if not user_info.get('isAdmin'):
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    return user_info
+
+@app.get("/admin/court_access_cache", tags=["Admin"])
+def api_court_access_cache_stats(user_info: dict = Depends(require_admin)):
+    """Estatísticas (acertos, faltas, taxa de acerto) do cache de quadras acessíveis por usuário."""
+    return get_court_access_stats()
+
+@app.delete("/admin/court_access_cache", tags=["Admin"])
+def api_invalidate_court_access_cache(email: Optional[str] = None, user_info: dict = Depends(require_admin)):
+    """Invalida as quadras em cache de um usuário (ou de todos, sem 'email')."""
+    return {"invalidated": invalidate_court_access(email), "stats": get_court_access_stats()}
+
+@app.get("/admin/compression", tags=["Admin"])
+def api_compression_stats(user_info: dict = Depends(require_admin)):
+    """Taxa de compressão e CPU gasto por codificação e faixa de tamanho (para ajustar 'compression.minimum_size')."""
+    return get_compression_stats()
+
+@app.get("/admin/logging", tags=["Admin"])
+def api_logging_stats(user_info: dict = Depends(require_admin)):
+    """Profundidade da fila de logs e registros descartados (fila cheia ou amostragem)."""
+    return get_logging_stats()
+
+@app.get("/admin/block_queue", tags=["Admin"])
+def api_block_queue_stats(user_info: dict = Depends(require_admin)):
+    """Fila de manutenção de blocos: profundidade, atraso do job mais antigo, falhas e coalescência."""
+    return get_block_queue_stats()
+
+@app.get("/admin/reservations", tags=["Admin"])
+def api_reservation_stats(user_info: dict = Depends(require_admin)):
+    """Livro de reservas: reservas em andamento, intervalos por quadra e horários aceitos/recusados."""
+    return get_reservation_stats()
+
+@app.get("/admin/batches", tags=["Admin"])
+def api_batch_stats(user_info: dict = Depends(require_admin)):
+    """Requisições enviadas pelo endpoint de batch do Google e idas e voltas HTTP economizadas."""
+    return get_batch_stats()
+
+@app.get("/admin/upstream", tags=["Admin"])
+def api_upstream_stats(user_info: dict = Depends(require_admin)):
+    """Balde de cota do Google: fichas disponíveis, esperas por prioridade, repetições e desistências."""
+    return get_upstream_stats()
+
+@app.get("/admin/profiles", tags=["Admin"])
+def api_list_profiles(user_info: dict = Depends(require_admin)):
+    """Perfis recentes pedidos com 'X-Profile: 1' (ou '?_profile=1'), do mais novo para o mais antigo."""
+    return list_profiles()
+
+@app.get("/admin/profiles/{profile_id}", tags=["Admin"])
+def api_get_profile(profile_id: str, user_info: dict = Depends(require_admin)):
+    """Relatório completo de um perfil: chamadas ao Google, categorias de tempo e funções mais amostradas."""
+    report = get_profile(profile_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"Perfil '{profile_id}' não encontrado.")
+    return report
+
+def _ndjson_lines(first_page, pages):
+    """Um evento por linha, no mesmo formato dos itens de find_events; um bloco de texto por página."""
+    page = first_page
+    try:
+        while page is not None:
+            if TRUSTED_UPSTREAM:
+                yield b''.join(dumps(project(GoogleCalendarEvent, event)) + b'\n' for event in page)
+            else:
+                yield ''.join(GoogleCalendarEvent(**event).model_dump_json(by_alias=True) + '\n' for event in page)
+            page = next(pages, None)
+    except Exception as e:
+        # O status 200 já foi enviado: a falha vai como última linha para o cliente perceber o corte.
+        logging.error(f"Exportação de eventos interrompida: {e}")
+        yield json.dumps({'error': 'Exportação interrompida por um erro ao buscar os eventos.'}) + '\n'
+    finally:
+        pages.close()
+
+@app.get("/actions/export_events", tags=["Events"])
+def api_export_events(calendar_id: str, time_min_str: str, time_max_str: str, user_info: dict = Depends(require_admin)):
+    """
+    Exporta todos os eventos da quadra entre as datas (inclusive) como NDJSON, em streaming.
+    A memória usada não depende do tamanho do período (ver iter_event_pages).
+    """
+    backend_credentials = get_backend_credentials()
+    real_calendar_id = get_config().court_ids.get(calendar_id)
+    if not real_calendar_id:
+        raise HTTPException(status_code=400, detail=f"Nome de quadra inválido: {calendar_id}")
+
+    try:
+        calendar_tz = pytz.timezone(get_calendar_timezone(get_calendar_service(backend_credentials), real_calendar_id))
+        time_min = calendar_tz.localize(datetime.combine(datetime.strptime(time_min_str, '%Y-%m-%d').date(), time.min))
+        time_max = calendar_tz.localize(datetime.combine(datetime.strptime(time_max_str, '%Y-%m-%d').date(), time.max))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de data inválido. Use AAAA-MM-DD.")
+    if time_max <= time_min:
+        raise HTTPException(status_code=400, detail="A data de fim deve ser igual ou posterior à de início.")
+
+    # A primeira página é buscada antes de responder, para que um erro inicial ainda vire um status HTTP.
+    pages = iter_event_pages(backend_credentials, real_calendar_id, time_min, time_max)
+    try:
+        first_page = next(pages, None)
+    except HttpError as e:
+        logging.error(f"Erro de API ao exportar eventos de '{real_calendar_id}': {e}")
+        raise HTTPException(status_code=500, detail="Erro ao buscar os eventos para exportação.")
+
+    return StreamingResponse(_ndjson_lines(first_page, pages), media_type='application/x-ndjson')
@@ -0,0 +1,173 @@
+# src/service_pool.py
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import google_auth_httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import build_http
+
+from .config import settings
+from .upstream import ScheduledHttpRequest
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_URL = 'https://www.googleapis.com/discovery/v1/apis/calendar/v3/rest'
+# Raiz alternativa da API (ex.: o Google falso de loadtest/); vale para o googleapiclient, o batch e o cliente assíncrono.
+API_ROOT_URL = os.environ.get('GOOGLE_API_ROOT_URL') or settings.get('google_api_root_url')
+
+_discovery_doc: Optional[str] = None
+_discovery_lock = threading.Lock()
+
+
+def _get_discovery_document() -> str:
+    """
+    Retorna o documento de descoberta da Calendar API v3, carregado uma única vez por processo.
+    Usa a cópia estática distribuída com o googleapiclient e só recorre à rede se ela não existir.
+    """
+    global _discovery_doc
+    if _discovery_doc is not None:
+        return _discovery_doc
+    with _discovery_lock:
+        if _discovery_doc is None:
+            doc = get_static_doc('calendar', 'v3')
+            if doc is None:
+                logger.warning("Documento de descoberta estático não encontrado. Buscando na rede.")
+                resp, content = build_http().request(DISCOVERY_URL)
+                if resp.status >= 400:
+                    raise RuntimeError(f"Falha ao obter o documento de descoberta (HTTP {resp.status}).")
+                doc = content.decode('utf-8')
+            if API_ROOT_URL:
+                parsed = json.loads(doc)
+                root_url = API_ROOT_URL if API_ROOT_URL.endswith('/') else API_ROOT_URL + '/'
+                parsed['rootUrl'] = root_url
+                parsed['baseUrl'] = root_url + parsed['servicePath']
+                parsed.pop('mtlsRootUrl', None)
+                doc = json.dumps(parsed)
+                logger.warning(f"Calendar API redirecionada para '{root_url}'.")
+            _discovery_doc = doc
+    return _discovery_doc
+
+
+def warm_discovery_document():
+    """Carrega antecipadamente o documento de descoberta (etapa do aquecimento do servidor)."""
+    _get_discovery_document()
+
+
+def get_api_base_url() -> str:
+    """URL base da Calendar API (rootUrl + servicePath do documento de descoberta), para clientes fora do googleapiclient."""
+    doc = json.loads(_get_discovery_document())
+    return doc['rootUrl'] + doc['servicePath']
+
+
+def get_api_batch_url() -> str:
+    """URL do endpoint de batch da Calendar API (rootUrl + batchPath do documento de descoberta)."""
+    doc = json.loads(_get_discovery_document())
+    return doc['rootUrl'] + doc.get('batchPath', 'batch/calendar/v3')
+
+
+def _credentials_key(credentials) -> str:
+    """Identifica as credenciais pelo usuário personificado (ou pela conta de serviço)."""
+    subject = getattr(credentials, '_subject', None) or getattr(credentials, 'service_account_email', None)
+    return subject or f"anon-{id(credentials)}"
+
+
+class _PooledService:
+    __slots__ = ('credentials', 'http', 'service')
+
+    def __init__(self, credentials, http, service):
+        self.credentials = credentials
+        self.http = http
+        self.service = service
+
+
+class CalendarServicePool:
+    """
+    Mantém objetos de serviço do Google Calendar reutilizáveis, um por usuário personificado.
+
+    Os objetos httplib2 não podem ser compartilhados entre threads, então cada thread do
+    threadpool do FastAPI tem o seu próprio conjunto LRU limitado a 'max_subjects' entradas.
+    As conexões HTTP (keep-alive) são preservadas mesmo quando as credenciais são trocadas.
+    """
+
+    def __init__(self, max_subjects: int = 16):
+        self.max_subjects = max_subjects
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'rebinds': 0, 'evictions': 0}
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _entries(self) -> 'OrderedDict[str, _PooledService]':
+        entries = getattr(self._local, 'entries', None)
+        if entries is None:
+            entries = OrderedDict()
+            self._local.entries = entries
+        return entries
+
+    def get(self, credentials):
+        """Retorna um serviço pronto para uso na thread atual."""
+        entries = self._entries()
+        key = _credentials_key(credentials)
+        entry = entries.get(key)
+
+        if entry is not None and entry.credentials is credentials:
+            entries.move_to_end(key)
+            self._count('hits')
+            return entry.service
+
+        if entry is not None:
+            # Mesmo usuário, novo objeto de credenciais: reaproveita a conexão HTTP existente.
+            http = entry.http
+            self._count('rebinds')
+        else:
+            http = build_http()
+            self._count('misses')
+
+        service = build_calendar_service(credentials, http)
+        entries[key] = _PooledService(credentials, http, service)
+        entries.move_to_end(key)
+
+        while len(entries) > self.max_subjects:
+            _, evicted = entries.popitem(last=False)
+            self._count('evictions')
+            for conn in list(evicted.http.connections.values()):
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+        return service
+
+    def clear(self):
+        """Descarta os serviços da thread atual."""
+        self._entries().clear()
+
+
+_pool = CalendarServicePool(max_subjects=settings.get('service_pool', {}).get('max_subjects', 16))
+
+
+def build_calendar_service(credentials, http=None):
+    """
+    Constrói um serviço fora do pool. Para threads de vida curta (ex.: o aquecimento), onde um
+    serviço guardado no pool da thread seria descartado com ela.
+    """
+    authorized_http = google_auth_httplib2.AuthorizedHttp(credentials, http=http or build_http())
+    return build_from_document(_get_discovery_document(), http=authorized_http, requestBuilder=ScheduledHttpRequest)
+
+
+def get_calendar_service(credentials):
+    """Retorna um serviço do Google Calendar do pool do processo para as credenciais fornecidas."""
+    return _pool.get(credentials)
+
+
+def get_service_pool_stats() -> dict:
+    """Retorna uma cópia dos contadores do pool de serviços."""
+    with _pool._stats_lock:
+        return dict(_pool.stats)
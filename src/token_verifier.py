@@ -0,0 +1,177 @@
+# src/token_verifier.py
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from google.auth import jwt
+from google.auth.transport import requests
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v1/certs'
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+DEFAULT_CERTS_MAX_AGE = 300
+# Intervalo mínimo entre buscas forçadas por um 'kid' desconhecido: tokens forjados com chaves
+# inventadas não podem fazer o processo buscar os certificados a cada requisição.
+MIN_FORCED_REFRESH_SECONDS = 60
+
+_MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class _CertsResponse:
+    def __init__(self, status: int, headers: Dict[str, str], data: bytes):
+        self.status = status
+        self.headers = headers
+        self.data = data
+
+
+class LocalCertsRequest:
+    """
+    Substituto local do endpoint de certificados do Google, para testes.
+    Implementa a mesma interface de 'google.auth.transport.Request' e responde
+    sempre com os certificados fornecidos e o max-age indicado.
+    """
+
+    def __init__(self, certs: Dict[str, str], max_age: int = 3600):
+        self.certs = certs
+        self.max_age = max_age
+        self.calls = 0
+
+    def __call__(self, url, method='GET', body=None, headers=None, timeout=None, **kwargs):
+        self.calls += 1
+        return _CertsResponse(200, {'cache-control': f'public, max-age={self.max_age}'}, json.dumps(self.certs).encode('utf-8'))
+
+
+class IdTokenVerifier:
+    """
+    Verifica tokens de ID do Google localmente.
+
+    Os certificados de assinatura ficam em cache pelo tempo indicado no Cache-Control
+    (max-age) da resposta e cada token verificado com sucesso é memorizado, pelo hash
+    SHA-256, até o seu 'exp'. Assim a verificação RSA acontece uma vez por token, não
+    uma vez por requisição. Um 'kid' desconhecido força uma nova busca dos certificados no
+    máximo uma vez a cada 'min_forced_refresh_seconds'.
+    """
+
+    def __init__(
+        self,
+        audience: Optional[str],
+        certs_url: str = GOOGLE_CERTS_URL,
+        request: Optional[Callable] = None,
+        max_cached_tokens: int = 4096,
+        clock_skew_in_seconds: int = 0,
+        min_forced_refresh_seconds: float = MIN_FORCED_REFRESH_SECONDS,
+    ):
+        self.audience = audience
+        self.certs_url = certs_url
+        self.request = request or requests.Request()
+        self.max_cached_tokens = max_cached_tokens
+        self.clock_skew_in_seconds = clock_skew_in_seconds
+        self.min_forced_refresh_seconds = min_forced_refresh_seconds
+        self._certs: Optional[Dict[str, str]] = None
+        self._certs_expires_at = 0.0
+        self._last_forced_refresh: Optional[float] = None
+        self._certs_lock = threading.Lock()
+        self._tokens: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._tokens_lock = threading.Lock()
+        self.stats = {'token_hits': 0, 'token_misses': 0, 'certs_fetches': 0, 'forced_refreshes_skipped': 0}
+
+    # --- Certificados ---
+    def _fetch_certs(self):
+        response = self.request(self.certs_url, method='GET')
+        if response.status != 200:
+            raise ValueError(f"Não foi possível obter os certificados em {self.certs_url} (HTTP {response.status}).")
+        cache_control = {k.lower(): v for k, v in response.headers.items()}.get('cache-control', '')
+        match = _MAX_AGE_RE.search(cache_control)
+        max_age = int(match.group(1)) if match else DEFAULT_CERTS_MAX_AGE
+        self._certs = json.loads(response.data.decode('utf-8'))
+        self._certs_expires_at = time.time() + max_age
+        self.stats['certs_fetches'] += 1
+        logger.info(f"Certificados de ID token atualizados ({len(self._certs)} chaves, max-age={max_age}s).")
+
+    def get_certs(self, force_refresh: bool = False) -> Dict[str, str]:
+        """Retorna os certificados em cache, buscando-os de novo quando expiram."""
+        if not force_refresh and self._certs is not None and time.time() < self._certs_expires_at:
+            return self._certs
+        with self._certs_lock:
+            if force_refresh or self._certs is None or time.time() >= self._certs_expires_at:
+                self._fetch_certs()
+            return self._certs
+
+    def _certs_for_unknown_key(self) -> Dict[str, str]:
+        """Busca os certificados de novo, salvo se outra busca forçada aconteceu há pouco (aí devolve os atuais)."""
+        with self._certs_lock:
+            now = time.monotonic()
+            if self._last_forced_refresh is None or now - self._last_forced_refresh >= self.min_forced_refresh_seconds:
+                self._last_forced_refresh = now
+                self._fetch_certs()
+            else:
+                self.stats['forced_refreshes_skipped'] += 1
+            return self._certs
+
+    # --- Tokens ---
+    def _decode(self, token: str, certs: Dict[str, str]) -> Dict:
+        return jwt.decode(token, certs=certs, audience=self.audience, clock_skew_in_seconds=self.clock_skew_in_seconds)
+
+    def cached_claims(self, token: str) -> Optional[Dict]:
+        """Cópia das claims de um token já verificado e ainda não expirado; None se ele não estiver em cache."""
+        key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        with self._tokens_lock:
+            cached = self._tokens.get(key)
+            if cached is None:
+                return None
+            if cached['exp'] <= time.time():
+                del self._tokens[key]
+                return None
+            self._tokens.move_to_end(key)
+            self.stats['token_hits'] += 1
+            return dict(cached['idinfo'])
+
+    def verify(self, token: str) -> Dict:
+        """
+        Verifica o token e retorna uma cópia das suas claims.
+        Lança ValueError se o token for inválido, expirado ou de outro emissor.
+        Numa falta do cache pode buscar os certificados: chamadores assíncronos devem usar
+        cached_claims e só então chamar verify fora do event loop.
+        """
+        claims = self.cached_claims(token)
+        if claims is not None:
+            return claims
+        key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        now = time.time()
+        with self._tokens_lock:
+            self.stats['token_misses'] += 1
+
+        try:
+            idinfo = self._decode(token, self.get_certs())
+        except ValueError as e:
+            # Chave desconhecida: o Google pode ter rotacionado os certificados antes do max-age.
+            if 'Certificate for key id' not in str(e):
+                raise
+            idinfo = self._decode(token, self._certs_for_unknown_key())
+
+        if idinfo.get('iss') not in GOOGLE_ISSUERS:
+            raise ValueError(f"Emissor inválido. 'iss' deve ser um destes: {GOOGLE_ISSUERS}")
+
+        with self._tokens_lock:
+            self._tokens[key] = {'idinfo': idinfo, 'exp': idinfo.get('exp', now)}
+            while len(self._tokens) > self.max_cached_tokens:
+                self._tokens.popitem(last=False)
+
+        return dict(idinfo)
+
+    def clear(self):
+        """Esquece todos os tokens verificados (os certificados continuam em cache)."""
+        with self._tokens_lock:
+            self._tokens.clear()
+
+    def get_stats(self) -> dict:
+        with self._tokens_lock:
+            stats = dict(self.stats)
+            stats['cached_tokens'] = len(self._tokens)
+        return stats
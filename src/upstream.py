@@ -0,0 +1,372 @@
+# src/upstream.py
+import asyncio
+import functools
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+import httpx
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+
+from .config import settings
+from .metrics import google_call, google_method_name
+from .profiling import active_profile
+
+logger = logging.getLogger(__name__)
+
+_upstream_config = settings.get('upstream', {})
+UPSTREAM_ENABLED = bool(_upstream_config.get('enabled', True))
+# Cota do projeto na Calendar API, em requisições por segundo (0 = sem limite local).
+RATE_PER_SECOND = float(_upstream_config.get('rate_per_second', 50))
+BURST = max(1.0, float(_upstream_config.get('burst', 100)))
+# Fração do balde que as chamadas em segundo plano não podem consumir (fica para as interativas).
+BACKGROUND_RESERVE = float(_upstream_config.get('background_reserve', 0.25))
+if not 0 <= BACKGROUND_RESERVE < 1:
+    raise ValueError(f"upstream.background_reserve deve estar em [0, 1), recebido {BACKGROUND_RESERVE}.")
+MAX_ATTEMPTS = max(1, int(_upstream_config.get('max_attempts', 5)))
+BACKOFF_BASE_SECONDS = float(_upstream_config.get('backoff_base_seconds', 0.5))
+BACKOFF_MAX_SECONDS = float(_upstream_config.get('backoff_max_seconds', 20))
+
+# Motivos de 403 que são limitação de taxa (a requisição foi recusada antes de ter efeito).
+RATE_LIMIT_REASONS = frozenset({'rateLimitExceeded', 'userRateLimitExceeded'})
+SERVER_ERROR_STATUSES = frozenset({500, 502, 503, 504})
+# Métodos que podem ser repetidos após um 5xx ou falha de rede sem risco de efeito duplicado.
+# Um insert ou delete que falhou com 5xx pode ter sido aplicado; esses só são repetidos em 429/403.
+IDEMPOTENT_METHODS = frozenset({
+    'events.list', 'events.get', 'events.instances', 'events.patch', 'events.update',
+    'freebusy.query', 'calendars.get', 'calendarList.list', 'calendarList.get',
+})
+
+T = TypeVar('T')
+
+
+class Priority(IntEnum):
+    """Classes de prioridade: na disputa por cota, a menor passa na frente."""
+    INTERACTIVE = 0  # leituras que o usuário está esperando (find_events, find_availability)
+    NORMAL = 1       # escritas de uma requisição (criar, alterar, apagar um evento)
+    BACKGROUND = 2   # manutenção de blocos, séries inteiras, exportação e sincronização do espelho
+
+
+_priority: ContextVar[Priority] = ContextVar('upstream_priority', default=Priority.NORMAL)
+
+
+@contextmanager
+def upstream_priority(priority: Priority):
+    """Define a prioridade das chamadas ao Google feitas dentro do bloco (e nas threads/tasks que ele criar)."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def prioritized(priority: Priority):
+    """Decorador equivalente a 'with upstream_priority(priority)' em volta da função (síncrona ou assíncrona)."""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def _async_wrapper(*args, **kwargs):
+                with upstream_priority(priority):
+                    return await func(*args, **kwargs)
+            return _async_wrapper
+
+        @functools.wraps(func)
+        def _wrapper(*args, **kwargs):
+            with upstream_priority(priority):
+                return func(*args, **kwargs)
+        return _wrapper
+    return decorator
+
+
+class UpstreamScheduler:
+    """
+    Balde de fichas (token bucket) do processo para as chamadas à Calendar API.
+
+    Cada chamada consome uma ficha (um batch, uma por operação). Quando faltam fichas, quem espera
+    com prioridade maior passa na frente e as chamadas BACKGROUND não descem abaixo da reserva.
+    Um 429/rateLimitExceeded esvazia o balde, então todo o processo reduz o ritmo, não só a chamada
+    recusada. Funciona igual para threads (time.sleep) e para o event loop (asyncio.sleep).
+    """
+
+    def __init__(self, rate_per_second: float, burst: float, background_reserve: float = 0.25):
+        self.rate = rate_per_second
+        self.burst = burst
+        self.reserve = burst * background_reserve
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._waiting = Counter()
+        self._lock = threading.Lock()
+        self.stats = {
+            'acquired': Counter(), 'waited': Counter(), 'wait_seconds': Counter(),
+            'retries': Counter(), 'gave_up': Counter(), 'rate_limited': 0,
+        }
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_take(self, priority: Priority, cost: float) -> float:
+        """Consome 'cost' fichas e retorna 0, ou retorna quantos segundos esperar antes de tentar de novo."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            if any(self._waiting[higher] for higher in Priority if higher < priority):
+                return 1.0 / self.rate
+            floor = self.reserve if priority == Priority.BACKGROUND else 0.0
+            # Um batch maior que o balde utilizável nunca caberia: passa quando o balde estiver cheio.
+            cost = min(cost, self.burst - floor)
+            if self._tokens - cost >= floor:
+                self._tokens -= cost
+                return 0.0
+            return (cost + floor - self._tokens) / self.rate
+
+    def _waiting_started(self, priority: Priority):
+        with self._lock:
+            self._waiting[priority] += 1
+
+    def _waiting_finished(self, priority: Priority, seconds: float):
+        with self._lock:
+            self._waiting[priority] -= 1
+            self.stats['waited'][priority.name] += 1
+            self.stats['wait_seconds'][priority.name] += seconds
+
+    def acquire(self, cost: float = 1) -> float:
+        """Bloqueia a thread até haver fichas; retorna o tempo esperado."""
+        priority = _priority.get()
+        wait = self._try_take(priority, cost)
+        waited = 0.0
+        if wait:
+            self._waiting_started(priority)
+            started = time.monotonic()
+            try:
+                while wait:
+                    time.sleep(wait)
+                    wait = self._try_take(priority, cost)
+            finally:
+                waited = time.monotonic() - started
+                self._waiting_finished(priority, waited)
+        self._count('acquired', priority.name)
+        return waited
+
+    async def acquire_async(self, cost: float = 1) -> float:
+        """Como acquire, sem bloquear o event loop."""
+        priority = _priority.get()
+        wait = self._try_take(priority, cost)
+        waited = 0.0
+        if wait:
+            self._waiting_started(priority)
+            started = time.monotonic()
+            try:
+                while wait:
+                    await asyncio.sleep(wait)
+                    wait = self._try_take(priority, cost)
+            finally:
+                waited = time.monotonic() - started
+                self._waiting_finished(priority, waited)
+        self._count('acquired', priority.name)
+        return waited
+
+    def note_rate_limited(self):
+        with self._lock:
+            self._tokens = min(self._tokens, 0.0)
+            self.stats['rate_limited'] += 1
+
+    def _count(self, key: str, label: str, amount: int = 1):
+        with self._lock:
+            self.stats[key][label] += amount
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'rate_per_second': self.rate,
+                'burst': self.burst,
+                'background_reserve': self.reserve,
+                'tokens': round(self._tokens, 2),
+                'waiting': {priority.name: count for priority, count in self._waiting.items() if count},
+                'acquired': dict(self.stats['acquired']),
+                'waited': dict(self.stats['waited']),
+                'wait_seconds': {name: round(seconds, 3) for name, seconds in self.stats['wait_seconds'].items()},
+                'rate_limited': self.stats['rate_limited'],
+                'retries': dict(self.stats['retries']),
+                'gave_up': dict(self.stats['gave_up']),
+                'max_attempts': MAX_ATTEMPTS,
+            }
+
+
+_scheduler = UpstreamScheduler(RATE_PER_SECOND, BURST, BACKGROUND_RESERVE)
+
+
+def get_upstream_stats() -> dict:
+    """Fichas disponíveis, esperas por prioridade e repetições por método/motivo."""
+    stats = _scheduler.get_stats()
+    stats['enabled'] = UPSTREAM_ENABLED
+    return stats
+
+
+# --- Repetições ---
+def _error_reasons(error: HttpError) -> set:
+    reasons = {detail.get('reason') for detail in (getattr(error, 'error_details', None) or []) if isinstance(detail, dict)}
+    try:
+        content = json.loads(error.content.decode('utf-8') if isinstance(error.content, bytes) else error.content)
+        reasons.update(item.get('reason') for item in content.get('error', {}).get('errors', []))
+    except (ValueError, AttributeError, TypeError):
+        pass
+    reasons.discard(None)
+    return reasons
+
+
+def retry_reason(method: str, error: BaseException) -> Optional[str]:
+    """'rate_limit', 'server_error' ou 'network' quando a falha vale uma nova tentativa; None caso contrário."""
+    if isinstance(error, HttpError):
+        status = int(getattr(error.resp, 'status', 0) or 0)
+        if status == 429 or (status == 403 and _error_reasons(error) & RATE_LIMIT_REASONS):
+            return 'rate_limit'
+        if status in SERVER_ERROR_STATUSES and method in IDEMPOTENT_METHODS:
+            return 'server_error'
+        return None
+    if isinstance(error, (ConnectionError, TimeoutError, httpx.TransportError)) and method in IDEMPOTENT_METHODS:
+        return 'network'
+    return None
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    resp = getattr(error, 'resp', None)
+    value = resp.get('retry-after') if resp is not None and hasattr(resp, 'get') else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt: int, error: Optional[BaseException] = None) -> float:
+    """Espera exponencial com jitter completo (0..base*2^tentativa, limitada), respeitando o Retry-After."""
+    delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+    retry_after = _retry_after(error) if error is not None else None
+    return max(delay, min(retry_after, BACKOFF_MAX_SECONDS)) if retry_after else delay
+
+
+def _retry_delay(method: str, error: BaseException, attempt: int) -> Optional[float]:
+    """Registra a falha e retorna a espera antes da próxima tentativa, ou None para desistir."""
+    reason = retry_reason(method, error)
+    if reason is None:
+        return None
+    if reason == 'rate_limit':
+        _scheduler.note_rate_limited()
+    if attempt + 1 >= MAX_ATTEMPTS:
+        _scheduler._count('gave_up', f"{method}:{reason}")
+        logger.error(f"Chamada {method} ao Google falhou após {MAX_ATTEMPTS} tentativas ({reason}): {error}")
+        return None
+    _scheduler._count('retries', f"{method}:{reason}")
+    delay = backoff_delay(attempt, error)
+    logger.warning(f"Chamada {method} ao Google falhou ({reason}); nova tentativa em {delay:.2f}s ({attempt + 2}/{MAX_ATTEMPTS}).")
+    return delay
+
+
+def _batch_retry_delay(failures: List[Tuple[str, BaseException]], attempt: int) -> Optional[float]:
+    """Conta as operações recusadas dentro de um batch e retorna o backoff, ou None quando as tentativas acabaram."""
+    reasons = Counter(f"{method}:{retry_reason(method, error)}" for method, error in failures)
+    if any(key.endswith(':rate_limit') for key in reasons):
+        _scheduler.note_rate_limited()
+    if attempt + 1 >= MAX_ATTEMPTS:
+        for key, count in reasons.items():
+            _scheduler._count('gave_up', key, count)
+        logger.error(f"{len(failures)} operação(ões) do batch falharam após {MAX_ATTEMPTS} tentativas: {dict(reasons)}")
+        return None
+    for key, count in reasons.items():
+        _scheduler._count('retries', key, count)
+    delay = max(backoff_delay(attempt, error) for _, error in failures)
+    logger.warning(f"{len(failures)} operação(ões) do batch recusadas {dict(reasons)}; novo batch em {delay:.2f}s ({attempt + 2}/{MAX_ATTEMPTS}).")
+    return delay
+
+
+def wait_before_batch_retry(failures: List[Tuple[str, BaseException]], attempt: int) -> bool:
+    """
+    Para operações recusadas dentro de um batch (pares método/erro, todos repetíveis): espera o
+    backoff e retorna True, ou retorna False quando as tentativas acabaram.
+    """
+    delay = _batch_retry_delay(failures, attempt)
+    if delay is None:
+        return False
+    time.sleep(delay)
+    return True
+
+
+async def wait_before_batch_retry_async(failures: List[Tuple[str, BaseException]], attempt: int) -> bool:
+    """Como wait_before_batch_retry, sem bloquear o event loop."""
+    delay = _batch_retry_delay(failures, attempt)
+    if delay is None:
+        return False
+    await asyncio.sleep(delay)
+    return True
+
+
+def call_upstream(method: str, func: Callable[[], T], cost: int = 1) -> T:
+    """Executa uma chamada ao Google respeitando o balde de fichas e repetindo as falhas transitórias."""
+    if not UPSTREAM_ENABLED:
+        return func()
+    attempt = 0
+    while True:
+        _scheduler.acquire(cost)
+        try:
+            return func()
+        except Exception as e:
+            delay = _retry_delay(method, e, attempt)
+            if delay is None:
+                raise
+        time.sleep(delay)
+        attempt += 1
+
+
+async def call_upstream_async(method: str, func: Callable[[], Awaitable[T]], cost: int = 1) -> T:
+    """Versão assíncrona de call_upstream ('func' cria uma nova corrotina a cada tentativa)."""
+    if not UPSTREAM_ENABLED:
+        return await func()
+    attempt = 0
+    while True:
+        await _scheduler.acquire_async(cost)
+        try:
+            return await func()
+        except Exception as e:
+            delay = _retry_delay(method, e, attempt)
+            if delay is None:
+                raise
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+class ScheduledHttpRequest(HttpRequest):
+    """
+    HttpRequest do googleapiclient (usado como requestBuilder) em que cada execute() passa pelo
+    agendador e cada tentativa é medida nas métricas e no perfil da requisição.
+    """
+
+    def execute(self, http=None, num_retries=0):
+        method = google_method_name(self.methodId)
+        return call_upstream(method, lambda: self._measured_execute(method, http, num_retries))
+
+    def _measured_execute(self, method: str, http, num_retries):
+        with google_call(method) as call:
+            if active_profile() is None:
+                return super().execute(http=http, num_retries=num_retries)
+            call.request_bytes = len(self.body) if self.body else 0
+            postproc = self.postproc
+
+            def _measured_postproc(resp, content):
+                call.response_bytes = len(content) if content else 0
+                return postproc(resp, content)
+
+            self.postproc = _measured_postproc
+            try:
+                return super().execute(http=http, num_retries=num_retries)
+            finally:
+                self.postproc = postproc
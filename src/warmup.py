@@ -0,0 +1,88 @@
+# src/warmup.py
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Uma fase é uma lista de (nome, função, essencial); as etapas de uma fase rodam em paralelo
+# e cada fase só começa quando a anterior termina.
+WarmupPhase = List[Tuple[str, Callable[[], object], bool]]
+
+
+class Warmup:
+    """
+    Executa o aquecimento do processo (caches, credenciais, certificados) antes de declará-lo pronto.
+
+    Guarda a duração e o resultado de cada etapa. O processo fica pronto quando todas as fases
+    terminam sem falha em etapas essenciais; falhas em etapas não essenciais (ex.: uma quadra)
+    são apenas registradas.
+    """
+
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max_workers
+        self.status = 'pending'
+        self.steps: Dict[str, Dict] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def _run_step(self, name: str, func: Callable[[], object], essential: bool) -> bool:
+        started = time.perf_counter()
+        try:
+            func()
+            ok, error = True, None
+        except Exception as e:
+            ok, error = False, str(e)
+            logger.warning(f"Aquecimento: etapa '{name}' falhou: {e}")
+        with self._lock:
+            self.steps[name] = {
+                'ok': ok,
+                'essential': essential,
+                'seconds': round(time.perf_counter() - started, 4),
+                'error': error,
+            }
+        return ok or not essential
+
+    def run(self, phases: List[WarmupPhase]):
+        """Executa as fases em ordem (bloqueante)."""
+        self.status = 'running'
+        self.started_at = time.time()
+        healthy = True
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='warmup') as executor:
+            for phase in phases:
+                results = list(executor.map(lambda step: self._run_step(*step), phase))
+                if not all(results):
+                    healthy = False
+                    break
+        self.finished_at = time.time()
+        self.status = 'ready' if healthy else 'failed'
+        self._done.set()
+        logger.info(f"Aquecimento concluído em {self.finished_at - self.started_at:.2f}s ({self.status}).")
+
+    def start(self, phases: List[WarmupPhase]):
+        """Executa as fases em uma thread daemon, sem segurar a inicialização do servidor."""
+        threading.Thread(target=self.run, args=(phases,), name='warmup', daemon=True).start()
+
+    def skip(self):
+        """Marca o processo como pronto sem aquecimento (aquecimento desligado)."""
+        self.status = 'ready'
+        self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self.status == 'ready'
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def report(self) -> dict:
+        with self._lock:
+            steps = {name: dict(step) for name, step in self.steps.items()}
+        total = None
+        if self.started_at is not None:
+            total = round((self.finished_at or time.time()) - self.started_at, 4)
+        return {'ready': self.ready, 'status': self.status, 'total_seconds': total, 'steps': steps}
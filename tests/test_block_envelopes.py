@@ -0,0 +1,76 @@
+# tests/test_block_envelopes.py
+from src.calendar_actions import _block_source_ids, compute_block_envelopes
+
+
+def _event(event_id: str, start: str, end: str, summary: str = 'Jogo') -> dict:
+    return {'id': event_id, 'summary': summary,
+            'start': {'dateTime': f'2030-01-07T{start}:00+00:00'}, 'end': {'dateTime': f'2030-01-07T{end}:00+00:00'}}
+
+
+def _block(block_id: str, start: str, end: str, *source_ids: str) -> dict:
+    block = _event(block_id, start, end, summary='Bloqueado')
+    block['extendedProperties'] = {'private': {'sourceEventIds': ','.join(source_ids)}}
+    return block
+
+
+def test_new_event_without_blocks_creates_one_block():
+    inserts, patches, deletes = compute_block_envelopes([], [_event('e1', '10:00', '11:00')], 'Quadra 1')
+
+    assert patches == [] and deletes == []
+    assert len(inserts) == 1
+    body = inserts[0]
+    assert body['start']['dateTime'] == '2030-01-07T10:00:00+00:00'
+    assert body['end']['dateTime'] == '2030-01-07T11:00:00+00:00'
+    assert body['extendedProperties']['private']['sourceEventIds'] == 'e1'
+    assert body['extendedProperties']['shared']['autoGeneratedBy'] == 'courtBookingSystemMCP'
+    assert 'Quadra 1' in body['summary']
+
+
+def test_overlapping_events_share_one_envelope():
+    events = [_event('e2', '10:30', '12:00'), _event('e1', '10:00', '11:00')]
+
+    inserts, _, _ = compute_block_envelopes([], events, 'Quadra 1')
+
+    assert len(inserts) == 1
+    assert inserts[0]['start']['dateTime'] == '2030-01-07T10:00:00+00:00'
+    assert inserts[0]['end']['dateTime'] == '2030-01-07T12:00:00+00:00'
+    assert inserts[0]['extendedProperties']['private']['sourceEventIds'] == 'e1,e2'
+
+
+def test_touching_events_get_separate_blocks():
+    inserts, _, _ = compute_block_envelopes([], [_event('e1', '10:00', '11:00'), _event('e2', '11:00', '12:00')], 'Quadra 1')
+
+    assert len(inserts) == 2
+
+
+def test_existing_block_is_extended_and_extra_blocks_deleted():
+    existing = [_block('b1', '10:00', '11:00', 'e1'), _block('b2', '11:30', '12:00', 'e3')]
+    new = [_event('e2', '10:30', '11:45')]
+
+    inserts, patches, deletes = compute_block_envelopes(existing, new, 'Quadra 1')
+
+    assert inserts == []
+    assert deletes == ['b2']
+    assert len(patches) == 1
+    block_id, body = patches[0]
+    assert block_id == 'b1'
+    assert body['start']['dateTime'] == '2030-01-07T10:00:00+00:00'
+    assert body['end']['dateTime'] == '2030-01-07T12:00:00+00:00'
+    assert _block_source_ids(body) == {'e1', 'e2', 'e3'}
+
+
+def test_block_already_covering_the_event_is_left_alone():
+    existing = [_block('b1', '10:00', '11:00', 'e1')]
+
+    assert compute_block_envelopes(existing, [_event('e1', '10:00', '11:00')], 'Quadra 1') == ([], [], [])
+
+
+def test_groups_without_new_events_and_all_day_blocks_are_ignored():
+    existing = [
+        _block('b1', '08:00', '09:00', 'old'),
+        {'id': 'all-day', 'start': {'date': '2030-01-07'}, 'end': {'date': '2030-01-08'}},
+    ]
+
+    inserts, patches, deletes = compute_block_envelopes(existing, [_event('e1', '10:00', '11:00')], 'Quadra 1')
+
+    assert len(inserts) == 1 and patches == [] and deletes == []
@@ -0,0 +1,99 @@
+# tests/test_block_queue.py
+import json
+
+from src.block_queue import REMOVE, UPSERT, BlockQueue, _clusters, _coalesce
+
+
+def _job(job_id: int, action: str, event_id: str, start: float, end: float, version: int = 0) -> tuple:
+    payload = json.dumps({'id': event_id, 'version': version})
+    return (job_id, 'source@calendar', action, event_id, payload, start, end)
+
+
+def _event(event_id: str) -> dict:
+    return {'id': event_id, 'start': {'dateTime': '2030-01-01T10:00:00+00:00'}, 'end': {'dateTime': '2030-01-01T11:00:00+00:00'}}
+
+
+def _ids(clusters):
+    return sorted(sorted(job[0] for job in cluster) for cluster in clusters)
+
+
+def test_clusters_group_overlapping_windows():
+    jobs = [_job(1, UPSERT, 'a', 0, 10), _job(2, UPSERT, 'b', 5, 15), _job(3, UPSERT, 'c', 20, 30)]
+
+    assert _ids(_clusters(jobs)) == [[1, 2], [3]]
+
+
+def test_clusters_chain_transitively_and_split_touching_windows():
+    jobs = [_job(1, UPSERT, 'a', 0, 10), _job(2, UPSERT, 'b', 8, 20), _job(3, UPSERT, 'c', 18, 25), _job(4, UPSERT, 'd', 25, 30)]
+
+    assert _ids(_clusters(jobs)) == [[1, 2, 3], [4]]
+
+
+def test_clusters_keep_versions_of_an_event_together():
+    # O evento 'a' mudou de horário: a remoção da janela antiga e a nova inserção ficam no mesmo grupo.
+    jobs = [_job(1, REMOVE, 'a', 0, 10), _job(2, UPSERT, 'b', 50, 60), _job(3, UPSERT, 'a', 100, 110)]
+
+    assert _ids(_clusters(jobs)) == [[1, 3], [2]]
+
+
+def test_coalesce_keeps_only_latest_upsert():
+    jobs = [_job(1, UPSERT, 'a', 0, 10, version=1), _job(2, UPSERT, 'a', 0, 10, version=2)]
+
+    removed, upserted = _coalesce(jobs)
+
+    assert removed == []
+    assert upserted == [{'id': 'a', 'version': 2}]
+
+
+def test_coalesce_remove_after_upsert_drops_the_event():
+    jobs = [_job(2, REMOVE, 'a', 0, 10, version=2), _job(1, UPSERT, 'a', 0, 10, version=1)]
+
+    removed, upserted = _coalesce(jobs)
+
+    assert removed == [{'id': 'a', 'version': 2}]
+    assert upserted == []
+
+
+def test_coalesce_moved_event_removes_old_window_and_upserts_new():
+    jobs = [_job(1, REMOVE, 'a', 0, 10, version=1), _job(2, UPSERT, 'a', 100, 110, version=2)]
+
+    removed, upserted = _coalesce(jobs)
+
+    assert removed == [{'id': 'a', 'version': 1}]
+    assert upserted == [{'id': 'a', 'version': 2}]
+
+
+def test_coalesce_deduplicates_removals_of_the_same_window():
+    jobs = [_job(1, REMOVE, 'a', 0, 10, version=1), _job(2, REMOVE, 'a', 0, 10, version=2), _job(3, REMOVE, 'b', 0, 10)]
+
+    removed, upserted = _coalesce(jobs)
+
+    assert sorted(event['id'] for event in removed) == ['a', 'b']
+    assert upserted == []
+
+
+def test_expired_lease_is_not_completed_by_the_previous_owner(tmp_path):
+    path = str(tmp_path / 'queue.db')
+    first, second = BlockQueue(path, lease_seconds=0), BlockQueue(path)
+    first.enqueue('source@calendar', upserted=[_event('a')])
+    stale = first._claim()
+    taken = second._claim()
+
+    first._complete(stale)
+    first._reschedule(stale, RuntimeError('boom'))
+
+    assert [job[0] for job in taken] == [job[0] for job in stale]
+    assert first._conn.execute('SELECT claimed_by, attempts FROM block_jobs').fetchall() == [(second._owner, 0)]
+
+
+def test_reschedule_skips_jobs_already_removed(tmp_path):
+    queue = BlockQueue(str(tmp_path / 'queue.db'), retry_base_seconds=0)
+    queue.enqueue('source@calendar', upserted=[_event('a'), _event('b')])
+    jobs = queue._claim()
+    queue._conn.execute('DELETE FROM block_jobs WHERE id = ?', (jobs[0][0],))
+
+    queue._reschedule(jobs, RuntimeError('boom'))
+
+    assert queue._conn.execute('SELECT attempts, claimed_by FROM block_jobs').fetchall() == [(1, None)]
+    assert not queue._conn.in_transaction
+    assert queue.stats['retries'] == 1
@@ -0,0 +1,65 @@
+# tests/test_calendar_mirror.py
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+from src.calendar_mirror import CalendarMirror
+
+CALENDAR = 'court@calendar'
+
+
+class _Request:
+    def __init__(self, response):
+        self._response = response
+
+    def execute(self):
+        return self._response
+
+
+class _Events:
+    def __init__(self, responses):
+        self._responses = responses
+
+    def list(self, **kwargs):
+        return _Request(self._responses.pop(0))
+
+
+class _Service:
+    def __init__(self, *responses):
+        self._events = _Events(list(responses))
+
+    def events(self):
+        return self._events
+
+
+def _event(event_id: str, start: str = '2030-01-01T10:00:00+00:00', end: str = '2030-01-01T11:00:00+00:00') -> dict:
+    return {'id': event_id, 'start': {'dateTime': start}, 'end': {'dateTime': end}}
+
+
+def _window():
+    return datetime(2030, 1, 1, tzinfo=timezone.utc), datetime(2030, 1, 2, tzinfo=timezone.utc)
+
+
+def test_incremental_sync_drops_events_that_lost_their_bounds(tmp_path):
+    mirror = CalendarMirror(str(tmp_path / 'mirror.db'), [CALENDAR])
+    mirror.sync(_Service({'items': [_event('a'), _event('b')], 'nextSyncToken': 't1'}), CALENDAR)
+    assert len(mirror.busy_intervals(CALENDAR, *_window())) == 1
+
+    broken = {'id': 'a', 'start': {}, 'end': {}}
+    mirror.sync(_Service({'items': [broken], 'nextSyncToken': 't2'}), CALENDAR)
+
+    assert [event['id'] for event in mirror.list_events(CALENDAR)] == ['b']
+    assert mirror.busy_intervals(CALENDAR, *_window()) == [(datetime(2030, 1, 1, 10, tzinfo=timezone.utc), datetime(2030, 1, 1, 11, tzinfo=timezone.utc))]
+
+
+def test_failed_sync_rolls_back_and_keeps_previous_rows(tmp_path):
+    mirror = CalendarMirror(str(tmp_path / 'mirror.db'), [CALENDAR])
+    mirror.sync(_Service({'items': [_event('a')], 'nextSyncToken': 't1'}), CALENDAR)
+
+    duplicated = {'items': [_event('b'), _event('b')], 'nextSyncToken': 't2'}
+    with pytest.raises(sqlite3.IntegrityError):
+        mirror._full_sync(_Service(duplicated), CALENDAR)
+
+    assert not mirror._conn.in_transaction
+    assert [event['id'] for event in mirror.list_events(CALENDAR)] == ['a']
@@ -0,0 +1,114 @@
+# tests/test_compression.py
+import gzip
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from src.compression import CompressionMiddleware, _accepted_encodings
+
+BIG_TEXT = 'quadra livre ' * 500
+
+
+def _middleware(encodings=('gzip',)):
+    return CompressionMiddleware(None, encodings=list(encodings))
+
+
+def test_accepted_encodings_parses_quality_values():
+    assert _accepted_encodings('gzip;q=0.5, br, zstd;q=0, deflate;q=x') == {'gzip': 0.5, 'br': 1.0, 'zstd': 0.0, 'deflate': 0.0}
+    assert _accepted_encodings('') == {}
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    ('gzip', 'gzip'),
+    ('GZIP', 'gzip'),
+    ('gzip;q=0', None),
+    ('identity', None),
+    ('*', 'gzip'),
+    ('*, gzip;q=0', None),
+    ('', None),
+])
+def test_negotiate_gzip(accept_encoding, expected):
+    assert _middleware()._negotiate(accept_encoding) == expected
+
+
+def test_negotiate_follows_server_preference():
+    middleware = _middleware(encodings=('gzip',))
+    middleware.encodings = ['br', 'zstd', 'gzip']
+
+    assert middleware._negotiate('gzip, br') == 'br'
+    assert middleware._negotiate('gzip, zstd') == 'zstd'
+    assert middleware._negotiate('gzip, br;q=0') == 'gzip'
+
+
+def test_unavailable_encodings_are_not_offered():
+    middleware = CompressionMiddleware(None, encodings=['snappy', 'gzip'])
+
+    assert middleware.encodings == ['gzip']
+
+
+async def _big(request):
+    return PlainTextResponse(BIG_TEXT, headers={'ETag': '"abc"'})
+
+
+async def _small(request):
+    return JSONResponse({'ok': True})
+
+
+async def _stream(request):
+    async def chunks():
+        for _ in range(3):
+            yield BIG_TEXT.encode()
+    return StreamingResponse(chunks(), media_type='application/x-ndjson')
+
+
+async def _if_none_match(request):
+    return PlainTextResponse(request.headers.get('if-none-match', ''))
+
+
+@pytest.fixture(scope='module')
+def client():
+    app = Starlette(routes=[
+        Route('/big', _big), Route('/small', _small), Route('/stream', _stream), Route('/inm', _if_none_match),
+    ])
+    app.add_middleware(CompressionMiddleware, minimum_size=1024, encodings=['gzip'])
+    return TestClient(app)
+
+
+def test_large_response_is_gzipped_with_suffixed_etag(client):
+    response = client.get('/big', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.headers['etag'] == '"abc-gzip"'
+    assert 'accept-encoding' in response.headers['vary'].lower()
+    assert response.text == BIG_TEXT
+
+
+def test_response_is_not_compressed_when_not_accepted(client):
+    response = client.get('/big', headers={'Accept-Encoding': 'identity'})
+
+    assert 'content-encoding' not in response.headers
+    assert response.headers['etag'] == '"abc"'
+
+
+def test_small_response_is_not_compressed(client):
+    response = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'content-encoding' not in response.headers
+    assert response.json() == {'ok': True}
+
+
+def test_streaming_response_is_compressed_chunk_by_chunk(client):
+    with client.stream('GET', '/stream', headers={'Accept-Encoding': 'gzip'}) as response:
+        raw = b''.join(response.iter_raw())
+
+    assert response.headers['content-encoding'] == 'gzip'
+    assert gzip.decompress(raw) == BIG_TEXT.encode() * 3
+
+
+def test_if_none_match_suffix_is_stripped_before_the_endpoint(client):
+    response = client.get('/inm', headers={'Accept-Encoding': 'identity', 'If-None-Match': '"abc-gzip"'})
+
+    assert response.text == '"abc"'
@@ -0,0 +1,78 @@
+# tests/test_court_access.py
+import threading
+import time
+
+from src.court_access import CourtAccessCache
+
+
+def test_concurrent_misses_share_one_load():
+    cache = CourtAccessCache()
+    calls = []
+
+    def loader(email):
+        calls.append(email)
+        time.sleep(0.05)
+        return {'Quadra 1'}
+
+    threads = [threading.Thread(target=cache.get, args=('user@example.com', loader)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ['user@example.com']
+    assert cache.get('user@example.com', loader) == frozenset({'Quadra 1'})
+    assert cache.stats['misses'] == 1
+
+
+def test_invalidate_during_load_discards_the_result():
+    cache = CourtAccessCache()
+    loading, release = threading.Event(), threading.Event()
+
+    def slow_loader(email):
+        loading.set()
+        release.wait(5)
+        return {'Quadra antiga'}
+
+    thread = threading.Thread(target=cache.get, args=('user@example.com', slow_loader))
+    thread.start()
+    loading.wait(5)
+    cache.invalidate('user@example.com')
+    release.set()
+    thread.join()
+
+    assert cache.get('user@example.com', lambda email: {'Quadra nova'}) == frozenset({'Quadra nova'})
+    assert cache.stats['stale_loads'] == 1
+
+
+def test_invalidate_all_during_load_discards_the_result():
+    cache = CourtAccessCache()
+    loading, release = threading.Event(), threading.Event()
+
+    def slow_loader(email):
+        loading.set()
+        release.wait(5)
+        return {'Quadra antiga'}
+
+    thread = threading.Thread(target=cache.get, args=('user@example.com', slow_loader))
+    thread.start()
+    loading.wait(5)
+    cache.invalidate()
+    release.set()
+    thread.join()
+
+    assert cache.get('user@example.com', lambda email: {'Quadra nova'}) == frozenset({'Quadra nova'})
+
+
+def test_failed_load_is_not_cached():
+    cache = CourtAccessCache()
+
+    def failing(email):
+        raise RuntimeError('Google fora do ar')
+
+    try:
+        cache.get('user@example.com', failing)
+    except RuntimeError:
+        pass
+
+    assert cache.get('user@example.com', lambda email: {'Quadra 1'}) == frozenset({'Quadra 1'})
@@ -0,0 +1,35 @@
+# tests/test_court_versions.py
+from src.court_versions import CourtVersions, etag_matches, make_etag
+
+
+def test_make_etag_is_quoted_and_depends_on_every_part():
+    etag = make_etag('find_events', 'court', 1)
+
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == make_etag('find_events', 'court', 1)
+    assert etag != make_etag('find_events', 'court', 2)
+    # O separador entre as partes evita colisões por concatenação.
+    assert make_etag('ab', 'c') != make_etag('a', 'bc')
+
+
+def test_etag_matches():
+    etag = make_etag('x')
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'W/{etag}', etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('', etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(etag.strip('"'), etag)
+
+
+def test_court_versions_bump_only_the_given_courts():
+    versions = CourtVersions()
+    before_a, before_b = versions.get('a'), versions.get('b')
+
+    versions.bump(['a'])
+
+    assert versions.get('a') != before_a
+    assert versions.get('b') == before_b
@@ -0,0 +1,89 @@
+# tests/test_interval_index.py
+from datetime import datetime, timedelta, timezone
+
+from src.interval_index import IntervalIndex
+
+BASE = datetime(2030, 1, 7, tzinfo=timezone.utc)
+
+
+def at(hour: float) -> datetime:
+    return BASE + timedelta(hours=hour)
+
+
+def test_overlaps_is_half_open():
+    index = IntervalIndex.from_intervals([(at(10), at(11))])
+
+    assert index.overlaps(at(10.5), at(12))
+    assert index.overlaps(at(9), at(10.5))
+    assert not index.overlaps(at(11), at(12))
+    assert not index.overlaps(at(9), at(10))
+
+
+def test_touching_intervals_are_merged():
+    index = IntervalIndex.from_intervals([(at(10), at(11)), (at(11), at(12)), (at(14), at(15))])
+
+    assert index.merged() == [(at(10), at(12)), (at(14), at(15))]
+    assert index.merged(at(10.5), at(14.5)) == [(at(10.5), at(12)), (at(14), at(14.5))]
+
+
+def test_incremental_insert_matches_bulk_load():
+    intervals = [(at(13), at(14)), (at(8), at(9)), (at(8.5), at(10)), (at(12), at(13)), (at(20), at(21))]
+    index = IntervalIndex()
+    for start, end in intervals:
+        index.insert(start, end)
+
+    assert index.merged() == IntervalIndex.from_intervals(intervals).merged()
+    assert len(index) == len(intervals)
+
+
+def test_find_overlapping_returns_keys_in_start_order():
+    index = IntervalIndex.from_intervals([
+        (at(8), at(18), 'long'),
+        (at(10), at(11), 'a'),
+        (at(12), at(13), 'b'),
+    ])
+
+    found = index.find_overlapping(at(10.5), at(12.5))
+
+    assert [key for _, _, key in found] == ['long', 'a', 'b']
+    assert index.find_overlapping(at(18), at(19)) == []
+
+
+def test_insert_with_existing_key_replaces_interval():
+    index = IntervalIndex()
+    index.insert(at(10), at(11), key='event')
+    index.insert(at(15), at(16), key='event')
+
+    assert len(index) == 1
+    assert not index.overlaps(at(10), at(11))
+    assert index.overlaps(at(15), at(16))
+
+
+def test_remove_key_and_remove_rebuild_the_union():
+    index = IntervalIndex()
+    index.insert(at(10), at(11), key='a')
+    index.insert(at(11), at(12), key='b')
+    index.insert(at(13), at(14))
+
+    assert index.remove_key('a')
+    assert not index.remove_key('a')
+    assert index.merged() == [(at(11), at(12)), (at(13), at(14))]
+
+    assert index.remove(at(13), at(14))
+    assert not index.remove(at(13), at(14))
+    assert index.merged() == [(at(11), at(12))]
+
+
+def test_next_free_skips_busy_blocks():
+    index = IntervalIndex.from_intervals([(at(8), at(9)), (at(9), at(10)), (at(10.5), at(12))])
+
+    assert index.next_free(at(8), 3600, at(20)) == at(12)
+    assert index.next_free(at(8), 1800, at(20)) == at(10)
+    assert index.next_free(at(7), 3600, at(20)) == at(7)
+    assert index.next_free(at(8), 3600, at(12.5)) is None
+
+
+def test_naive_datetimes_are_treated_as_utc():
+    index = IntervalIndex.from_intervals([(datetime(2030, 1, 7, 10), datetime(2030, 1, 7, 11))])
+
+    assert index.overlaps(at(10.5), at(10.75))
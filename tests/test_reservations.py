@@ -0,0 +1,89 @@
+# tests/test_reservations.py
+import time
+from datetime import datetime, timedelta, timezone
+
+from src.reservations import ReservationLedger
+
+BASE = datetime(2030, 1, 7, tzinfo=timezone.utc)
+
+
+def slot(hour: float, hours: float = 1):
+    return BASE + timedelta(hours=hour), BASE + timedelta(hours=hour + hours)
+
+
+def test_overlapping_booking_on_same_court_is_rejected():
+    ledger = ReservationLedger()
+    first = ledger.reserve('court-1', [slot(10)])
+    second = ledger.reserve('court-1', [slot(10.5), slot(12)])
+
+    assert first.accepted == [0] and first.rejected == []
+    assert second.accepted == [1]
+    assert second.rejected == [0]
+
+
+def test_touching_and_other_court_bookings_are_accepted():
+    ledger = ReservationLedger()
+    ledger.reserve('court-1', [slot(10)])
+
+    assert ledger.reserve('court-1', [slot(11)]).rejected == []
+    assert ledger.reserve('court-2', [slot(10)]).rejected == []
+
+
+def test_booking_conflicts_with_block_on_its_way_to_dependent():
+    ledger = ReservationLedger()
+    # Agendar na quadra 1 vai bloquear a quadra 2 (dependente) no mesmo horário.
+    ledger.reserve('court-1', [slot(10)], dependent_ids=['court-2'])
+
+    assert ledger.reserve('court-2', [slot(10.5)]).rejected == [0]
+
+
+def test_blocks_do_not_conflict_with_each_other():
+    ledger = ReservationLedger()
+    ledger.reserve('court-1', [slot(10)], dependent_ids=['court-3'])
+
+    # Outra quadra que também bloqueia a 3 no mesmo horário segue em paralelo (os blocos viram um envelope).
+    assert ledger.reserve('court-2', [slot(10)], dependent_ids=['court-3']).rejected == []
+
+
+def test_same_request_does_not_conflict_with_itself():
+    ledger = ReservationLedger()
+
+    reservation = ledger.reserve('court-1', [slot(10), slot(10.5)])
+
+    assert reservation.accepted == [0, 1]
+
+
+def test_release_frees_the_slots():
+    ledger = ReservationLedger()
+    ledger.reserve('court-1', [slot(10)], dependent_ids=['court-2']).release()
+
+    assert ledger.reserve('court-1', [slot(10)]).rejected == []
+    assert ledger.reserve('court-2', [slot(10)]).rejected == []
+    assert ledger.get_stats()['active_reservations'] == 2
+
+
+def test_forgotten_reservation_expires_after_ttl(monkeypatch):
+    ledger = ReservationLedger(ttl_seconds=60)
+    now = time.monotonic()
+    ledger.reserve('court-1', [slot(10)])
+
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 61)
+
+    assert ledger.reserve('court-1', [slot(10)]).rejected == []
+    assert ledger.stats['expired'] == 1
+
+
+def test_held_blocks_outlive_the_release(monkeypatch):
+    ledger = ReservationLedger()
+    now = time.monotonic()
+    reservation = ledger.reserve('court-1', [slot(10), slot(14)], dependent_ids=['court-2'])
+    reservation.hold_blocks([0], seconds=30)
+    reservation.release()
+
+    assert ledger.reserve('court-2', [slot(10)]).rejected == [0]
+    assert ledger.reserve('court-2', [slot(14)]).rejected == []
+
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 31)
+    assert ledger.reserve('court-2', [slot(10, 0.5)]).rejected == []
+    # A retenção que venceu não conta como reserva esquecida.
+    assert ledger.stats['expired'] == 0
@@ -0,0 +1,149 @@
+# tests/test_token_verifier.py
+import time
+
+import pytest
+import rsa
+from google.auth import crypt, jwt
+
+from src.token_verifier import IdTokenVerifier, LocalCertsRequest
+
+AUDIENCE = 'test-client'
+KEY_ID = 'test-key'
+
+
+@pytest.fixture(scope='module')
+def key_pair():
+    # 1024 bits basta para o teste e é gerada bem mais rápido que a de 2048.
+    public_key, private_key = rsa.newkeys(1024)
+    return public_key.save_pkcs1().decode(), private_key.save_pkcs1().decode()
+
+
+def _token(private_pem: str, key_id: str = KEY_ID, **claims) -> str:
+    now = int(time.time())
+    payload = {'iss': 'https://accounts.google.com', 'aud': AUDIENCE, 'sub': 'user', 'email': 'user@example.com',
+               'iat': now, 'exp': now + 3600, **claims}
+    return jwt.encode(crypt.RSASigner.from_string(private_pem, key_id=key_id), payload).decode()
+
+
+def _verifier(public_pem: str, max_age: int = 3600, **kwargs):
+    request = LocalCertsRequest({KEY_ID: public_pem}, max_age=max_age)
+    return IdTokenVerifier(AUDIENCE, request=request, **kwargs), request
+
+
+def test_verify_returns_claims_and_caches_token(key_pair):
+    public_pem, private_pem = key_pair
+    verifier, request = _verifier(public_pem)
+    token = _token(private_pem)
+
+    first = verifier.verify(token)
+    second = verifier.verify(token)
+
+    assert first['email'] == second['email'] == 'user@example.com'
+    assert verifier.stats['token_misses'] == 1
+    assert verifier.stats['token_hits'] == 1
+    assert request.calls == 1
+
+
+def test_verify_returns_a_copy_of_the_claims(key_pair):
+    public_pem, private_pem = key_pair
+    verifier, _ = _verifier(public_pem)
+    token = _token(private_pem)
+
+    verifier.verify(token)['email'] = 'changed@example.com'
+
+    assert verifier.verify(token)['email'] == 'user@example.com'
+
+
+def test_cached_token_is_dropped_after_exp(key_pair, monkeypatch):
+    public_pem, private_pem = key_pair
+    verifier, _ = _verifier(public_pem)
+    now = time.time()
+    token = _token(private_pem, exp=int(now) + 60)
+    verifier.verify(token)
+
+    # Passado o 'exp' no relógio do cache, o token sai dele e é verificado de novo.
+    monkeypatch.setattr(time, 'time', lambda: now + 120)
+    verifier.verify(token)
+
+    assert verifier.stats['token_misses'] == 2
+    assert verifier.stats['token_hits'] == 0
+
+
+def test_expired_token_is_rejected(key_pair):
+    public_pem, private_pem = key_pair
+    verifier, _ = _verifier(public_pem)
+    now = int(time.time())
+
+    with pytest.raises(ValueError):
+        verifier.verify(_token(private_pem, iat=now - 7200, exp=now - 3600))
+
+
+def test_wrong_audience_is_rejected(key_pair):
+    public_pem, private_pem = key_pair
+    verifier, _ = _verifier(public_pem)
+
+    with pytest.raises(ValueError):
+        verifier.verify(_token(private_pem, aud='other-client'))
+
+
+def test_wrong_issuer_is_rejected_and_not_cached(key_pair):
+    public_pem, private_pem = key_pair
+    verifier, _ = _verifier(public_pem)
+    token = _token(private_pem, iss='https://evil.example.com')
+
+    with pytest.raises(ValueError):
+        verifier.verify(token)
+    with pytest.raises(ValueError):
+        verifier.verify(token)
+    assert verifier.stats['token_hits'] == 0
+
+
+def test_certs_are_cached_until_max_age(key_pair, monkeypatch):
+    public_pem, private_pem = key_pair
+    verifier, request = _verifier(public_pem, max_age=300)
+    now = time.time()
+
+    verifier.get_certs()
+    verifier.get_certs()
+    assert request.calls == 1
+
+    monkeypatch.setattr(time, 'time', lambda: now + 301)
+    verifier.get_certs()
+    assert request.calls == 2
+
+
+def test_unknown_key_id_refreshes_certs(key_pair):
+    public_pem, private_pem = key_pair
+    verifier, request = _verifier(public_pem)
+    verifier.get_certs()
+
+    # O Google rotacionou as chaves antes do max-age: o kid novo força uma nova busca.
+    request.certs = {'rotated-key': public_pem}
+    claims = verifier.verify(_token(private_pem, key_id='rotated-key'))
+
+    assert claims['sub'] == 'user'
+    assert request.calls == 2
+
+
+def test_forced_refresh_is_rate_limited(key_pair):
+    public_pem, private_pem = key_pair
+    verifier, request = _verifier(public_pem)
+    verifier.get_certs()
+
+    # Tokens com 'kid' inventado: só a primeira busca forçada vai ao Google dentro do intervalo.
+    for key_id in ('made-up-1', 'made-up-2', 'made-up-3'):
+        with pytest.raises(ValueError):
+            verifier.verify(_token(private_pem, key_id=key_id))
+
+    assert request.calls == 2
+    assert verifier.stats['forced_refreshes_skipped'] == 2
+
+
+def test_cached_claims_only_returns_verified_tokens(key_pair):
+    public_pem, private_pem = key_pair
+    verifier, _ = _verifier(public_pem)
+    token = _token(private_pem)
+
+    assert verifier.cached_claims(token) is None
+    verifier.verify(token)
+    assert verifier.cached_claims(token)['email'] == 'user@example.com'